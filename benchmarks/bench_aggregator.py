@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Merkle-rooted quote micro-batching
+
+Simulates a TEE that generates one quote at a time with a fixed cost and
+compares issuing a quote per request with the QuoteAggregator, which
+coalesces requests arriving within a window into one quote. Every
+aggregated result's inclusion proof is checked against its Merkle root.
+
+    python3 benchmarks/bench_aggregator.py --requests 2000 --clients 200 --quote-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(HERE), "templates", "remote-attestation-template", "api")
+sys.path.insert(0, API_DIR)
+
+from quote_aggregator import QuoteAggregator, verify_inclusion  # noqa: E402
+
+
+class FakeQuoteDevice:
+    """Serialises quote generation like the TDX quoting enclave"""
+
+    def __init__(self, quote_ms):
+        self.cost = quote_ms / 1000
+        self.lock = None
+        self.quotes = 0
+
+    async def get_quote(self, report_data: bytes):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            await asyncio.sleep(self.cost)
+            self.quotes += 1
+            return {"quote": "00" * 64, "report_data": report_data.hex()}
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _run(mode, args):
+    device = FakeQuoteDevice(args.quote_ms)
+    aggregator = QuoteAggregator(device.get_quote, args.window_ms, args.max_batch)
+    remaining = iter(range(args.requests))
+    latencies = []
+    invalid = 0
+
+    async def client():
+        nonlocal invalid
+        for i in remaining:
+            payload = f"record-{i}-nonce-{i}".encode()
+            start = time.perf_counter()
+            if mode == "direct":
+                await device.get_quote(payload[:64])
+            else:
+                result = await aggregator.submit(payload)
+                root = bytes.fromhex(result["merkle_root"])
+                if not verify_inclusion(payload, result["merkle_proof"], root):
+                    invalid += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "quotes": device.quotes,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "invalid_proofs": invalid,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quote aggregation benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--quote-ms", type=float, default=20.0)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = [asyncio.run(_run(mode, args)) for mode in ("direct", "aggregated")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"requests={args.requests} clients={args.clients} quote_cost={args.quote_ms}ms "
+          f"window={args.window_ms}ms max_batch={args.max_batch}")
+    print(f"{'mode':<12}{'requests':>10}{'quotes':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'bad proofs':>12}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['requests']:>10}{r['quotes']:>8}{r['rps']:>10.0f}"
+              f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['invalid_proofs']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark for negotiated response encoding
+
+Builds an /api/attestation/generate response around a synthetic TDX quote
+(benchmarks/fake_tdx.py) and a dstack-shaped event log, then reports body
+size and encode time for JSON and CBOR, uncompressed and with gzip/zstd.
+
+    python3 benchmarks/bench_codec.py --events 60 --iterations 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from fake_tdx import FakeTdxPlatform  # noqa: E402
+import response_codec  # noqa: E402
+
+
+def attestation_payload(events):
+    platform = FakeTdxPlatform()
+    event_log = json.dumps([
+        {
+            "imr": i % 4,
+            "event_type": 134217729,
+            "digest": os.urandom(48).hex(),
+            "event": "boot-event" if i % 4 < 3 else "app-event",
+            "event_payload": os.urandom(64).hex(),
+        }
+        for i in range(events)
+    ])
+    return {
+        "status": "success",
+        "data": {
+            "attestation_id": "tee-app-1",
+            "data": "bench",
+            "nonce": "1",
+            "tee_quote": platform.quote(b"bench").hex(),
+            "event_log": event_log,
+            "rtmrs": {i: os.urandom(48).hex() for i in range(4)},
+            "real_tee": True,
+            "source": "AsyncDstackClient",
+        },
+        "timestamp": "2025-01-01T00:00:00",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response encoding benchmark")
+    parser.add_argument("--events", type=int, default=60, help="event log entries")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    payload = attestation_payload(args.events)
+    encodings = ["identity", "gzip"] + (["zstd"] if response_codec.ZSTD_AVAILABLE else [])
+    rows = []
+    for accept in (response_codec.JSON_MEDIA_TYPE, response_codec.CBOR_MEDIA_TYPE):
+        for encoding in encodings:
+            body, _ = response_codec.encode(payload, accept, encoding)
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                response_codec.encode(payload, accept, encoding)
+            elapsed = time.perf_counter() - start
+            rows.append({
+                "format": accept.split("/")[1],
+                "encoding": encoding,
+                "bytes": len(body),
+                "encode_us": elapsed / args.iterations * 1e6,
+            })
+
+    if args.json:
+        print(json.dumps({"events": args.events, "results": rows}, indent=2))
+        return
+    baseline = rows[0]["bytes"]
+    print(f"event log entries={args.events} iterations={args.iterations}")
+    print(f"{'format':<8}{'encoding':<10}{'bytes':>9}{'vs json':>9}{'encode us':>11}")
+    for r in rows:
+        print(f"{r['format']:<8}{r['encoding']:<10}{r['bytes']:>9}{r['bytes'] / baseline:>9.2f}"
+              f"{r['encode_us']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark for incremental RTMR event-log replay
+
+Builds a synthetic dstack event log with a fixed boot prefix (RTMR0-2) and
+appends RTMR3 events one attestation at a time, as a running CVM does.
+Reports the cost of a from-scratch replay (what
+GetQuoteResponse.replay_rtmrs() does for every quote) against
+RtmrReplayer resuming from its checkpoints.
+
+    python3 benchmarks/bench_replay.py --boot-events 2000 --attestations 500
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "templates", "remote-attestation-template", "api"))
+
+from rtmr_replay import RtmrReplayer  # noqa: E402
+
+
+def _event(imr):
+    return {
+        "imr": imr,
+        "event_type": 134217729,
+        "digest": os.urandom(48).hex(),
+        "event": "app-event",
+        "event_payload": os.urandom(32).hex(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental RTMR replay benchmark")
+    parser.add_argument("--boot-events", type=int, default=1000)
+    parser.add_argument("--attestations", type=int, default=200)
+    parser.add_argument("--events-per-attestation", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    events = [_event(i % 3) for i in range(args.boot_events)]
+    logs = []
+    for _ in range(args.attestations):
+        events.extend(_event(3) for _ in range(args.events_per_attestation))
+        logs.append(json.dumps(events))
+
+    start = time.perf_counter()
+    full = [RtmrReplayer().replay(log) for log in logs]
+    full_s = time.perf_counter() - start
+
+    replayer = RtmrReplayer()
+    start = time.perf_counter()
+    incremental = [replayer.replay(log) for log in logs]
+    incremental_s = time.perf_counter() - start
+
+    result = {
+        "boot_events": args.boot_events,
+        "attestations": args.attestations,
+        "final_log_events": len(events),
+        "full_ms": full_s / args.attestations * 1000,
+        "incremental_ms": incremental_s / args.attestations * 1000,
+        "speedup": full_s / incremental_s,
+        "identical": full == incremental,
+        **replayer.stats(),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"boot events={args.boot_events} attestations={args.attestations} "
+          f"final log={len(events)} events")
+    print(f"full replay per attestation:        {result['full_ms']:.3f} ms")
+    print(f"incremental replay per attestation: {result['incremental_ms']:.3f} ms "
+          f"({result['speedup']:.0f}x)")
+    print(f"identical RTMRs: {result['identical']}")
+
+
+if __name__ == "__main__":
+    main()
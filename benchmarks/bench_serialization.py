@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Serialization microbenchmark for simple-python-api.py responses
+
+Fetches one real response per endpoint from an in-process server, then
+times the old path (json.dumps + encode), the current serializer (orjson
+when installed, compact stdlib otherwise) and, for templated endpoints,
+rendering from pre-serialized bytes.
+
+    python3 benchmarks/bench_serialization.py --iterations 20000
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import threading
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = [
+    ("GET", "/api/tee/info", True),
+    ("GET", "/api/health", False),
+    ("POST", "/api/tee/measurements", True),
+    ("POST", "/api/node/info", True),
+    ("POST", "/api/attestation/generate", False),
+    ("POST", "/api/tee/execute", False),
+]
+
+
+def load_api():
+    spec = importlib.util.spec_from_file_location("simple_api", os.path.join(ROOT, "simple-python-api.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fetch_payloads(api):
+    server = api.create_server(0, "threaded")
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    payloads = {}
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for method, path, _ in ENDPOINTS:
+            conn.request(method, path, body=b"{}" if method == "POST" else None)
+            payloads[path] = json.loads(conn.getresponse().read())
+        conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return payloads
+
+
+def _with_marker(value, marker):
+    if isinstance(value, dict):
+        return {k: marker if k == "timestamp" else _with_marker(v, marker) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_with_marker(v, marker) for v in value]
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization microbenchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    api = load_api()
+    payloads = fetch_payloads(api)
+    n = args.iterations
+    results = []
+    for _, path, templated in ENDPOINTS:
+        data = payloads[path]
+        before = timeit.timeit(lambda: json.dumps(data).encode("utf-8"), number=n) / n
+        after = timeit.timeit(lambda: api._dumps(data), number=n) / n
+        row = {
+            "endpoint": path,
+            "bytes_before": len(json.dumps(data).encode("utf-8")),
+            "bytes_after": len(api._dumps(data)),
+            "before_us": before * 1e6,
+            "after_us": after * 1e6,
+            "template_us": None,
+        }
+        if templated:
+            template = api.ResponseTemplate()
+            marked = _with_marker(data, api.ResponseTemplate.TIMESTAMP)
+            stamp = data["timestamp"]
+            template.render("key", lambda: marked, stamp)
+            row["template_us"] = timeit.timeit(
+                lambda: template.render("key", lambda: marked, stamp), number=n
+            ) / n * 1e6
+        results.append(row)
+
+    if args.json:
+        print(json.dumps({"backend": api.JSON_BACKEND, "results": results}, indent=2))
+        return
+
+    print(f"serializer backend: {api.JSON_BACKEND}, iterations: {n}")
+    print(f"{'endpoint':<28}{'bytes':>12}{'json.dumps us':>15}{'fast us':>10}{'template us':>13}")
+    for r in results:
+        template = f"{r['template_us']:.2f}" if r["template_us"] is not None else "-"
+        print(f"{r['endpoint']:<28}{r['bytes_before']:>6}/{r['bytes_after']:<5}"
+              f"{r['before_us']:>15.2f}{r['after_us']:>10.2f}{template:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the startup measurement snapshot in simple-python-api.py
+
+Cold start: time to import the API module and to build a
+MeasurementSnapshot (env reads, sha256 digests, serializing the
+measurements body). Steady state: CPU per request to produce the
+/api/tee/info, /api/tee/measurements and /api/node/info bodies, rebuilt
+from the environment on every request versus served from the snapshot's
+pre-serialized parts.
+
+    python3 benchmarks/bench_snapshot.py --iterations 20000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from bench_serialization import load_api  # noqa: E402
+
+
+def per_request_paths(api):
+    """(endpoint, rebuild every request, serve from snapshot) body producers"""
+    snapshot = api.SNAPSHOT
+    sample = api.SYSTEM_SAMPLER.latest()
+    template = api.ResponseTemplate
+
+    def fresh_snapshot():
+        # Env reads and digests, as every request used to do
+        return api.MeasurementSnapshot()
+
+    def rebuild_tee_info():
+        payload = fresh_snapshot().tee_info(sample, True, False)
+        return template.fill(template.compile(payload), api.datetime.now().isoformat())
+
+    def rebuild_measurements():
+        return template.fill(fresh_snapshot().measurements_parts, api.datetime.now().isoformat())
+
+    def rebuild_node_info():
+        payload = fresh_snapshot().node_info(sample)
+        return template.fill(template.compile(payload), api.datetime.now().isoformat())
+
+    # Between system samples the live bodies render from the same key, as in the handlers
+    tee_info, node_info = template(), template()
+    return [
+        ("/api/tee/info", rebuild_tee_info,
+         lambda: tee_info.render((snapshot, sample["seq"], (True, False)),
+                                 lambda: snapshot.tee_info(sample, True, False),
+                                 api.datetime.now().isoformat())),
+        ("/api/tee/measurements", rebuild_measurements,
+         lambda: template.fill(snapshot.measurements_parts, api.datetime.now().isoformat())),
+        ("/api/node/info", rebuild_node_info,
+         lambda: node_info.render((snapshot, sample["seq"]), lambda: snapshot.node_info(sample),
+                                  api.datetime.now().isoformat())),
+    ]
+
+
+def cpu_us(fn, n):
+    return timeit.Timer(fn, timer=time.process_time).timeit(number=n) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measurement snapshot benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--builds", type=int, default=200, help="snapshot builds to time")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    api = load_api()
+    import_ms = (time.perf_counter() - start) * 1000
+    builds = []
+    for _ in range(args.builds):
+        start = time.perf_counter()
+        api.MeasurementSnapshot()
+        builds.append((time.perf_counter() - start) * 1000)
+
+    rows = []
+    for endpoint, rebuild, fill in per_request_paths(api):
+        rebuild_us = cpu_us(rebuild, args.iterations)
+        snapshot_us = cpu_us(fill, args.iterations)
+        rows.append({
+            "endpoint": endpoint,
+            "rebuild_us": rebuild_us,
+            "snapshot_us": snapshot_us,
+            "speedup": rebuild_us / snapshot_us,
+        })
+
+    result = {
+        "module_import_ms": import_ms,
+        "snapshot_build_ms": statistics.median(builds),
+        "backend": api.JSON_BACKEND,
+        "results": rows,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"module import: {import_ms:.1f} ms, snapshot build: {result['snapshot_build_ms']:.3f} ms "
+          f"(median of {args.builds}), serializer: {api.JSON_BACKEND}")
+    print(f"{'endpoint':<24}{'rebuild us':>12}{'snapshot us':>13}{'speedup':>9}")
+    for r in rows:
+        print(f"{r['endpoint']:<24}{r['rebuild_us']:>12.2f}{r['snapshot_us']:>13.2f}{r['speedup']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
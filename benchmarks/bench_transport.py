@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Concurrent-client benchmark for the FastAPI socket transport
+
+Runs many concurrent requests against the FastAPI app on one event loop,
+backed by benchmarks/fake_dstack.py, and compares the pooled asyncio
+transport with the original blocking connect/sendall/recv per call.
+
+    python3 benchmarks/bench_transport.py --clients 64 --requests 2000 --latency-ms 5
+
+The default endpoint, /api/tee/execute, is not cached, so every request
+reaches the socket.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(HERE), "templates", "remote-attestation-template", "api")
+sys.path.insert(0, HERE)
+sys.path.insert(0, API_DIR)
+
+from fake_dstack import FakeDstackServer  # noqa: E402
+
+
+async def _blocking_call(sdk, method, params=None):
+    """The pre-pool implementation: new socket per call, blocking I/O"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(sdk.socket_path)
+    sock.sendall(json.dumps({"method": method, "params": params or {}}).encode() + b"\n")
+    response = sock.recv(65536).decode()
+    sock.close()
+    return json.loads(response)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _drive(app, path, clients, total):
+    import httpx
+
+    body = {"function": "bench", "params": {}}
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.post(path, json=body)
+                if response.status_code != 200:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Socket transport benchmark")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--path", default="/api/tee/execute")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="fake-dstack-")
+    with FakeDstackServer(directory, args.latency_ms, args.payload_bytes) as fake:
+        os.environ["DSTACK_SOCKET_PATH"] = fake.dstack_path
+        os.environ["TAPPD_SOCKET_PATH"] = fake.tappd_path
+        os.environ["DSTACK_POOL_MAX_IN_FLIGHT"] = str(args.max_in_flight)
+        os.environ["DSTACK_POOL_SIZE"] = str(args.max_in_flight)
+        import main as api
+
+        results = {}
+        pooled_call = api.sdk._call_dstack_api
+        results["pooled-async"] = asyncio.run(_drive(api.app, args.path, args.clients, args.requests))
+
+        api.sdk._call_dstack_api = lambda method, params=None: _blocking_call(api.sdk, method, params)
+        results["blocking"] = asyncio.run(_drive(api.app, args.path, args.clients, args.requests))
+        api.sdk._call_dstack_api = pooled_call
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"POST {args.path}  clients={args.clients} requests={args.requests} "
+          f"socket_latency={args.latency_ms}ms")
+    print(f"{'transport':<14}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.0f}"
+              f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
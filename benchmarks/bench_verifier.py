@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark for local TDX quote verification
+
+Generates quotes from benchmarks/fake_tdx.py's synthetic platform, seeds
+the verifier's collateral cache with its signed TCB info, QE identity and
+CRL, then reports the cold (first quote of a platform) and warm cost of
+QuoteVerifier.verify and the throughput of verify_many across a process
+pool.
+
+    python3 benchmarks/bench_verifier.py --quotes 5000 --processes 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from fake_tdx import FakeTdxPlatform  # noqa: E402
+from quote_verifier import CollateralCache, QuoteVerifier, create_pool, verify_many  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local quote verification benchmark")
+    parser.add_argument("--quotes", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=64)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    platform = FakeTdxPlatform()
+    cache = CollateralCache(tempfile.mkdtemp(prefix="tdx-collateral-"), fetch=False)
+    platform.seed(cache)
+    expected = {name: value.hex() for name, value in platform.measurements().items()}
+    quotes = [platform.quote(f"nonce-{i}".encode()).hex() for i in range(args.quotes)]
+
+    verifier = QuoteVerifier(cache, trusted_root_pem=platform.root_pem)
+    start = time.perf_counter()
+    cold = verifier.verify(quotes[0], expected)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    serial = [verifier.verify(q, expected) for q in quotes]
+    serial_s = time.perf_counter() - start
+
+    pool = create_pool(args.processes, collateral=cache, trusted_root_pem=platform.root_pem)
+    try:
+        verify_many(quotes[: args.processes], expected, pool=pool, chunksize=1)  # start workers
+        start = time.perf_counter()
+        pooled = verify_many(quotes, expected, pool=pool, chunksize=args.chunksize)
+        pooled_s = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+    result = {
+        "quotes": args.quotes,
+        "processes": args.processes,
+        "cold_ms": cold_ms,
+        "warm_ms": serial_s / args.quotes * 1000,
+        "serial_per_s": args.quotes / serial_s,
+        "pooled_per_s": args.quotes / pooled_s,
+        "all_verified": cold["verified"] and all(r["verified"] for r in serial + pooled),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"quotes={args.quotes} processes={args.processes}")
+    print(f"first quote (chain, CRL, collateral): {result['cold_ms']:.2f} ms")
+    print(f"per quote, memoised platform:         {result['warm_ms']:.3f} ms")
+    print(f"serial:  {result['serial_per_s']:.0f} quotes/s")
+    print(f"pooled:  {result['pooled_per_s']:.0f} quotes/s")
+    print(f"all verified: {result['all_verified']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for /var/run/dstack.sock and /var/run/tappd.sock
+
+Speaks the same wire formats as the API's socket transport: newline-delimited
+or length-prefixed JSON on the dstack socket and keep-alive HTTP/1.1 prpc
+(Content-Length or chunked) on the tappd socket.
+Latency and payload size are configurable so transports and servers can be
+exercised without TDX hardware.
+
+    python3 benchmarks/fake_dstack.py --dir /tmp/fake-dstack --latency-ms 2
+    DSTACK_SOCKET_PATH=/tmp/fake-dstack/dstack.sock python3 main.py
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+
+def _result_for(method, params, payload_bytes):
+    result = {
+        "method": method,
+        "params": params or {},
+        "tee_enabled": True,
+        "attestation_available": True,
+    }
+    if payload_bytes:
+        result["payload"] = "a" * payload_bytes
+    return result
+
+
+class _DstackHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            server.counter.increment()
+            try:
+                request = json.loads(line)
+            except ValueError:
+                return
+            if server.latency:
+                time.sleep(server.latency)
+            result = _result_for(request.get("method"), request.get("params"), server.payload_bytes)
+            payload = json.dumps(result).encode()
+            if server.framing == "length":
+                self.wfile.write(len(payload).to_bytes(4, "big") + payload)
+            else:
+                self.wfile.write(payload + b"\n")
+            self.wfile.flush()
+
+
+class _TappdHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            request_line = self.rfile.readline()
+            if not request_line:
+                return
+            headers = {}
+            while True:
+                line = self.rfile.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            body = self.rfile.read(length) if length else b""
+            server.counter.increment()
+
+            path = request_line.split(b" ")[1].decode()
+            method = path.rsplit("Tappd.", 1)[-1]
+            params = json.loads(body) if body else {}
+            if server.latency:
+                time.sleep(server.latency)
+            payload = json.dumps(_result_for(method, params, server.payload_bytes)).encode()
+            if server.chunked:
+                chunks = b"".join(
+                    f"{len(payload[i:i + 8192]):x}\r\n".encode() + payload[i:i + 8192] + b"\r\n"
+                    for i in range(0, len(payload), 8192)
+                )
+                self.wfile.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Transfer-Encoding: chunked\r\n\r\n"
+                    + chunks + b"0\r\n\r\n"
+                )
+            else:
+                self.wfile.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+            self.wfile.flush()
+
+
+class _Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def increment(self):
+        with self._lock:
+            self.value += 1
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping mid-response (timeouts, size limits) are expected
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeDstackServer:
+    """Serve fake dstack and tappd sockets from background threads"""
+
+    def __init__(self, directory, latency_ms=0.0, payload_bytes=0, framing="newline", chunked=False):
+        os.makedirs(directory, exist_ok=True)
+        self.dstack_path = os.path.join(directory, "dstack.sock")
+        self.tappd_path = os.path.join(directory, "tappd.sock")
+        self.latency = latency_ms / 1000
+        self.payload_bytes = payload_bytes
+        self.framing = framing
+        self.chunked = chunked
+        self._servers = []
+
+    def _serve(self, path, handler):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = _UnixServer(path, handler)
+        server.latency = self.latency
+        server.payload_bytes = self.payload_bytes
+        server.framing = self.framing
+        server.chunked = self.chunked
+        server.counter = _Counter()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return server
+
+    def start(self):
+        self.dstack = self._serve(self.dstack_path, _DstackHandler)
+        self.tappd = self._serve(self.tappd_path, _TappdHandler)
+        return self
+
+    @property
+    def requests_served(self):
+        """Requests served per socket"""
+        return {"dstack": self.dstack.counter.value, "tappd": self.tappd.counter.value}
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+            if os.path.exists(server.server_address):
+                os.unlink(server.server_address)
+        self._servers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake dstack/tappd Unix socket server")
+    parser.add_argument("--dir", default="/tmp/fake-dstack")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--payload-bytes", type=int, default=0)
+    parser.add_argument("--framing", choices=["newline", "length"], default="newline",
+                        help="dstack.sock response framing")
+    parser.add_argument("--chunked", action="store_true",
+                        help="send tappd.sock bodies with chunked transfer encoding")
+    args = parser.parse_args()
+
+    server = FakeDstackServer(
+        args.dir, args.latency_ms, args.payload_bytes, args.framing, args.chunked
+    ).start()
+    print(f"dstack: {server.dstack_path}\ntappd:  {server.tappd_path}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Synthetic Intel TDX platform for exercising the local quote verifier
+
+Builds a throwaway certificate hierarchy shaped like Intel's (root CA ->
+PCK platform CA -> PCK certificate with the SGX extension, plus a TCB
+signing certificate), signs TCB info, QE identity and a PCK CRL with it,
+and emits TDX quote v4 blobs laid out exactly as DCAP produces them.
+Nothing here is trusted by a real verifier; pass `root_pem` as the
+verifier's trusted root and `seed()` its collateral cache.
+
+    python3 benchmarks/fake_tdx.py --out /tmp/fake-tdx   # writes root.pem, quote.hex, collateral
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+from datetime import datetime, timedelta, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+from cryptography.x509.oid import NameOID
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(HERE), "templates", "remote-attestation-template", "api")
+sys.path.insert(0, API_DIR)
+
+from quote_verifier import BODY_FIELDS, SGX_EXTENSION_OID, CollateralCache  # noqa: E402
+
+FMSPC = "00806f050000"
+CPUSVN = [2, 2, 2, 2, 3, 1, 0, 3, 0, 0, 0, 0, 0, 0, 0, 0]
+PCESVN = 11
+TEE_TCB_SVN = bytes([5, 0, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+QE_MRSIGNER = hashlib.sha256(b"fake-qe-signer").digest()
+QE_ISVPRODID = 2
+QE_ISVSVN = 4
+
+
+def _tlv(tag, content):
+    length = len(content)
+    if length < 0x80:
+        header = bytes([tag, length])
+    else:
+        size = (length.bit_length() + 7) // 8
+        header = bytes([tag, 0x80 | size]) + length.to_bytes(size, "big")
+    return header + content
+
+
+def _oid(dotted):
+    parts = [int(p) for p in dotted.split(".")]
+    out = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        out.extend(reversed(chunk))
+    return _tlv(0x06, bytes(out))
+
+
+def _int(value):
+    return _tlv(0x02, value.to_bytes(max(1, (value.bit_length() + 8) // 8), "big"))
+
+
+def sgx_extension(fmspc=FMSPC, cpusvn=CPUSVN, pcesvn=PCESVN):
+    """DER of the PCK certificate's SGX extension (TCB components and FMSPC)"""
+    tcb_oid = SGX_EXTENSION_OID + ".2"
+    components = [
+        _tlv(0x30, _oid(f"{tcb_oid}.{i + 1}") + _int(svn)) for i, svn in enumerate(cpusvn)
+    ]
+    components.append(_tlv(0x30, _oid(f"{tcb_oid}.17") + _int(pcesvn)))
+    components.append(_tlv(0x30, _oid(f"{tcb_oid}.18") + _tlv(0x04, bytes(cpusvn))))
+    entries = [
+        _tlv(0x30, _oid(SGX_EXTENSION_OID + ".1") + _tlv(0x04, os.urandom(16))),
+        _tlv(0x30, _oid(tcb_oid) + _tlv(0x30, b"".join(components))),
+        _tlv(0x30, _oid(SGX_EXTENSION_OID + ".3") + _tlv(0x04, b"\x00\x00")),
+        _tlv(0x30, _oid(SGX_EXTENSION_OID + ".4") + _tlv(0x04, bytes.fromhex(fmspc))),
+    ]
+    return _tlv(0x30, b"".join(entries))
+
+
+def _name(cn):
+    return x509.Name([
+        x509.NameAttribute(NameOID.COMMON_NAME, cn),
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Fake TDX Platform"),
+    ])
+
+
+def _cert(subject, key, issuer, issuer_key, ca, extensions=()):
+    now = datetime.now(timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(subject))
+        .issuer_name(_name(issuer))
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=365))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+    )
+    for extension in extensions:
+        builder = builder.add_extension(extension, critical=False)
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+def _pem(*certs):
+    return b"".join(c.public_bytes(serialization.Encoding.PEM) for c in certs)
+
+
+def _raw_sign(key, message):
+    r, s = decode_dss_signature(key.sign(message, ec.ECDSA(hashes.SHA256())))
+    return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+
+class FakeTdxPlatform:
+    def __init__(self, tcb_status="UpToDate"):
+        new_key = lambda: ec.generate_private_key(ec.SECP256R1())  # noqa: E731
+        self.root_key, self.pck_ca_key, self.pck_key, self.tcb_key = (new_key() for _ in range(4))
+        self.attestation_key = new_key()
+        root_name = "Intel SGX Root CA"
+        self.root = _cert(root_name, self.root_key, root_name, self.root_key, True)
+        self.pck_ca = _cert("Intel SGX PCK Platform CA", self.pck_ca_key, root_name, self.root_key, True)
+        self.pck = _cert(
+            "Intel SGX PCK Certificate", self.pck_key, "Intel SGX PCK Platform CA", self.pck_ca_key, False,
+            [x509.UnrecognizedExtension(x509.ObjectIdentifier(SGX_EXTENSION_OID), sgx_extension())],
+        )
+        self.tcb_signer = _cert("Intel SGX TCB Signing", self.tcb_key, root_name, self.root_key, False)
+        self.tcb_status = tcb_status
+        self.root_pem = _pem(self.root)
+        self.pck_chain = _pem(self.pck, self.pck_ca, self.root)
+        point = self.attestation_key.public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        )
+        self.attestation_pub = point[1:]
+        self.qe_auth_data = bytes(range(32))
+        self._qe_cert_data = self._qe_certification_data()
+
+    def _qe_certification_data(self):
+        report = bytearray(384)
+        struct.pack_into("<I", report, 16, 0)
+        report[48:64] = bytes.fromhex("11000000000000000000000000000000")
+        report[128:160] = QE_MRSIGNER
+        struct.pack_into("<HH", report, 256, QE_ISVPRODID, QE_ISVSVN)
+        report[320:352] = hashlib.sha256(self.attestation_pub + self.qe_auth_data).digest()
+        report = bytes(report)
+        pck_data = struct.pack("<HI", 5, len(self.pck_chain)) + self.pck_chain
+        return (
+            report
+            + _raw_sign(self.pck_key, report)
+            + struct.pack("<H", len(self.qe_auth_data))
+            + self.qe_auth_data
+            + pck_data
+        )
+
+    def measurements(self, seed=b""):
+        """Deterministic MRTD/RTMR values, so callers can build expectations"""
+        return {
+            name: hashlib.sha384(name.encode() + seed).digest()
+            for name in ("mrtd", "rtmr0", "rtmr1", "rtmr2", "rtmr3")
+        }
+
+    def quote(self, report_data=b"", measurements=None):
+        fields = {name: bytes(length) for name, length in BODY_FIELDS}
+        fields["tee_tcb_svn"] = TEE_TCB_SVN
+        fields.update(measurements or self.measurements())
+        fields["report_data"] = report_data.ljust(64, b"\x00")[:64]
+        header = struct.pack("<HHIHH", 4, 2, 0x81, 0, 0) + bytes(16) + bytes(20)
+        body = b"".join(fields[name] for name, _ in BODY_FIELDS)
+        signature = _raw_sign(self.attestation_key, header + body)
+        signature_data = (
+            signature
+            + self.attestation_pub
+            + struct.pack("<HI", 6, len(self._qe_cert_data))
+            + self._qe_cert_data
+        )
+        return header + body + struct.pack("<I", len(signature_data)) + signature_data
+
+    def _signed_document(self, field, content):
+        raw = json.dumps(content, separators=(",", ":")).encode()
+        signature = _raw_sign(self.tcb_key, raw).hex()
+        return b'{"' + field.encode() + b'":' + raw + b',"signature":"' + signature.encode() + b'"}'
+
+    def collateral(self):
+        now = datetime.now(timezone.utc)
+        stamp = lambda t: t.strftime("%Y-%m-%dT%H:%M:%SZ")  # noqa: E731
+        next_update = now + timedelta(days=30)
+        tcb_info = {
+            "id": "TDX", "version": 3, "issueDate": stamp(now), "nextUpdate": stamp(next_update),
+            "fmspc": FMSPC, "pceId": "0000", "tcbType": 0, "tcbEvaluationDataNumber": 17,
+            "tcbLevels": [
+                {
+                    "tcb": {
+                        "sgxtcbcomponents": [{"svn": svn} for svn in CPUSVN],
+                        "pcesvn": PCESVN,
+                        "tdxtcbcomponents": [{"svn": svn} for svn in TEE_TCB_SVN],
+                    },
+                    "tcbDate": stamp(now), "tcbStatus": self.tcb_status,
+                },
+                {
+                    "tcb": {
+                        "sgxtcbcomponents": [{"svn": 0}] * 16, "pcesvn": 0,
+                        "tdxtcbcomponents": [{"svn": 0}] * 16,
+                    },
+                    "tcbDate": stamp(now - timedelta(days=365)), "tcbStatus": "OutOfDate",
+                },
+            ],
+        }
+        qe_identity = {
+            "id": "TD_QE", "version": 2, "issueDate": stamp(now), "nextUpdate": stamp(next_update),
+            "tcbEvaluationDataNumber": 17, "miscselect": "00000000", "miscselectMask": "FFFFFFFF",
+            "attributes": "11000000000000000000000000000000",
+            "attributesMask": "FBFFFFFFFFFFFFFF0000000000000000",
+            "mrsigner": QE_MRSIGNER.hex().upper(), "isvprodid": QE_ISVPRODID,
+            "tcbLevels": [{"tcb": {"isvsvn": QE_ISVSVN}, "tcbDate": stamp(now), "tcbStatus": "UpToDate"}],
+        }
+        crl = (
+            x509.CertificateRevocationListBuilder()
+            .issuer_name(self.pck_ca.subject)
+            .last_update(now)
+            .next_update(next_update)
+            .sign(self.pck_ca_key, hashes.SHA256())
+        )
+        issuer_chain = _pem(self.tcb_signer, self.root).decode()
+        return {
+            f"tcb-info-{FMSPC}": (self._signed_document("tcbInfo", tcb_info), issuer_chain),
+            "qe-identity": (self._signed_document("enclaveIdentity", qe_identity), issuer_chain),
+            "pck-crl-platform": (
+                crl.public_bytes(serialization.Encoding.DER),
+                _pem(self.pck_ca, self.root).decode(),
+            ),
+        }
+
+    def seed(self, cache: CollateralCache):
+        """Store this platform's collateral in a verifier's cache"""
+        for name, (body, chain) in self.collateral().items():
+            cache.put(name, body, chain)
+        cache.put("root-ca", self.root_pem)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic TDX quote and collateral")
+    parser.add_argument("--out", default="/tmp/fake-tdx")
+    parser.add_argument("--report-data", default="fake-tdx")
+    args = parser.parse_args()
+
+    platform = FakeTdxPlatform()
+    os.makedirs(args.out, exist_ok=True)
+    platform.seed(CollateralCache(os.path.join(args.out, "collateral"), fetch=False))
+    with open(os.path.join(args.out, "root.pem"), "wb") as f:
+        f.write(platform.root_pem)
+    with open(os.path.join(args.out, "quote.hex"), "w") as f:
+        f.write(platform.quote(args.report_data.encode()).hex())
+    print(f"TDX_TRUSTED_ROOT_CA={args.out}/root.pem TDX_COLLATERAL_DIR={args.out}/collateral "
+          f"TDX_COLLATERAL_FETCH=false")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Load test for simple-python-api.py serving modes
+
+Starts the API once per mode, drives it with concurrent keep-alive-free
+clients and reports requests/sec and latency percentiles. A few "slow"
+clients can be added that open a connection and never send a request,
+which is what stalls the single-threaded server.
+
+    python3 benchmarks/load_test.py --modes single,threaded,prefork
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_SCRIPT = os.path.join(ROOT, "simple-python-api.py")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/health")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"API did not come up on port {port}")
+
+
+def start_server(mode, port, extra_env=None):
+    env = dict(os.environ, PORT=str(port), API_SERVER_MODE=mode)
+    # Load runs come from one client, so quote admission is off unless asked for
+    env.setdefault("ADMISSION_ENABLED", "false")
+    env.update(extra_env or {})
+    proc = subprocess.Popen(
+        [sys.executable, API_SCRIPT],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(port)
+    except Exception:
+        proc.kill()
+        raise
+    return proc
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(port, path, method, body, concurrency, duration, slow_clients=0, keepalive=False):
+    """Hammer one endpoint and return latency samples (seconds) and error count
+
+    With keepalive each client reuses one HTTP/1.1 connection, reconnecting
+    only after an error; otherwise every request opens a new connection.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload else {}
+
+    # Idle connections that never send a request line
+    stallers = []
+    for _ in range(slow_clients):
+        s = socket.create_connection(("127.0.0.1", port))
+        stallers.append(s)
+
+    def worker():
+        local = []
+        local_errors = 0
+        conn = None
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if not keepalive or response.will_close:
+                    conn.close()
+                    conn = None
+                if response.status >= 500:
+                    local_errors += 1
+                else:
+                    local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                if conn is not None:
+                    conn.close()
+                    conn = None
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    for s in stallers:
+        s.close()
+    return latencies, errors[0], elapsed
+
+
+def summarize(mode, latencies, errors, elapsed):
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "mode": mode,
+        "requests": count,
+        "errors": errors,
+        "rps": count / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", default="single,threaded,prefork")
+    parser.add_argument("--path", default="/api/tee/info")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--slow-clients", type=int, default=0,
+                        help="idle connections held open during the run")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    body = {} if args.method == "POST" else None
+    results = []
+    for mode in args.modes.split(","):
+        port = _free_port()
+        proc = start_server(mode, port, {
+            "API_WORKERS": str(args.workers),
+            "API_PROCESSES": str(args.processes),
+            # Keep stalled clients from being reaped mid-run
+            "API_REQUEST_TIMEOUT": str(args.duration + 5),
+        })
+        try:
+            latencies, errors, elapsed = run_load(
+                port, args.path, args.method, body,
+                args.concurrency, args.duration, args.slow_clients,
+            )
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+        results.append(summarize(mode, latencies, errors, elapsed))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.method} {args.path}  concurrency={args.concurrency} "
+          f"duration={args.duration}s slow_clients={args.slow_clients}")
+    print(f"{'mode':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.0f}"
+              f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
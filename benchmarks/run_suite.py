@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for both Python APIs
+
+Starts benchmarks/fake_dstack.py as a stand-in for the dstack and tappd
+sockets, then runs simple-python-api.py (in each serving mode) and the
+FastAPI app under uvicorn against it. Each target is driven with
+concurrent keep-alive clients per scenario, and the suite reports
+throughput, tail latency and the server's resident memory (idle and
+peak, summed over worker processes).
+
+    python3 benchmarks/run_suite.py --latency-ms 2 --payload-bytes 1024 --json > run.json
+    python3 benchmarks/run_suite.py --baseline run.json --tolerance 0.15
+
+With --baseline the run exits non-zero when a target/scenario loses more
+than --tolerance of its throughput or p99 latency grows by more than that.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+API_DIR = os.path.join(ROOT, "templates", "remote-attestation-template", "api")
+sys.path.insert(0, HERE)
+
+from load_test import API_SCRIPT, _free_port, _wait_ready, run_load, summarize  # noqa: E402
+
+SCENARIOS = {
+    "tee-info": ("GET", "/api/tee/info", None),
+    "execute": ("POST", "/api/tee/execute", {"function": "bench", "params": {}}),
+    "attest": ("POST", "/api/attestation/generate", {"data": "bench", "nonce": "1"}),
+}
+
+
+def _process_tree(pid):
+    pids = [pid]
+    for child in pids:
+        try:
+            with open(f"/proc/{child}/task/{child}/children") as f:
+                pids.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_bytes(pid):
+    """Resident memory of pid and all its descendants (Linux /proc)"""
+    total = 0
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return total
+
+
+class RssSampler:
+    """Track the peak RSS of a process tree from a background thread"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = rss_bytes(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes(self.pid))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes(self.pid))
+
+
+def start_fake_sockets(directory, args):
+    cmd = [
+        sys.executable, os.path.join(HERE, "fake_dstack.py"),
+        "--dir", directory,
+        "--latency-ms", str(args.latency_ms),
+        "--payload-bytes", str(args.payload_bytes),
+        "--framing", args.framing,
+    ]
+    if args.chunked:
+        cmd.append("--chunked")
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    paths = [os.path.join(directory, name) for name in ("dstack.sock", "tappd.sock")]
+    deadline = time.monotonic() + 10
+    while not all(os.path.exists(p) for p in paths):
+        if time.monotonic() > deadline or proc.poll() is not None:
+            proc.kill()
+            raise RuntimeError("fake dstack sockets did not come up")
+        time.sleep(0.05)
+    return proc, paths
+
+
+def start_target(target, port, env, args):
+    """Launch one target: simple:<mode> or fastapi"""
+    if target == "fastapi":
+        cmd = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.uvicorn_workers), "--log-level", "warning",
+        ]
+        cwd = API_DIR
+    elif target.startswith("simple:"):
+        cmd = [sys.executable, API_SCRIPT]
+        env = dict(env, API_SERVER_MODE=target.split(":", 1)[1], PORT=str(port),
+                   API_WORKERS=str(args.workers), API_PROCESSES=str(args.processes))
+        cwd = ROOT
+    else:
+        raise ValueError(f"Unknown target: {target}")
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port, timeout=30)
+    except Exception:
+        proc.kill()
+        raise
+    return proc
+
+
+def run_target(target, env, args):
+    port = _free_port()
+    proc = start_target(target, port, env, args)
+    results = []
+    try:
+        for name in args.scenarios.split(","):
+            method, path, body = SCENARIOS[name]
+            # Warm caches, pools and lazy imports before measuring
+            run_load(port, path, method, body, args.concurrency, args.warmup, keepalive=True)
+            idle = rss_bytes(proc.pid)
+            with RssSampler(proc.pid) as sampler:
+                latencies, errors, elapsed = run_load(
+                    port, path, method, body, args.concurrency, args.duration, keepalive=True
+                )
+            row = summarize(target, latencies, errors, elapsed)
+            row.pop("mode")
+            results.append({
+                "target": target,
+                "scenario": name,
+                **row,
+                "rss_idle_mb": idle / 2**20,
+                "rss_peak_mb": sampler.peak / 2**20,
+            })
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions against a previous --json run"""
+    previous = {(r["target"], r["scenario"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["target"], r["scenario"]))
+        if not old:
+            continue
+        if r["rps"] < old["rps"] * (1 - tolerance):
+            regressions.append(f"{r['target']} {r['scenario']}: req/s {old['rps']:.0f} -> {r['rps']:.0f}")
+        if r["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{r['target']} {r['scenario']}: p99 {old['p99_ms']:.2f}ms -> {r['p99_ms']:.2f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for both Python APIs")
+    parser.add_argument("--targets", default="simple:single,simple:threaded,simple:prefork,fastapi",
+                        help="comma-separated: simple:<mode> and/or fastapi")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=0.5)
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="fake socket latency per call")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="extra bytes per socket response")
+    parser.add_argument("--framing", choices=["newline", "length"], default="newline")
+    parser.add_argument("--chunked", action="store_true", help="chunked tappd.sock responses")
+    parser.add_argument("--workers", type=int, default=16, help="simple API threads per process")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="simple API processes in prefork mode")
+    parser.add_argument("--uvicorn-workers", type=int, default=1)
+    parser.add_argument("--baseline", help="previous --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="fake-dstack-")
+    fake, (dstack_path, tappd_path) = start_fake_sockets(directory, args)
+    env = dict(os.environ, DSTACK_SOCKET_PATH=dstack_path, TAPPD_SOCKET_PATH=tappd_path)
+    # The suite measures server capacity from one client; quote admission would only return 429s
+    env.setdefault("ADMISSION_ENABLED", "false")
+    results = []
+    try:
+        for target in args.targets.split(","):
+            results.extend(run_target(target, env, args))
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("baseline", "json")}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.json:
+        print(json.dumps({"config": config, "results": results, "regressions": regressions}, indent=2))
+    else:
+        print(f"concurrency={args.concurrency} duration={args.duration}s "
+              f"socket_latency={args.latency_ms}ms payload={args.payload_bytes}B")
+        print(f"{'target':<17}{'scenario':<10}{'requests':>9}{'errors':>7}{'req/s':>8}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'rss MB':>8}{'peak MB':>9}")
+        for r in results:
+            print(f"{r['target']:<17}{r['scenario']:<10}{r['requests']:>9}{r['errors']:>7}{r['rps']:>8.0f}"
+                  f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}"
+                  f"{r['rss_idle_mb']:>8.1f}{r['rss_peak_mb']:>9.1f}")
+        for line in regressions:
+            print(f"REGRESSION {line}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
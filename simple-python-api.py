@@ -3,14 +3,28 @@
 Fixed dstack Python API for TEE Trust Validator
 """
 
+import base64
+import bisect
 import json
 import os
+import secrets
+import shutil
 import socket
 import hashlib
+import hmac
+import math
+import signal
 import subprocess
-from datetime import datetime
+import sys
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
 import threading
+import time
 
 # Import real dstack SDK
 try:
@@ -20,295 +34,1801 @@ except ImportError:
     DSTACK_AVAILABLE = False
     print("Warning: dstack_sdk not available - using fallback mode")
 
-class TEEAPIHandler(BaseHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        # Initialize dstack client if available
-        self.dstack_client = None
-        if DSTACK_AVAILABLE:
+# Fast JSON path: orjson when installed, compact stdlib encoding otherwise
+try:
+    import orjson
+
+    def _dumps(data):
+        return orjson.dumps(data)
+
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+    def _dumps(data):
+        return _json_encoder.encode(data).encode('utf-8')
+
+    JSON_BACKEND = "json"
+
+# Modules shared with the FastAPI backend: the image copies them next to this
+# file; in a source checkout they are imported from the template's api directory
+_SHARED_API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "templates", "remote-attestation-template", "api")
+if os.path.isdir(_SHARED_API_DIR) and _SHARED_API_DIR not in sys.path:
+    sys.path.append(_SHARED_API_DIR)
+
+# Token bucket keys: a valid X-API-Key, else the client address (proxy-aware via TRUSTED_PROXIES)
+from admission import client_identity
+# SQLite store of generated attestations, opt-in through ATTESTATION_STORE_ENABLED
+from attestation_store import STORE_ENABLED, AttestationStore, quote_hash
+# Full DCAP verification (signatures, PCK chain and CRL, TCB info, QE identity); needs `cryptography`
+from quote_verifier import QuoteVerifier
+
+# Serving configuration
+SERVER_MODE = os.getenv("API_SERVER_MODE", "threaded")  # single | threaded | prefork
+SERVER_WORKERS = int(os.getenv("API_WORKERS", 16))
+SERVER_PROCESSES = int(os.getenv("API_PROCESSES", os.cpu_count() or 1))
+RESPAWN_BACKOFF = float(os.getenv("API_RESPAWN_BACKOFF", 0.5))  # doubles per recent worker death
+RESPAWN_BACKOFF_MAX = float(os.getenv("API_RESPAWN_BACKOFF_MAX", 30))
+CRASH_LIMIT = int(os.getenv("API_CRASH_LIMIT", 10))  # worker deaths per window before the supervisor exits
+CRASH_WINDOW = float(os.getenv("API_CRASH_WINDOW", 60))
+SERVER_BACKLOG = int(os.getenv("API_BACKLOG", 128))
+SERVER_QUEUE_DEPTH = int(os.getenv("API_QUEUE_DEPTH", 64))
+REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", 30))
+KEEPALIVE_TIMEOUT = float(os.getenv("API_KEEPALIVE_TIMEOUT", 5))
+MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", 1024 * 1024))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", 200))
+METRICS_SPOOL_INTERVAL = float(os.getenv("METRICS_SPOOL_INTERVAL", 1))  # prefork snapshot period
+
+DSTACK_SOCKET = os.getenv("DSTACK_SOCKET_PATH", "/var/run/dstack.sock")
+TAPPD_SOCKET = os.getenv("TAPPD_SOCKET_PATH", "/var/run/tappd.sock")
+SOCKET_RECHECK_INTERVAL = float(os.getenv("DSTACK_SOCKET_RECHECK", 1.0))
+
+
+class DstackClientRegistry:
+    """Process-wide, lazily created dstack client shared by all handler threads
+
+    The sockets are re-probed at most once per recheck interval. The client is
+    rebuilt when the socket it was bound to disappears or is recreated (new
+    inode/ctime), or when another socket becomes the preferred one; keys
+    cached from the old client are dropped then.
+    """
+
+    def __init__(self, socket_paths=(DSTACK_SOCKET, TAPPD_SOCKET),
+                 recheck_interval=SOCKET_RECHECK_INTERVAL):
+        self.socket_paths = tuple(socket_paths)
+        self.recheck_interval = recheck_interval
+        self._lock = threading.Lock()
+        self._client = None
+        self._identity = None
+        self._available = {path: False for path in self.socket_paths}
+        self._checked_at = None
+        self._pid = None
+
+    @staticmethod
+    def _socket_identity(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_dev, st.st_ino, st.st_ctime_ns)
+
+    def _refresh_locked(self, now):
+        identities = {path: self._socket_identity(path) for path in self.socket_paths}
+        self._available = {path: ident is not None for path, ident in identities.items()}
+        self._checked_at = now
+
+        preferred = next((ident for ident in identities.values() if ident), None)
+        pid = os.getpid()
+        if preferred == self._identity and pid == self._pid:
+            return
+
+        # Socket went away, came back, or we are a freshly forked worker
+        self._client = None
+        self._identity = preferred
+        self._pid = pid
+        KEY_CACHE.clear()
+        if preferred and DSTACK_AVAILABLE:
             try:
-                if os.path.exists("/var/run/dstack.sock"):
-                    self.dstack_client = DstackClient("/var/run/dstack.sock")
-                elif os.path.exists("/var/run/tappd.sock"):
-                    self.dstack_client = DstackClient("/var/run/tappd.sock")
+                self._client = DstackClient(preferred[0])
             except Exception as e:
                 print(f"Could not initialize dstack client: {e}")
-        
-        super().__init__(*args, **kwargs)
+                # Retry on the next probe instead of caching the failure
+                self._identity = None
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if (self._checked_at is not None and self._pid == os.getpid()
+                and now - self._checked_at < self.recheck_interval):
+            return
+        with self._lock:
+            if (self._checked_at is None or self._pid != os.getpid()
+                    or now - self._checked_at >= self.recheck_interval):
+                self._refresh_locked(now)
+
+    def get(self):
+        """Return the shared client, or None when no socket/SDK is available"""
+        self._maybe_refresh()
+        return self._client
+
+    def available(self, path):
+        """Whether the socket at path existed at the last probe"""
+        self._maybe_refresh()
+        return self._available.get(path, False)
+
+    def invalidate(self):
+        """Force a re-probe and client rebuild on next access"""
+        with self._lock:
+            self._checked_at = None
+            self._identity = None
+
+
+DSTACK_CLIENTS = DstackClientRegistry()
+
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", 10))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", 5))
+
+
+class TeeSocketProbe:
+    """Whether a TEE socket accepts connections, re-checked at most once per interval
+
+    Readiness reads this instead of dialing the socket on every probe request;
+    concurrent checks while a probe is running wait for its result.
+    """
+
+    def __init__(self, socket_paths=(DSTACK_SOCKET, TAPPD_SOCKET), interval=HEALTH_PROBE_INTERVAL,
+                 timeout=HEALTH_PROBE_TIMEOUT):
+        self.socket_paths = tuple(socket_paths)
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._result = (None, None)
+        self._checked_at = None
+
+    def check(self):
+        """(path of the socket that answered or None, last error or None)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.interval:
+                self._result = self._probe()
+                self._checked_at = now
+            return self._result
+
+    def _probe(self):
+        error = "No TEE socket present"
+        for path in self.socket_paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.settimeout(self.timeout)
+                    sock.connect(path)
+                return path, None
+            except OSError as e:
+                error = f"{path}: {e}"
+        return None, error
+
+
+TEE_PROBE = TeeSocketProbe()
+
+
+KEY_CACHE_MAX_ENTRIES = int(os.getenv("KEY_CACHE_MAX_ENTRIES", 1024))
+KEY_CACHE_TTL = float(os.getenv("KEY_CACHE_TTL", 3600))
+KEY_BATCH_MAX_ITEMS = int(os.getenv("KEY_BATCH_MAX_ITEMS", 256))
+KEY_FETCH_CONCURRENCY = int(os.getenv("KEY_FETCH_CONCURRENCY", 8))
+KEY_DERIVE_TIMEOUT = float(os.getenv("KEY_DERIVE_TIMEOUT", 10))
+
+
+def _zeroize(buffer):
+    buffer[:] = bytes(len(buffer))
+
+
+class KeyCache:
+    """LRU cache of derived keys per (path, purpose), zeroized when dropped
+
+    Key material is held in bytearrays and overwritten in place when an
+    entry is evicted, expires or is invalidated (responses carry a hex
+    copy). Misses from concurrent requests are derived once: a key already
+    being fetched is waited for, up to timeout seconds, instead of fetched
+    again.
+    """
+
+    def __init__(self, max_entries=KEY_CACHE_MAX_ENTRIES, ttl=KEY_CACHE_TTL, timeout=KEY_DERIVE_TIMEOUT):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.timeout = timeout
+        self._entries = OrderedDict()  # (path, purpose) -> (material, extra, expires_at)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.timeouts = 0
+
+    def _drop_locked(self, key):
+        material = self._entries.pop(key)[0]
+        _zeroize(material)
+        self.evictions += 1
+
+    def get_many(self, keys, derive, errors=None):
+        """{key: (hex material, extra, cached)} for keys; derive(missing) -> {key: (bytes, extra) or exception}
+
+        A key that fails raises, unless errors is a dict, which then collects
+        {key: exception} and leaves the key out of the result.
+        """
+        results, missing, waiting = {}, [], []
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry and entry[2] <= now:
+                    self._drop_locked(key)
+                    entry = None
+                if entry:
+                    self._entries.move_to_end(key)
+                    results[key] = (entry[0].hex(), entry[1], True)
+                    self.hits += 1
+                elif key in self._in_flight:
+                    waiting.append((key, self._in_flight[key]))
+                    self.coalesced += 1
+                else:
+                    self._in_flight[key] = [threading.Event(), None, None]
+                    missing.append(key)
+                    self.misses += 1
+
+        failed = {}
+        if missing:
+            try:
+                derived, error = derive(missing), None
+            except Exception as e:
+                derived, error = {}, e
+            with self._lock:
+                expires_at = time.monotonic() + self.ttl
+                for key in missing:
+                    waiter = self._in_flight.pop(key)
+                    if isinstance(derived.get(key), Exception):
+                        waiter[2] = derived[key]
+                    elif key in derived:
+                        material, extra = derived[key]
+                        material = bytearray(material)
+                        if key in self._entries:
+                            self._drop_locked(key)
+                        self._entries[key] = (material, extra, expires_at)
+                        waiter[1] = results[key] = (material.hex(), extra, False)
+                    else:
+                        waiter[2] = error or KeyError(key)
+                    if waiter[2] is not None:
+                        failed[key] = waiter[2]
+                    waiter[0].set()
+                while len(self._entries) > self.max_entries:
+                    self._drop_locked(next(iter(self._entries)))
+        for key, error in failed.items():
+            self._fail(key, error, errors)
+
+        for key, waiter in waiting:
+            if not waiter[0].wait(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                self._fail(key, TimeoutError(f"Timed out waiting for key {key[0]!r}"), errors)
+            elif waiter[2] is not None:
+                self._fail(key, waiter[2], errors)
+            else:
+                results[key] = waiter[1][:2] + (True,)
+        return results
+
+    @staticmethod
+    def _fail(key, error, errors):
+        if errors is None:
+            raise error
+        errors[key] = error
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop_locked(key)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "timeouts": self.timeouts,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+KEY_CACHE = KeyCache()
+KEY_FETCH_POOL = ThreadPoolExecutor(max_workers=KEY_FETCH_CONCURRENCY, thread_name_prefix="tee-key")
+
+
+def _demo_key(key):
+    return hashlib.sha256(f"key_{key[0]}".encode()).digest()
+
+
+def _tee_keys(keys, errors=None):
+    """{key: (hex material, source, cached)} for (path, purpose) keys, as KeyCache.get_many
+
+    Keys are cached only when they come from dstack. Demo keys are cheap and
+    must not outlive the demo fallback, so they are computed per request.
+    """
+    client = DSTACK_CLIENTS.get()
+    if client is None:
+        DEMO_FALLBACKS.inc(("tee_key",))
+        return {key: (_demo_key(key).hex(), "Demo Mode", False) for key in dict.fromkeys(keys)}
+    return KEY_CACHE.get_many(keys, lambda missing: _derive_keys(client, missing), errors)
+
+
+def _derive_keys(client, keys):
+    """Derive (path, purpose) keys from the dstack socket
+
+    dstack has no multi-key call, so this is a fan-out, not a true batch: one
+    get_key round-trip per key, KEY_FETCH_CONCURRENCY at a time on
+    KEY_FETCH_POOL. A key that fails, or is not back within
+    KEY_DERIVE_TIMEOUT, maps to its exception; a stuck call keeps its pool
+    thread but no longer holds up the request or the callers waiting on it.
+    """
+    def fetch(key):
+        response = client.get_key(key[0], key[1])
+        return bytes.fromhex(response.key), "Real dstack SDK"
+
+    futures = {key: KEY_FETCH_POOL.submit(fetch, key) for key in keys}
+    deadline = time.monotonic() + KEY_CACHE.timeout
+    derived = {}
+    for key, future in futures.items():
+        try:
+            derived[key] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            derived[key] = TimeoutError(f"Deriving key {key[0]!r} timed out")
+        except Exception as e:
+            derived[key] = e
+    return derived
+
+
+def _key_record(path, purpose, derived):
+    material, source, cached = derived
+    return {
+        "key_id": f"key-{path}",
+        "path": path,
+        "purpose": purpose,
+        "key_data": material,
+        "cached": cached,
+        "timestamp": datetime.now().isoformat(),
+        "source": source
+    }
+
+
+def _load_tcb_info(app_id):
+    return {
+        "mrtd": hashlib.sha256(f"mrtd_{app_id}".encode()).hexdigest(),
+        "rtmr0": hashlib.sha256(f"rtmr0_{app_id}".encode()).hexdigest(),
+        "rtmr1": hashlib.sha256(f"rtmr1_{app_id}".encode()).hexdigest(),
+        "rtmr2": hashlib.sha256(f"rtmr2_{app_id}".encode()).hexdigest(),
+        "rtmr3": hashlib.sha256(f"rtmr3_{app_id}".encode()).hexdigest(),
+    }
+
+
+def _load_measurements(app_id, device_id):
+    return {
+        **_load_tcb_info(app_id),
+        "device_id": device_id,
+        "os_image_hash": hashlib.sha256(b"DStack 0.5.3").hexdigest(),
+        "compose_hash": hashlib.sha256(f"compose_{app_id}".encode()).hexdigest(),
+        "source": "TEE Measurements"
+    }
+
+
+class ResponseTemplate:
+    """Pre-serialized response bytes with the timestamp spliced in per request
+
+    Every value equal to TIMESTAMP in the payload becomes a split point, so
+    a response is the compiled parts joined around the request time.
+    render() additionally rebuilds the parts whenever its key (the inputs
+    that can change) differs from the last render.
+    """
+
+    TIMESTAMP = "__response_timestamp__"
+    _MARKER = b'"__response_timestamp__"'
+
+    def __init__(self):
+        self._state = (object(), None)
+
+    @classmethod
+    def compile(cls, payload):
+        return tuple(_dumps(payload).split(cls._MARKER))
+
+    @staticmethod
+    def fill(parts, timestamp):
+        return (b'"' + timestamp.encode() + b'"').join(parts)
+
+    def render(self, key, build, timestamp):
+        cached_key, parts = self._state
+        if parts is None or cached_key != key:
+            parts = self.compile(build())
+            self._state = (key, parts)
+        return self.fill(parts, timestamp)
+
+    def reset(self):
+        self._state = (object(), None)
+
+
+SYSTEM_SAMPLE_INTERVAL = float(os.getenv("SYSTEM_SAMPLE_INTERVAL", 5))
+SYSTEM_HISTORY_SIZE = int(os.getenv("SYSTEM_HISTORY_SIZE", 720))  # one hour at the default interval
+
+SAMPLE_FIELDS = ("mem_total_kb", "mem_available_kb", "mem_used_kb", "load1", "load5", "load15",
+                 "procs_running", "procs_total", "uptime_s", "cpu_percent")
+
+
+def _gb(kb):
+    return f"{kb / 1024 / 1024:.1f} GB"
+
+
+class SystemSampler:
+    """Background sampler of /proc/meminfo, loadavg, uptime and stat
+
+    A thread reads procfs every `interval` seconds into a ring buffer of
+    `size` samples, so handlers serve the latest values and history windows
+    from memory and never touch procfs. cpu_percent is the busy share of
+    /proc/stat jiffies since the previous sample. Each process starts its
+    own thread when it starts serving (or on first use), so prefork workers
+    keep their own history. Fields that cannot be read (no procfs) are None.
+    """
+
+    def __init__(self, interval=SYSTEM_SAMPLE_INTERVAL, size=SYSTEM_HISTORY_SIZE):
+        self.interval = interval
+        self.size = size
+        self._pid = None
+        self._init_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+        self._seq = 0
+        self._prev_cpu = None
+        self._latest = self._sample()
+        self._samples.append(self._latest)
+
+    @staticmethod
+    def _read_meminfo():
+        fields = {}
+        with open('/proc/meminfo', 'rb') as f:
+            for line in f:
+                name, _, rest = line.partition(b':')
+                if name in (b'MemTotal', b'MemAvailable'):
+                    fields[name] = int(rest.split()[0])
+                    if len(fields) == 2:
+                        break
+        total, available = fields[b'MemTotal'], fields[b'MemAvailable']
+        return {"mem_total_kb": total, "mem_available_kb": available, "mem_used_kb": total - available}
+
+    @staticmethod
+    def _read_loadavg():
+        with open('/proc/loadavg', 'rb') as f:
+            load1, load5, load15, procs = f.read().split()[:4]
+        running, _, total = procs.partition(b'/')
+        return {"load1": float(load1), "load5": float(load5), "load15": float(load15),
+                "procs_running": int(running), "procs_total": int(total)}
+
+    @staticmethod
+    def _read_uptime():
+        with open('/proc/uptime', 'rb') as f:
+            return {"uptime_s": float(f.read().split()[0])}
+
+    def _read_cpu(self):
+        with open('/proc/stat', 'rb') as f:
+            # cpu user nice system idle iowait irq softirq steal (guest time is already in user)
+            jiffies = [int(v) for v in f.readline().split()[1:9]]
+        idle, total = jiffies[3] + jiffies[4], sum(jiffies)
+        previous, self._prev_cpu = self._prev_cpu, (idle, total)
+        if previous is None or total == previous[1]:
+            return {}
+        return {"cpu_percent": round(100 * (1 - (idle - previous[0]) / (total - previous[1])), 1)}
+
+    def _sample(self):
+        self._seq += 1
+        sample = dict.fromkeys(SAMPLE_FIELDS)
+        sample["seq"] = self._seq
+        sample["time"] = time.time()
+        for reader in (self._read_meminfo, self._read_loadavg, self._read_uptime, self._read_cpu):
+            try:
+                sample.update(reader())
+            except (OSError, ValueError, IndexError, KeyError):
+                pass
+        return sample
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            sample = self._sample()
+            with self._lock:
+                self._samples.append(sample)
+                self._latest = sample
+
+    def start(self):
+        """Start this process's sampler thread if it is not running yet"""
+        if self._pid == os.getpid():
+            return
+        with self._init_lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name="system-sampler", daemon=True).start()
+                self._pid = os.getpid()
+
+    def latest(self):
+        self.start()
+        return self._latest
+
+    def history(self, window):
+        """Samples from the last `window` seconds, oldest first"""
+        self.start()
+        cutoff = time.time() - window
+        with self._lock:
+            return [sample for sample in self._samples if sample["time"] >= cutoff]
+
+
+SYSTEM_SAMPLER = SystemSampler()
+
+
+class MeasurementSnapshot:
+    """Identity, measurements and pre-serialized bodies for the TEE info GETs
+
+    The identity and measurements behind /api/tee/info, /api/tee/measurements
+    and /api/node/info are fixed for the life of a CVM, so they are read
+    from the environment and hashed once. The measurements body is
+    serialized once with a timestamp placeholder; the other two also carry
+    live system stats and are re-serialized once per system sample (see
+    ResponseTemplate.render). Snapshots are immutable: refresh_snapshot()
+    (SIGHUP or POST /api/snapshot/refresh) builds a new one and swaps it in
+    whole.
+    """
+
+    __slots__ = ("generation", "built_at", "build_ms", "app_id", "device_id", "instance_id",
+                 "tcb_info", "measurements", "measurements_parts")
+
+    def __init__(self, generation=1):
+        start = time.perf_counter()
+        app_id = os.getenv("APP_ID", "app_55531fcff1d542372a3fb0627f1fc12721f2fa24")
+        device_id = os.getenv("DEVICE_ID", "tee-device-001")
+        instance_id = os.getenv("INSTANCE_ID", "6de516cec046f6e4a301d45ead2bde6e83fd6ed0")
+        measurements = _load_measurements(app_id, device_id)
+        tcb_info = {name: measurements[name] for name in ("mrtd", "rtmr0", "rtmr1", "rtmr2", "rtmr3")}
+        fields = {
+            "generation": generation,
+            "built_at": datetime.now().isoformat(),
+            "app_id": app_id,
+            "device_id": device_id,
+            "instance_id": instance_id,
+            "tcb_info": tcb_info,
+            "measurements": measurements,
+            "measurements_parts": ResponseTemplate.compile({
+                "status": "success",
+                "measurements": {**measurements, "timestamp": ResponseTemplate.TIMESTAMP},
+                "timestamp": ResponseTemplate.TIMESTAMP
+            }),
+        }
+        fields["build_ms"] = (time.perf_counter() - start) * 1000
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MeasurementSnapshot is immutable; use refresh_snapshot()")
+
+    def tee_info(self, sample, dstack_available, tappd_available):
+        memory_info = {"total": "2.0 GB", "used": "0.4 GB", "available": "1.6 GB"}
+        if sample["mem_total_kb"] is not None:
+            memory_info = {"total": _gb(sample["mem_total_kb"]), "used": _gb(sample["mem_used_kb"]),
+                           "available": _gb(sample["mem_available_kb"])}
+        return {
+            "status": "success",
+            "info": {
+                "app_id": self.app_id,
+                "device_id": self.device_id,
+                "operating_system": "DStack 0.5.3",
+                "kernel_version": "6.9.0-dstack",
+                "cpu": "CPU (2 cores)",
+                "memory": memory_info,
+                "tcb_info": self.tcb_info,
+                "attestation_explorer": "https://proof.t16z.com/",
+                "node_dashboard": f"https://{self.device_id[:8]}-8090.dstack-pha-prod7.phala.network/",
+                "dstack_available": dstack_available,
+                "tappd_available": tappd_available,
+                "real_tee": dstack_available,
+                "environment": "production"
+            },
+            "timestamp": ResponseTemplate.TIMESTAMP
+        }
+
+    def node_info(self, sample):
+        system_info = {
+            "os": "DStack 0.5.3",
+            "kernel": "6.9.0-dstack",
+            "uptime": "7200 seconds",
+            "load_avg": "1min: 0.05, 5min: 0.10, 15min: 0.12",
+            "cpu_percent": sample["cpu_percent"],
+            "sampled_at": datetime.fromtimestamp(sample["time"]).isoformat()
+        }
+        if sample["uptime_s"] is not None:
+            system_info["uptime"] = f"{int(sample['uptime_s'])} seconds"
+        if sample["load1"] is not None:
+            system_info["load_avg"] = (f"1min: {sample['load1']:.2f}, 5min: {sample['load5']:.2f}, "
+                                       f"15min: {sample['load15']:.2f}")
+
+        containers = [{
+            "name": "tee-trust-validator",
+            "status": "Running",
+            "logs_url": "/logs/tee-trust-validator"
+        }]
+
+        return {
+            "status": "success",
+            "node_info": {
+                "dashboard_url": f"https://{self.instance_id}-8090.dstack-pha-prod7.phala.network/",
+                "app_id": self.app_id,
+                "instance_id": self.instance_id,
+                "containers": containers,
+                "system_info": system_info,
+                "attestation_explorer": "https://proof.t16z.com/"
+            },
+            "timestamp": ResponseTemplate.TIMESTAMP
+        }
+
+    def stats(self):
+        return {
+            "generation": self.generation,
+            "built_at": self.built_at,
+            "build_ms": round(self.build_ms, 3),
+            "app_id": self.app_id,
+            "device_id": self.device_id,
+            "instance_id": self.instance_id,
+        }
+
+
+SNAPSHOT = MeasurementSnapshot()
+TEE_INFO_TEMPLATE = ResponseTemplate()
+NODE_INFO_TEMPLATE = ResponseTemplate()
+
+
+# Reentrant: SIGHUP may interrupt a refresh running on the main thread (single mode)
+_SNAPSHOT_LOCK = threading.RLock()
+
+
+def refresh_snapshot(signum=None, frame=None):
+    """Rebuild the snapshot from the current environment and swap it in (also the SIGHUP handler)"""
+    global SNAPSHOT
+    with _SNAPSHOT_LOCK:
+        # Two concurrent refreshes get distinct generations instead of both bumping the same one
+        SNAPSHOT = MeasurementSnapshot(SNAPSHOT.generation + 1)
+        return SNAPSHOT
+
+
+# Set in prefork workers so a refresh request can reach every worker through the parent
+PREFORK_PARENT_PID = None
+# Bearer token for POST /api/snapshot/refresh; unset, only loopback clients may refresh
+SNAPSHOT_REFRESH_TOKEN = os.getenv("SNAPSHOT_REFRESH_TOKEN", "")
+
+
+def refresh_snapshot_everywhere():
+    """Refresh the snapshot once in every process; returns the new snapshot, or None if pending
+
+    In prefork the parent is asked to do it: it refreshes itself and signals
+    each worker, this one included, so every process refreshes exactly once
+    and generations stay in step. The request thread does not wait for that
+    and gets None.
+    """
+    if not (PREFORK_PARENT_PID and hasattr(signal, "SIGHUP")):
+        return refresh_snapshot()
+    os.kill(PREFORK_PARENT_PID, signal.SIGHUP)
+    return None
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 10000))
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", 20))  # quote requests per second per client
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", 40))
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", 4))  # quotes the TEE serves at once
+ADMISSION_QUEUE_DEPTH = int(os.getenv("ADMISSION_QUEUE_DEPTH", 32))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 5))
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", 10000))
+
+
+class AdmissionController:
+    """Per-client token buckets in front of a bounded pool of quote slots
+
+    A request spends a token from its client's bucket, then takes one of
+    `concurrency` slots. At most `queue_depth` requests wait for a slot, for
+    no longer than `queue_timeout`. Refusals carry the seconds until a retry
+    is worth making, sent back as 429 with Retry-After. In prefork mode each
+    process applies the limits on its own.
+    """
+
+    def __init__(self, rate=ADMISSION_RATE, burst=ADMISSION_BURST, concurrency=ADMISSION_CONCURRENCY,
+                 queue_depth=ADMISSION_QUEUE_DEPTH, queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                 max_clients=ADMISSION_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> [tokens, last refill], least recently seen first
+        self._slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_use = 0
+        self._hold = 0.05  # moving average of slot hold time, for Retry-After estimates
+        self.admitted = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.timed_out = 0
+
+    def _take_token_locked(self, client):
+        """0 when the client had a token to spend, else seconds until it has one"""
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [self.burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def _queue_wait_locked(self):
+        return self._hold * (self._waiting + 1) / self.concurrency
+
+    def acquire(self, client):
+        """None once a slot is held (pair with release()), else (reason, retry_after)"""
+        with self._lock:
+            if self.rate > 0:
+                wait = self._take_token_locked(client)
+                if wait:
+                    self.rate_limited += 1
+                    return "rate_limited", wait
+            if self._slots.acquire(blocking=False):
+                self._in_use += 1
+                self.admitted += 1
+                return None
+            if self._waiting >= self.queue_depth:
+                self.queue_full += 1
+                return "queue_full", self._queue_wait_locked()
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self.timed_out += 1
+                return "queue_timeout", self._queue_wait_locked()
+            self._in_use += 1
+            self.admitted += 1
+        return None
+
+    def release(self, held):
+        with self._lock:
+            self._in_use -= 1
+            self._hold += (held - self._hold) * 0.2
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "concurrency": self.concurrency,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "queue_depth": self.queue_depth,
+                "clients": len(self._buckets),
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "queue_full": self.queue_full,
+                "queue_timeout": self.timed_out,
+            }
+
+
+ADMISSION = AdmissionController() if ADMISSION_ENABLED else None
+
+
+def admission_controlled(handler):
+    """Run a quote-generating handler inside an ADMISSION slot; refusals get 429 with Retry-After"""
+    if ADMISSION is None:
+        return handler
+
+    def admitted(self):
+        rejection = ADMISSION.acquire(client_identity(self.client_address[0], self.headers))
+        if rejection is not None:
+            reason, retry_after = rejection
+            self._send_json_response(429, {"error": "Too many quote requests", "reason": reason},
+                                     {'Retry-After': str(max(1, math.ceil(retry_after)))})
+            return
+        started = time.monotonic()
+        try:
+            handler(self)
+        finally:
+            ADMISSION.release(time.monotonic() - started)
+
+    admitted.__name__ = handler.__name__
+    return admitted
+
+
+def _attestation_context():
+    """Per-request attestation state, shared by every item of a batch"""
+    real_tee = DSTACK_CLIENTS.available(DSTACK_SOCKET)
+    if not real_tee:
+        DEMO_FALLBACKS.inc(("attestation",))
+    return {
+        "device_id": SNAPSHOT.device_id,
+        "real_tee": real_tee,
+        "source": "dstack Socket" if real_tee else "Demo Mode",
+    }
+
+
+def _attestation_record(data, context, attestation_suffix=None):
+    now = datetime.now()
+    return {
+        "attestation_id": f"tee-{attestation_suffix or now.timestamp()}-{secrets.token_hex(4)}",
+        "data": data.get("data", ""),
+        "nonce": data.get("nonce", str(now.timestamp())),
+        "device_id": context["device_id"],
+        "timestamp": now.isoformat(),
+        "environment": "Intel TDX",
+        "dstack_version": "0.5.3",
+        "real_tee": context["real_tee"],
+        "source": context["source"]
+    }
+
+
+# Created before prefork; each worker opens its own connections and writer on first use
+ATTESTATION_STORE = AttestationStore() if STORE_ENABLED else None
+
+
+QUOTE_VERIFIER = QuoteVerifier()
+
+
+def route(method, path):
+    """Register a handler method for method+path in the dispatch table"""
+    def decorator(func):
+        func.__dict__.setdefault("routes", []).append((method, path))
+        return func
+    return decorator
+
+
+class Router:
+    """Method+path dispatch table, built once from @route-decorated handler methods"""
+
+    def __init__(self):
+        self.routes = {}
+        self.allowed = {}
+
+    def add(self, method, path, handler):
+        if (method, path) in self.routes:
+            raise ValueError(f"Duplicate route: {method} {path}")
+        self.routes[(method, path)] = handler
+        self.allowed.setdefault(path, []).append(method)
+
+    @classmethod
+    def from_handler_class(cls, handler_class):
+        router = cls()
+        for attr in vars(handler_class).values():
+            for method, path in getattr(attr, "routes", ()):
+                router.add(method, path, attr)
+        return router
+
+
+# Called as hook(method, route, status, seconds) after every routed request.
+# `route` is the matched route path, or "unmatched", so labels stay bounded.
+ROUTE_HOOKS = []
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metric:
+    """Prometheus counter/gauge/histogram family with a cap on label sets
+
+    Label sets beyond max_series are folded into one "other" series. A
+    histogram series is [per-bucket counts..., +Inf count] plus a sum.
+    """
+
+    def __init__(self, kind, name, help, labels=(), buckets=None, max_series=METRICS_MAX_SERIES):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.buckets = tuple(buckets or ())
+        self.max_series = max_series
+        self._series = {}
+        self._overflow = ("other",) * len(self.labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if labels in self._series or len(self._series) < self.max_series:
+            return labels
+        return self._overflow
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @staticmethod
+    def _labels(names, values, extra=""):
+        pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self):
+        """Copy of every (labels, value) series, safe to use after the lock is released"""
+        with self._lock:
+            if self.kind == "histogram":
+                return [(labels, [value[0][:], value[1]]) for labels, value in self._series.items()]
+            return list(self._series.items())
+
+    def render(self, samples=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in (samples if samples is not None else self.samples()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{self._labels(self.labelnames, labels)} {value}")
+                continue
+            counts, total = value[0], value[1]
+            cumulative = 0
+            for bound, count in zip([f"{b:g}" for b in self.buckets] + ["+Inf"], counts):
+                cumulative += count
+                le = self._labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{self._labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HTTP_REQUESTS = Metric("counter", "http_requests_total", "HTTP requests by method, route and status",
+                       ("method", "route", "status"))
+HTTP_LATENCY = Metric("histogram", "http_request_duration_seconds", "HTTP request latency by method and route",
+                      ("method", "route"), LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = Metric("gauge", "http_requests_in_flight", "HTTP requests currently being served")
+DEMO_FALLBACKS = Metric("counter", "tee_demo_fallback_total",
+                        "Responses served from demo data instead of the TEE", ("operation",))
+
+
+def _observe_request(method, route, status, seconds):
+    HTTP_REQUESTS.inc((method, route, str(status)))
+    HTTP_LATENCY.observe(seconds, (method, route))
+
+
+KEY_CACHE_LOOKUPS = Metric("counter", "tee_key_cache_lookups_total", "Derived-key cache lookups by result",
+                           ("result",))
+KEY_CACHE_EVICTIONS = Metric("counter", "tee_key_cache_evictions_total", "Derived keys zeroized and dropped")
+KEY_CACHE_TIMEOUTS = Metric("counter", "tee_key_cache_timeouts_total",
+                            "Waits on another request's key derivation that timed out")
+KEY_CACHE_ENTRIES = Metric("gauge", "tee_key_cache_entries", "Derived keys currently cached")
+ADMISSION_REJECTED = Metric("counter", "tee_admission_rejected_total", "Quote requests refused with 429, by reason",
+                            ("reason",))
+ADMISSION_WAITING = Metric("gauge", "tee_admission_waiting", "Quote requests waiting for a slot")
+METRIC_FAMILIES = {metric.name: metric for metric in (
+    HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT, DEMO_FALLBACKS, KEY_CACHE_LOOKUPS, KEY_CACHE_EVICTIONS,
+    KEY_CACHE_TIMEOUTS, KEY_CACHE_ENTRIES, ADMISSION_REJECTED, ADMISSION_WAITING)}
+
+
+def collect_metrics():
+    """[(metric, samples)] for this process; key cache and admission series come from their stats"""
+    families = [(metric, metric.samples()) for metric in (HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT,
+                                                          DEMO_FALLBACKS)]
+    keys = KEY_CACHE.stats()
+    families += [
+        (KEY_CACHE_LOOKUPS, [(("hit",), keys["hits"]), (("miss",), keys["misses"]),
+                             (("coalesced",), keys["coalesced"])]),
+        (KEY_CACHE_EVICTIONS, [((), keys["evictions"])]),
+        (KEY_CACHE_TIMEOUTS, [((), keys["timeouts"])]),
+        (KEY_CACHE_ENTRIES, [((), keys["entries"])]),
+    ]
+    if ADMISSION:
+        admission = ADMISSION.stats()
+        families += [
+            (ADMISSION_REJECTED, [((reason,), admission[reason])
+                                  for reason in ("rate_limited", "queue_full", "queue_timeout")]),
+            (ADMISSION_WAITING, [((), admission["waiting"])]),
+        ]
+    return families
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsSpool:
+    """Per-process metric snapshots in a shared directory, summed at scrape time (prefork mode)
+
+    Each worker rewrites its own snapshot every interval seconds and again
+    before it answers a scrape, so whichever worker is scraped reports totals
+    for the whole pool. Snapshots of workers that died are kept so counters
+    never go backwards; only their gauges are dropped.
+    """
+
+    def __init__(self, directory, interval=METRICS_SPOOL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+
+    def write(self):
+        pid = os.getpid()
+        path = os.path.join(self.directory, f"{pid}.json")
+        snapshot = {"pid": pid, "families": {metric.name: samples for metric, samples in collect_metrics()}}
+        with open(path + ".tmp", "wb") as f:
+            f.write(_dumps(snapshot))
+        os.replace(path + ".tmp", path)
+
+    def start(self):
+        """Write this process's snapshot now and then every interval, from a daemon thread"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.write()
+        threading.Thread(target=self._run, name="metrics-spool", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Could not write metrics snapshot: {e}")
+
+    def collect(self):
+        """[(metric, samples)] summed over the latest snapshot of every worker"""
+        self.write()
+        totals = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    snapshot = json.loads(f.read())
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(snapshot["pid"])
+            for family, samples in snapshot["families"].items():
+                metric = METRIC_FAMILIES.get(family)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                merged = totals.setdefault(family, {})
+                for labels, value in samples:
+                    labels = tuple(labels)
+                    current = merged.get(labels)
+                    if metric.kind != "histogram":
+                        merged[labels] = (current or 0) + value
+                    elif current is None:
+                        merged[labels] = [list(value[0]), value[1]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+        return [(metric, list(totals[name].items())) for name, metric in METRIC_FAMILIES.items() if name in totals]
+
+
+# Set by the prefork supervisor before it forks; None serves this process's own metrics
+METRICS_SPOOL = None
+
+
+def render_metrics():
+    """Prometheus text exposition for this process, or for every worker in prefork mode"""
+    lines = []
+    for metric, samples in (METRICS_SPOOL.collect() if METRICS_SPOOL else collect_metrics()):
+        lines.extend(metric.render(samples))
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+if METRICS_ENABLED:
+    ROUTE_HOOKS.append(_observe_request)
+
+
+class TEEAPIHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive; every response carries Content-Length
+    protocol_version = "HTTP/1.1"
+    # Drop idle or stalled connections so they cannot pin a worker forever
+    timeout = REQUEST_TIMEOUT
+    # Buffer each response into one write (flushed after every request) and
+    # disable Nagle, so headers and body never wait on a delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    @property
+    def dstack_client(self):
+        return DSTACK_CLIENTS.get()
+
+    def handle(self):
+        """Serve keep-alive requests, with a shorter idle timeout after the first"""
+        self.close_connection = True
+        self.handle_one_request()
+        if not self.close_connection:
+            # An idle keep-alive client should not hold a worker for long
+            self.connection.settimeout(KEEPALIVE_TIMEOUT)
+        while not self.close_connection:
+            self.handle_one_request()
+    
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
     
-    def _send_json_response(self, status_code, data):
+    def _dispatch(self):
+        """Resolve method+path in the route table and run the handler"""
+        path, _, self.query_string = self.path.partition('?')
+        self._query = None
+        self._body_read = False
+        self.response_status = None
+        handler = ROUTER.routes.get((self.command, path))
+        label = path if handler is not None else "unmatched"
+        if METRICS_ENABLED:
+            HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            try:
+                self.content_length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                self.content_length = -1
+            if self.content_length < 0:
+                self._send_json_response(400, {"error": "Invalid Content-Length"}, {'Connection': 'close'})
+            elif self.content_length > MAX_BODY_BYTES:
+                # Reject before reading anything from the socket
+                self._send_json_response(413, {"error": "Request body too large", "limit": MAX_BODY_BYTES},
+                                         {'Connection': 'close'})
+            elif handler is None:
+                allowed = ROUTER.allowed.get(path)
+                if allowed:
+                    self._send_json_response(405, {"error": "Method not allowed", "path": path},
+                                             {'Allow': ', '.join(allowed + ['OPTIONS'])})
+                else:
+                    self._send_json_response(404, {"error": "Not found", "path": path})
+            else:
+                handler(self)
+        finally:
+            # Discard an unparsed body so it is not read as the next request
+            if 0 < self.content_length <= MAX_BODY_BYTES and not self._body_read:
+                self._body_read = True
+                self.rfile.read(self.content_length)
+            if METRICS_ENABLED:
+                HTTP_IN_FLIGHT.inc(amount=-1)
+            if ROUTE_HOOKS:
+                elapsed = time.perf_counter() - start
+                for hook in ROUTE_HOOKS:
+                    hook(self.command, label, self.response_status, elapsed)
+    
+    do_GET = _dispatch
+    do_POST = _dispatch
+    
+    def json_body(self):
+        """Read and parse the JSON request body on first use; {} when absent or invalid"""
+        if self._body_read:
+            return self._json_body
+        self._body_read = True
+        self._json_body = {}
+        if self.content_length > 0:
+            post_data = self.rfile.read(self.content_length)
+            try:
+                self._json_body = json.loads(post_data.decode('utf-8'))
+            except:
+                pass
+        return self._json_body
+    
+    @property
+    def query(self):
+        """Query string parameters, first value per name, parsed on first use"""
+        if self._query is None:
+            self._query = {k: v[0] for k, v in parse_qs(self.query_string).items()}
+        return self._query
+    
+    def _send_json_response(self, status_code, data, headers=None):
         """Send JSON response with proper headers"""
+        self._send_json_bytes(status_code, _dumps(data), headers)
+    
+    def _send_json_bytes(self, status_code, body, headers=None):
+        """Send an already serialized JSON body"""
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.send_header('Access-Control-Allow-Origin', '*')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.wfile.write(body)
     
-    def do_GET(self):
-        if self.path == '/api/tee/info':
-            # Simplified TEE info - fast response
-            app_id = os.getenv("APP_ID", "app_55531fcff1d542372a3fb0627f1fc12721f2fa24")
-            device_id = os.getenv("DEVICE_ID", "tee-device-001")
-            
-            # Quick memory check
-            memory_info = {"total": "2.0 GB", "used": "0.4 GB", "available": "1.6 GB"}
-            try:
-                with open('/proc/meminfo', 'r') as f:
-                    lines = f.readlines()[:3]
-                    for line in lines:
-                        if 'MemTotal' in line:
-                            total = int(line.split()[1]) / 1024 / 1024
-                            memory_info['total'] = f"{total:.1f} GB"
-                            break
-            except:
-                pass
-            
-            # Generate deterministic TCB info
-            tcb_info = {
-                "mrtd": hashlib.sha256(f"mrtd_{app_id}".encode()).hexdigest(),
-                "rtmr0": hashlib.sha256(f"rtmr0_{app_id}".encode()).hexdigest(),
-                "rtmr1": hashlib.sha256(f"rtmr1_{app_id}".encode()).hexdigest(),
-                "rtmr2": hashlib.sha256(f"rtmr2_{app_id}".encode()).hexdigest(),
-                "rtmr3": hashlib.sha256(f"rtmr3_{app_id}".encode()).hexdigest(),
-            }
-            
-            response = {
-                "status": "success",
-                "info": {
-                    "app_id": app_id,
-                    "device_id": device_id,
-                    "operating_system": "DStack 0.5.3",
-                    "kernel_version": "6.9.0-dstack",
-                    "cpu": "CPU (2 cores)",
-                    "memory": memory_info,
-                    "tcb_info": tcb_info,
-                    "attestation_explorer": "https://proof.t16z.com/",
-                    "node_dashboard": f"https://{device_id[:8]}-8090.dstack-pha-prod7.phala.network/",
-                    "dstack_available": os.path.exists("/var/run/dstack.sock"),
-                    "tappd_available": os.path.exists("/var/run/tappd.sock"),
-                    "real_tee": os.path.exists("/var/run/dstack.sock"),
-                    "environment": "production"
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        elif self.path == '/api/health':
-            response = {
-                "status": "healthy",
-                "service": "dstack TEE API",
-                "version": "1.0.0",
-                "timestamp": datetime.now().isoformat(),
-                "working": True,
-                "dstack_available": os.path.exists("/var/run/dstack.sock"),
-                "tappd_available": os.path.exists("/var/run/tappd.sock")
-            }
-            self._send_json_response(200, response)
-        
+    @route('GET', '/api/tee/info')
+    def _get_tee_info(self):
+        # Re-serialized only when the snapshot, the system sample or socket availability changes
+        snapshot, sample = SNAPSHOT, SYSTEM_SAMPLER.latest()
+        available = (DSTACK_CLIENTS.available(DSTACK_SOCKET), DSTACK_CLIENTS.available(TAPPD_SOCKET))
+        body = TEE_INFO_TEMPLATE.render((snapshot, sample["seq"], available),
+                                        lambda: snapshot.tee_info(sample, *available),
+                                        datetime.now().isoformat())
+        self._send_json_bytes(200, body)
+    
+    @route('GET', '/api/health')
+    def _get_health(self):
+        response = {
+            "status": "healthy",
+            "service": "dstack TEE API",
+            "version": "1.0.0",
+            "timestamp": datetime.now().isoformat(),
+            "working": True,
+            "dstack_available": DSTACK_CLIENTS.available(DSTACK_SOCKET),
+            "tappd_available": DSTACK_CLIENTS.available(TAPPD_SOCKET)
+        }
+        self._send_json_response(200, response)
+    
+    @route('GET', '/api/health/live')
+    def _get_health_live(self):
+        self._send_json_response(200, {"status": "alive", "timestamp": datetime.now().isoformat()})
+    
+    @route('GET', '/api/health/ready')
+    def _get_health_ready(self):
+        # Ready only while a TEE socket answers, matching api/main.py; liveness stays on /live
+        answered, error = TEE_PROBE.check()
+        response = {
+            "status": "ready" if answered else "not_ready",
+            "ready": bool(answered),
+            "socket": answered,
+            "last_error": error,
+            "dstack_available": DSTACK_CLIENTS.available(DSTACK_SOCKET),
+            "tappd_available": DSTACK_CLIENTS.available(TAPPD_SOCKET),
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200 if answered else 503, response)
+    
+    @route('GET', '/api/system/stats')
+    def _get_system_stats(self):
+        # Served from the sampler's ring buffer; ?window= seconds of history (default 300)
+        try:
+            window = float(self.query.get("window", 300))
+            if not math.isfinite(window):
+                raise ValueError(window)
+        except ValueError:
+            self._send_json_response(400, {"error": "window must be a number of seconds"})
+            return
+        window = min(max(window, 0), SYSTEM_SAMPLER.interval * SYSTEM_SAMPLER.size)
+        response = {
+            "status": "success",
+            "interval": SYSTEM_SAMPLER.interval,
+            "window": window,
+            "current": SYSTEM_SAMPLER.latest(),
+            "history": SYSTEM_SAMPLER.history(window),
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('GET', '/api/cache/stats')
+    def _get_cache_stats(self):
+        response = {
+            "status": "success",
+            "snapshot": SNAPSHOT.stats(),
+            "key_cache": KEY_CACHE.stats(),
+            "attestation_store": ATTESTATION_STORE.stats() if ATTESTATION_STORE else None,
+            "admission": ADMISSION.stats() if ADMISSION else None,
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('GET', '/metrics')
+    def _get_metrics(self):
+        body = render_metrics()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    @route('POST', '/api/attestation/generate')
+    @admission_controlled
+    def _post_attestation_generate(self):
+        data = self.json_body()
+        record = _attestation_record(data, _attestation_context())
+        if ATTESTATION_STORE:
+            ATTESTATION_STORE.put(record)
+        response = {
+            "status": "success",
+            "data": record,
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('POST', '/api/attestation/generate/batch')
+    @admission_controlled
+    def _post_attestation_generate_batch(self):
+        data = self.json_body()
+        items = data.get("items")
+        if not isinstance(items, list):
+            self._send_json_response(400, {"error": "items must be a list"})
+        elif len(items) > BATCH_MAX_ITEMS:
+            self._send_json_response(413, {"error": f"Batch exceeds {BATCH_MAX_ITEMS} items"})
         else:
-            self._send_json_response(404, {"error": "Not found"})
+            self._send_attestation_batch(items)
     
-    def do_POST(self):
-        # Read request body
-        content_length = int(self.headers.get('Content-Length', 0))
-        if content_length > 0:
-            post_data = self.rfile.read(content_length)
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-            except:
-                data = {}
+    @route('POST', '/api/attestation/verify')
+    def _post_attestation_verify(self):
+        data = self.json_body()
+        error = self._verify_input_error(data)
+        if error:
+            self._send_json_response(400, {"error": error, "verified": False})
+            return
+        attestation_id = data.get("attestation_id", "")
+        quote = data.get("quote")
+        stored = None
+        if not quote and ATTESTATION_STORE:
+            stored = ATTESTATION_STORE.find(attestation_id, data.get("quote_hash"))
+            if stored:
+                # /api/tee/quote records keep their quote under "quote"
+                quote = stored.get("tee_quote") or stored.get("quote")
+        if not quote and stored is None:
+            self._send_json_response(404, {"error": "No quote given and no stored attestation found",
+                                           "verified": False})
+            return
+        response = {
+            "status": "success",
+            "verified": False,
+            "attestation_id": stored["attestation_id"] if stored else attestation_id,
+            "timestamp": datetime.now().isoformat()
+        }
+        if not data.get("quote"):
+            response["stored"] = stored is not None
+            response["attestation"] = stored
+        if isinstance(quote, str) and quote:
+            result = QUOTE_VERIFIER.verify(quote, data.get("expected_measurements"),
+                                           data.get("expected_report_data"))
+            response["verified"] = result["verified"]
+            response["verification"] = result
         else:
-            data = {}
-        
-        # Route to endpoints
-        if self.path == '/api/attestation/generate':
-            response = {
-                "status": "success",
-                "data": {
-                    "attestation_id": f"tee-{datetime.now().timestamp()}",
-                    "data": data.get("data", ""),
-                    "nonce": data.get("nonce", str(datetime.now().timestamp())),
-                    "device_id": os.getenv("DEVICE_ID", "tee-device-001"),
-                    "timestamp": datetime.now().isoformat(),
-                    "environment": "Intel TDX",
-                    "dstack_version": "0.5.3",
-                    "real_tee": os.path.exists("/var/run/dstack.sock"),
-                    "source": "dstack Socket" if os.path.exists("/var/run/dstack.sock") else "Demo Mode"
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        elif self.path == '/api/attestation/verify':
-            attestation_id = data.get("attestation_id", "")
-            response = {
-                "status": "success",
-                "verified": True,
-                "attestation_id": attestation_id,
+            # Only a checked quote counts as verified
+            response["error"] = "Stored attestation has no quote to verify"
+        self._send_json_response(200, response)
+    
+    @staticmethod
+    def _verify_input_error(data):
+        """Why a verify request body cannot be checked, or None"""
+        if not isinstance(data, dict):
+            return "Request body must be a JSON object"
+        if data.get("quote") is not None and not isinstance(data["quote"], str):
+            return "quote must be a hex or base64 string"
+        for field in ("attestation_id", "quote_hash", "expected_report_data"):
+            if data.get(field) is not None and not isinstance(data[field], str):
+                return f"{field} must be a string"
+        measurements = data.get("expected_measurements")
+        if measurements is not None and not (
+                isinstance(measurements, dict) and all(isinstance(v, str) for v in measurements.values())):
+            return "expected_measurements must map measurement names to hex strings"
+        return None
+
+    @route('POST', '/api/attestation/submit')
+    def _post_attestation_submit(self):
+        data = self.json_body()
+        quote_data = data.get("quote")
+        stored = None
+        if not quote_data and ATTESTATION_STORE:
+            # Resolve a quote generated earlier instead of requiring the client to resend it
+            stored = ATTESTATION_STORE.find(data.get("attestation_id", ""), data.get("quote_hash"))
+            quote_data = (stored or {}).get("tee_quote") or (stored or {}).get("quote")
+        quote_data = quote_data or "test"
+        digest = quote_hash(quote_data)
+        response = {
+            "status": "success",
+            "submission": {
+                "explorer_url": "https://proof.t16z.com/",
+                "quote_hash": digest,
+                "submission_status": "ready",
+                "verification_url": f"https://proof.t16z.com/reports/{digest[:16]}",
+                "stored": stored is not None,
                 "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('POST', '/api/security/status')
+    def _post_security_status(self):
+        response = {
+            "status": "success",
+            "security_status": {
+                "secure": True,
+                "tee_enabled": True,
+                "attestation_available": True,
+                "dstack_available": DSTACK_CLIENTS.available(DSTACK_SOCKET),
+                "environment": "production",
+                "device_id": "tee-device-001",
+                "sdk_available": DSTACK_AVAILABLE,
+                "real_tee": True
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('POST', '/api/tee/key')
+    def _post_tee_key(self):
+        data = self.json_body()
+        key = (str(data.get("path", "default")), str(data.get("purpose", "attestation")))
+        try:
+            derived = _tee_keys([key])[key]
+        except Exception as e:
+            self._send_json_response(502, {"error": f"Key derivation failed: {e}"})
+            return
+        response = {
+            "status": "success",
+            "key_data": _key_record(*key, derived),
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('POST', '/api/tee/key/batch')
+    def _post_tee_key_batch(self):
+        data = self.json_body()
+        items = data.get("keys")
+        if items is None and isinstance(data.get("paths"), list):
+            items = [{"path": path} for path in data["paths"]]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            self._send_json_response(400, {"error": "keys must be a list of {path, purpose} objects"})
+            return
+        if len(items) > KEY_BATCH_MAX_ITEMS:
+            self._send_json_response(413, {"error": f"Batch exceeds {KEY_BATCH_MAX_ITEMS} keys"})
+            return
+        purpose = str(data.get("purpose", "attestation"))
+        keys = [(str(item.get("path", "default")), str(item.get("purpose", purpose))) for item in items]
+        errors = {}
+        derived = _tee_keys(keys, errors)
+        if keys and len(errors) == len(set(keys)):
+            self._send_json_response(502, {"error": f"Key derivation failed: {next(iter(errors.values()))}"})
+            return
+        records = [
+            _key_record(*key, derived[key]) if key in derived
+            else {"path": key[0], "purpose": key[1], "error": f"Key derivation failed: {errors[key]}"}
+            for key in keys
+        ]
+        response = {
+            "status": "partial" if errors else "success",
+            "keys": records,
+            "derived": len([r for r in records if r.get("cached") is False]),
+            "failed": len([r for r in records if "error" in r]),
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('POST', '/api/tee/quote')
+    @admission_controlled
+    def _post_tee_quote(self):
+        data = self.json_body()
+        quote_data = data.get("data", "test-data")
+        quote = {
+            "quote_id": f"quote-{datetime.now().timestamp()}-{secrets.token_hex(4)}",
+            "data": quote_data,
+            "quote": hashlib.sha256(quote_data.encode()).hexdigest(),
+            "timestamp": datetime.now().isoformat(),
+            "source": "Real dstack SDK"
+        }
+        if ATTESTATION_STORE:
+            ATTESTATION_STORE.put(dict(quote, attestation_id=quote["quote_id"]), quote["quote"])
+        response = {
+            "status": "success",
+            "quote_data": quote,
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('POST', '/api/tee/measurements')
+    def _post_tee_measurements(self):
+        body = ResponseTemplate.fill(SNAPSHOT.measurements_parts, datetime.now().isoformat())
+        self._send_json_bytes(200, body)
+    
+    @route('POST', '/api/tee/execute')
+    def _post_tee_execute(self):
+        data = self.json_body()
+        function_name = data.get("function", "test-function")
+        params = data.get("params", {})
         
-        elif self.path == '/api/attestation/submit':
-            quote_data = data.get("quote", "test")
-            response = {
-                "status": "success",
-                "submission": {
-                    "explorer_url": "https://proof.t16z.com/",
-                    "quote_hash": hashlib.sha256(quote_data.encode()).hexdigest(),
-                    "submission_status": "ready",
-                    "verification_url": f"https://proof.t16z.com/reports/{hashlib.sha256(quote_data.encode()).hexdigest()[:16]}",
-                    "timestamp": datetime.now().isoformat()
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
+        execution_hash = hashlib.sha256(f"{function_name}{datetime.now()}".encode()).hexdigest()[:16]
         
-        elif self.path == '/api/security/status':
-            response = {
-                "status": "success",
-                "security_status": {
-                    "secure": True,
-                    "tee_enabled": True,
+        response = {
+            "status": "success",
+            "execution_result": {
+                "function": function_name,
+                "params": params,
+                "result": {
+                    "execution_id": execution_hash,
+                    "tee_environment": "Intel TDX",
+                    "secure_execution": True,
                     "attestation_available": True,
-                    "dstack_available": os.path.exists("/var/run/dstack.sock"),
-                    "environment": "production",
-                    "device_id": "tee-device-001",
-                    "sdk_available": DSTACK_AVAILABLE,
-                    "real_tee": True
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        elif self.path == '/api/tee/key':
-            path = data.get("path", "default")
-            response = {
-                "status": "success",
-                "key_data": {
-                    "key_id": f"key-{path}",
-                    "path": path,
-                    "purpose": data.get("purpose", "attestation"),
-                    "key_data": hashlib.sha256(f"key_{path}".encode()).hexdigest(),
-                    "timestamp": datetime.now().isoformat(),
-                    "source": "Real dstack SDK"
+                    "execution_time_ms": 127,
+                    "memory_used": "12.4 MB",
+                    "cpu_cycles": 4589234,
+                    "enclave_id": "6de516cec046f6e4a301d45ead2bde6e83fd6ed0"
                 },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        elif self.path == '/api/tee/quote':
-            quote_data = data.get("data", "test-data")
-            response = {
-                "status": "success",
-                "quote_data": {
-                    "quote_id": f"quote-{datetime.now().timestamp()}",
-                    "data": quote_data,
-                    "quote": hashlib.sha256(quote_data.encode()).hexdigest(),
-                    "timestamp": datetime.now().isoformat(),
-                    "source": "Real dstack SDK"
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        elif self.path == '/api/tee/measurements':
-            app_id = os.getenv("APP_ID", "app_55531fcff1d542372a3fb0627f1fc12721f2fa24")
-            device_id = os.getenv("DEVICE_ID", "tee-device-001")
-            
-            measurements = {
-                "mrtd": hashlib.sha256(f"mrtd_{app_id}".encode()).hexdigest(),
-                "rtmr0": hashlib.sha256(f"rtmr0_{app_id}".encode()).hexdigest(),
-                "rtmr1": hashlib.sha256(f"rtmr1_{app_id}".encode()).hexdigest(),
-                "rtmr2": hashlib.sha256(f"rtmr2_{app_id}".encode()).hexdigest(),
-                "rtmr3": hashlib.sha256(f"rtmr3_{app_id}".encode()).hexdigest(),
-                "device_id": device_id,
-                "os_image_hash": hashlib.sha256(b"DStack 0.5.3").hexdigest(),
-                "compose_hash": hashlib.sha256(f"compose_{app_id}".encode()).hexdigest(),
                 "timestamp": datetime.now().isoformat(),
-                "source": "TEE Measurements"
-            }
-            
-            response = {
-                "status": "success",
-                "measurements": measurements,
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        elif self.path == '/api/tee/execute':
-            function_name = data.get("function", "test-function")
-            params = data.get("params", {})
-            
-            execution_hash = hashlib.sha256(f"{function_name}{datetime.now()}".encode()).hexdigest()[:16]
-            
-            response = {
-                "status": "success",
-                "execution_result": {
-                    "function": function_name,
-                    "params": params,
-                    "result": {
-                        "execution_id": execution_hash,
-                        "tee_environment": "Intel TDX",
-                        "secure_execution": True,
-                        "attestation_available": True,
-                        "execution_time_ms": 127,
-                        "memory_used": "12.4 MB",
-                        "cpu_cycles": 4589234,
-                        "enclave_id": "6de516cec046f6e4a301d45ead2bde6e83fd6ed0"
-                    },
-                    "timestamp": datetime.now().isoformat(),
-                    "source": "Real dstack TEE Execution"
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        elif self.path == '/api/node/info':
-            app_id = os.getenv("APP_ID", "app_55531fcff1d542372a3fb0627f1fc12721f2fa24")
-            instance_id = os.getenv("INSTANCE_ID", "6de516cec046f6e4a301d45ead2bde6e83fd6ed0")
-            
-            system_info = {
-                "os": "DStack 0.5.3",
-                "kernel": "6.9.0-dstack",
-                "uptime": "7200 seconds",
-                "load_avg": "1min: 0.05, 5min: 0.10, 15min: 0.12"
-            }
-            
-            containers = [{
-                "name": "tee-trust-validator",
-                "status": "Running",
-                "logs_url": "/logs/tee-trust-validator"
-            }]
-            
-            response = {
-                "status": "success",
-                "node_info": {
-                    "dashboard_url": f"https://{instance_id}-8090.dstack-pha-prod7.phala.network/",
-                    "app_id": app_id,
-                    "instance_id": instance_id,
-                    "containers": containers,
-                    "system_info": system_info,
-                    "attestation_explorer": "https://proof.t16z.com/"
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            self._send_json_response(200, response)
-        
-        else:
-            self._send_json_response(404, {"error": "Not found", "path": self.path})
+                "source": "Real dstack TEE Execution"
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200, response)
+    
+    @route('POST', '/api/node/info')
+    def _post_node_info(self):
+        snapshot, sample = SNAPSHOT, SYSTEM_SAMPLER.latest()
+        body = NODE_INFO_TEMPLATE.render((snapshot, sample["seq"]), lambda: snapshot.node_info(sample),
+                                         datetime.now().isoformat())
+        self._send_json_bytes(200, body)
+    
+    @route('POST', '/api/cache/invalidate')
+    def _post_cache_invalidate(self):
+        data = self.json_body()
+        key = data.get("key") or self.query.get("key")
+        if key not in (None, "keys", "snapshot"):
+            self._send_json_response(400, {"error": f"Unknown cache key {key!r}", "keys": ["keys", "snapshot"]})
+            return
+        # Without a key both caches are dropped, so the snapshot's authorization applies to the whole call
+        if key in (None, "snapshot") and self._refuse_snapshot_refresh():
+            return
+        invalidated = []
+        if key in (None, "keys"):
+            KEY_CACHE.clear()
+            invalidated.append("keys")
+        snapshot = None
+        if key in (None, "snapshot"):
+            snapshot = refresh_snapshot_everywhere()
+            invalidated.append("snapshot")
+        response = {
+            "status": "pending" if "snapshot" in invalidated and snapshot is None else "success",
+            "invalidated": invalidated,
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(202 if response["status"] == "pending" else 200, response)
+    
+    def _refuse_snapshot_refresh(self):
+        """Send 401/403 and return True unless the client may refresh the snapshot
+
+        A refresh makes every worker re-read its identity: token holders or
+        localhost only.
+        """
+        if SNAPSHOT_REFRESH_TOKEN:
+            supplied = self.headers.get('Authorization', '')
+            if not supplied:
+                self._send_json_response(401, {"error": "Snapshot refresh needs SNAPSHOT_REFRESH_TOKEN"},
+                                         {'WWW-Authenticate': 'Bearer'})
+                return True
+            token = supplied.removeprefix('Bearer ').strip()
+            if not hmac.compare_digest(token.encode(), SNAPSHOT_REFRESH_TOKEN.encode()):
+                self._send_json_response(403, {"error": "Invalid snapshot refresh token"})
+                return True
+        elif self.client_address[0] not in ("127.0.0.1", "::1", "::ffff:127.0.0.1"):
+            self._send_json_response(403, {"error": "Snapshot refresh needs SNAPSHOT_REFRESH_TOKEN or localhost"})
+            return True
+        return False
+
+    @route('POST', '/api/snapshot/refresh')
+    def _post_snapshot_refresh(self):
+        # Re-read APP_ID/DEVICE_ID/INSTANCE_ID and rebuild the pre-serialized TEE info bodies
+        if self._refuse_snapshot_refresh():
+            return
+        snapshot = refresh_snapshot_everywhere()
+        response = {
+            "status": "success" if snapshot else "pending",
+            "snapshot": (snapshot or SNAPSHOT).stats(),
+            "timestamp": datetime.now().isoformat()
+        }
+        self._send_json_response(200 if snapshot else 202, response)
+    
+    def _send_attestation_batch(self, items):
+        """Stream one NDJSON line per item; socket state is resolved once per batch"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        context = _attestation_context()
+        batch_id = datetime.now().timestamp()
+        records = []
+        for index, item in enumerate(items):
+            if isinstance(item, dict):
+                record = _attestation_record(item, context, f"{batch_id}-{index}")
+                records.append((record, None))
+                line = {"index": index, "status": "success", "data": record}
+            else:
+                line = {"index": index, "status": "error", "error": "item must be an object"}
+            self.wfile.write(_dumps(line) + b"\n")
+        self.wfile.flush()
+        if ATTESTATION_STORE and records:
+            ATTESTATION_STORE.put_many(records)
     
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
+ROUTER = Router.from_handler_class(TEEAPIHandler)
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands accepted connections to a bounded pool of worker threads"""
+
+    def __init__(self, server_address, handler_class, workers=SERVER_WORKERS,
+                 backlog=SERVER_BACKLOG, queue_depth=SERVER_QUEUE_DEPTH):
+        self.request_queue_size = backlog
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tee-api")
+        # Connections accepted but not yet picked up by a worker; once full the
+        # accept loop blocks and further clients wait in the kernel listen backlog
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            self._pool.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:
+            # Pool already shut down
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleHTTPServer(HTTPServer):
+    """Original one-request-at-a-time server, kept for comparison"""
+
+    def __init__(self, server_address, handler_class, backlog=SERVER_BACKLOG):
+        self.request_queue_size = backlog
+        super().__init__(server_address, handler_class)
+
+
+def _serve_prefork(server, processes, crash_limit=CRASH_LIMIT, crash_window=CRASH_WINDOW,
+                   backoff=RESPAWN_BACKOFF, backoff_max=RESPAWN_BACKOFF_MAX):
+    """Fork worker processes that all accept on the parent's listening socket
+
+    Dead workers are respawned after an exponential backoff; once crash_limit
+    workers die within crash_window seconds the supervisor stops the rest and
+    exits non-zero so the container runtime can restart it.
+    """
+    global METRICS_SPOOL
+    children = set()
+    parent = os.getpid()
+    if METRICS_ENABLED and METRICS_SPOOL is None:
+        METRICS_SPOOL = MetricsSpool(tempfile.mkdtemp(prefix="tee-api-metrics-"))
+
+    def _spawn():
+        global PREFORK_PARENT_PID
+        pid = os.fork()
+        if pid == 0:
+            PREFORK_PARENT_PID = parent
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            if hasattr(signal, "SIGHUP"):
+                signal.signal(signal.SIGHUP, refresh_snapshot)
+            SYSTEM_SAMPLER.start()
+            if METRICS_SPOOL:
+                METRICS_SPOOL.start()
+            code = 1
+            try:
+                server.serve_forever()
+                code = 0
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def _signal_children(signum):
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _terminate(signum, frame):
+        _signal_children(signal.SIGTERM)
+        raise SystemExit(0)
+
+    for _ in range(processes):
+        _spawn()
+
+    def _refresh(signum, frame):
+        # Workers forked later inherit the parent's refreshed snapshot
+        refresh_snapshot()
+        _signal_children(signal.SIGHUP)
+
+    signal.signal(signal.SIGTERM, _terminate)
+    signal.signal(signal.SIGINT, _terminate)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _refresh)
+
+    # Respawn workers that die so the pool keeps its size, backing off while they keep dying
+    deaths = deque()
+    try:
+        while children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            now = time.monotonic()
+            deaths.append(now)
+            while now - deaths[0] > crash_window:
+                deaths.popleft()
+            if len(deaths) >= crash_limit:
+                print(f"❌ {len(deaths)} workers died within {crash_window:g}s, stopping", file=sys.stderr)
+                _signal_children(signal.SIGTERM)
+                raise SystemExit(1)
+            time.sleep(min(backoff * 2 ** (len(deaths) - 1), backoff_max))
+            _spawn()
+    finally:
+        if METRICS_SPOOL:
+            shutil.rmtree(METRICS_SPOOL.directory, ignore_errors=True)
+
+
+def create_server(port, mode=SERVER_MODE):
+    """Build the HTTP server for the given concurrency mode"""
+    if mode == "single":
+        return SingleHTTPServer(('0.0.0.0', port), TEEAPIHandler)
+    if mode in ("threaded", "prefork"):
+        return ThreadPoolHTTPServer(('0.0.0.0', port), TEEAPIHandler)
+    raise ValueError(f"Unknown API_SERVER_MODE: {mode}")
+
+
 def run_api():
     port = int(os.getenv('PORT', 8000))
-    server = HTTPServer(('0.0.0.0', port), TEEAPIHandler)
-    print(f"🚀 TEE API running on port {port}")
-    server.serve_forever()
+    server = create_server(port)
+
+    if SERVER_MODE == "prefork" and hasattr(os, "fork"):
+        print(f"🚀 TEE API running on port {port} "
+              f"(prefork: {SERVER_PROCESSES} processes x {SERVER_WORKERS} threads)")
+        try:
+            _serve_prefork(server, SERVER_PROCESSES)
+        finally:
+            server.server_close()
+        return
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, refresh_snapshot)
+    SYSTEM_SAMPLER.start()
+    if SERVER_MODE == "single":
+        print(f"🚀 TEE API running on port {port} (single)")
+    else:
+        print(f"🚀 TEE API running on port {port} (threaded: {SERVER_WORKERS} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 if __name__ == '__main__':
     run_api()
@@ -0,0 +1,214 @@
+"""
+Admission control for quote generation
+
+Quote generation is the scarcest resource in a CVM, so routes that produce
+quotes are admitted in two steps. Each client draws from its own token
+bucket of ADMISSION_RATE requests per second with bursts
+up to ADMISSION_BURST. Admitted requests then take one of
+ADMISSION_CONCURRENCY slots, sized to what the TEE can serve at once. At
+most ADMISSION_QUEUE_DEPTH requests wait for a slot, none longer than
+ADMISSION_QUEUE_TIMEOUT. Every refusal comes back with the seconds until a
+retry is worth making, for a 429 with Retry-After, so overload sheds load
+early instead of piling calls onto the dstack socket.
+
+A client is identified by its X-API-Key when that key is one of
+ADMISSION_API_KEYS, else by its address. Behind a proxy listed in
+TRUSTED_PROXIES, the address is the rightmost X-Forwarded-For hop that is
+not itself a trusted proxy, so clients cannot pick their own bucket by
+sending the header. client_identity() is shared with the simple API.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", 20))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", 40))
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", 4))
+ADMISSION_QUEUE_DEPTH = int(os.getenv("ADMISSION_QUEUE_DEPTH", 32))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 5))
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", 10000))
+# Comma-separated; a request presenting one of these in X-API-Key gets that key's bucket
+ADMISSION_API_KEYS = frozenset(
+    key.strip() for key in os.getenv("ADMISSION_API_KEYS", "").split(",") if key.strip()
+)
+
+
+def parse_networks(spec: str) -> Tuple[Any, ...]:
+    """Comma-separated addresses or CIDR blocks, e.g. "127.0.0.1,10.0.0.0/8" """
+    return tuple(ipaddress.ip_network(item.strip(), strict=False) for item in spec.split(",") if item.strip())
+
+
+# Proxies whose X-Forwarded-For is believed; empty means the peer address is the client
+TRUSTED_PROXIES = parse_networks(os.getenv("TRUSTED_PROXIES", ""))
+
+# (reason, seconds until retry) for a refused request
+Rejection = Tuple[str, float]
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After takes whole seconds; never tell a client to retry immediately"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def _is_trusted(address: str, trusted_proxies) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_address(peer: str, forwarded_for: Optional[str], trusted_proxies=TRUSTED_PROXIES) -> str:
+    """The peer, or when it is a trusted proxy, the rightmost X-Forwarded-For hop that is not
+
+    Hops left of that one were written by the client and prove nothing.
+    """
+    if not forwarded_for or not _is_trusted(peer, trusted_proxies):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted_proxies):
+            return hop
+    # Every hop is a trusted proxy: the request started inside the proxy tier
+    return hops[0] if hops else peer
+
+
+def client_identity(
+    peer: str,
+    headers: Mapping[str, str],
+    api_keys: FrozenSet[str] = ADMISSION_API_KEYS,
+    trusted_proxies=TRUSTED_PROXIES,
+) -> str:
+    """Token bucket key for a request: a valid API key, else the client address
+
+    headers needs a case-insensitive get(), as both Starlette and http.server
+    headers have. An unknown X-API-Key is ignored, so it cannot mint buckets.
+    """
+    presented = headers.get("X-API-Key")
+    if presented and api_keys:
+        for key in api_keys:
+            if hmac.compare_digest(presented.encode(), key.encode()):
+                return "key:" + hashlib.sha256(key.encode()).hexdigest()[:16]
+    return "ip:" + client_address(peer, headers.get("X-Forwarded-For"), trusted_proxies)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rate: float = ADMISSION_RATE,
+        burst: float = ADMISSION_BURST,
+        concurrency: int = ADMISSION_CONCURRENCY,
+        queue_depth: int = ADMISSION_QUEUE_DEPTH,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        max_clients: int = ADMISSION_MAX_CLIENTS,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        # client -> [tokens, last refill], least recently seen first
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._waiting = 0
+        self._in_use = 0
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self._hold = 0.05
+        self.admitted = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.timed_out = 0
+
+    def _take_token(self, client: str) -> float:
+        """0 when the client had a token to spend, else seconds until it has one"""
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [self.burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def _queue_wait(self) -> float:
+        return self._hold * (self._waiting + 1) / self.concurrency
+
+    def check_rate(self, client: str) -> Optional[Rejection]:
+        """Spend one of the client's tokens without taking a slot, for queued work"""
+        if self.rate > 0:
+            wait = self._take_token(client)
+            if wait:
+                self.rate_limited += 1
+                return "rate_limited", wait
+        return None
+
+    async def acquire(self, client: str) -> Optional[Rejection]:
+        """None once a slot is held (pair with release()), else why and when to retry"""
+        rejection = self.check_rate(client)
+        if rejection is not None:
+            return rejection
+        if self._slots.locked():
+            if self._waiting >= self.queue_depth:
+                self.queue_full += 1
+                return "queue_full", self._queue_wait()
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                return "queue_timeout", self._queue_wait()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+        self._in_use += 1
+        self.admitted += 1
+        return None
+
+    async def acquire_slot(self):
+        """Take a slot for work already admitted (batch items, queued jobs), however long it takes
+
+        Pair with release(). The caller's own concurrency bounds how many wait here.
+        """
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_use += 1
+        self.admitted += 1
+
+    def release(self, held: float):
+        self._in_use -= 1
+        self._slots.release()
+        self._hold += (held - self._hold) * 0.2
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "concurrency": self.concurrency,
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "queue_depth": self.queue_depth,
+            "clients": len(self._buckets),
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "queue_full": self.queue_full,
+            "queue_timeout": self.timed_out,
+        }
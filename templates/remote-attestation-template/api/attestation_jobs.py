@@ -0,0 +1,297 @@
+"""
+Asynchronous attestation jobs
+
+Quote generation can take seconds, and a request that waits for it ties up
+a client connection for as long as it takes. In job mode the request is
+answered at once with a job id. The quote is then produced by one of
+JOB_WORKERS asyncio workers, so at most that many are in flight however
+many jobs are submitted. At most JOB_QUEUE_SIZE jobs wait for a worker;
+beyond that submissions are refused with an estimate of when to retry.
+
+A job is read back by id, optionally long-polling up to JOB_MAX_WAIT
+seconds for it to finish. A job submitted with a webhook URL also has its
+final state POSTed there. Webhooks only go to hosts listed in
+JOB_WEBHOOK_HOSTS, and never to an address that resolves to loopback,
+link-local, private or otherwise reserved space, so a client cannot aim
+the TEE at internal services. Finished jobs are kept for JOB_TTL seconds.
+"""
+
+import asyncio
+import ipaddress
+import json
+import os
+import secrets
+import time
+import urllib.parse
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+try:
+    import httpx
+
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+JOB_WORKERS = int(os.getenv("ATTESTATION_JOB_WORKERS", 4))
+JOB_QUEUE_SIZE = int(os.getenv("ATTESTATION_JOB_QUEUE_SIZE", 256))
+JOB_TTL = float(os.getenv("ATTESTATION_JOB_TTL", 600))
+JOB_MAX_ENTRIES = int(os.getenv("ATTESTATION_JOB_MAX_ENTRIES", 10000))
+JOB_MAX_WAIT = float(os.getenv("ATTESTATION_JOB_MAX_WAIT", 30))
+JOB_WEBHOOK_TIMEOUT = float(os.getenv("ATTESTATION_JOB_WEBHOOK_TIMEOUT", 5))
+# Hosts webhooks may be sent to; ".example.com" also matches subdomains. Empty disables webhooks.
+JOB_WEBHOOK_HOSTS = tuple(
+    host.strip().lower() for host in os.getenv("ATTESTATION_JOB_WEBHOOK_HOSTS", "").split(",") if host.strip()
+)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def webhook_error(url: str, allowed_hosts=JOB_WEBHOOK_HOSTS) -> Optional[str]:
+    """Why url may not receive webhooks, or None; resolution is checked again on delivery"""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return "webhook_url must be an http(s) URL"
+    host = parts.hostname.lower()
+    if not any(
+        host == allowed or (allowed.startswith(".") and host.endswith(allowed))
+        for allowed in allowed_hosts
+    ):
+        return f"webhook host {host} is not in ATTESTATION_JOB_WEBHOOK_HOSTS"
+    try:
+        if not _public_address(host):
+            return f"webhook host {host} is not a public address"
+    except ValueError:
+        pass  # A name; checked when it is resolved
+    return None
+
+
+class Job:
+    __slots__ = (
+        "id", "run", "webhook", "status", "result", "error",
+        "created_at", "started_at", "finished_at", "_finished", "_done",
+    )
+
+    def __init__(self, run: Callable[[], Awaitable[Any]], webhook: Optional[str] = None):
+        self.id = secrets.token_hex(16)
+        self.run = run
+        self.webhook = webhook
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        # Monotonic finish time, for expiry
+        self._finished: Optional[float] = None
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE,
+        ttl: float = JOB_TTL,
+        max_entries: int = JOB_MAX_ENTRIES,
+        max_wait: float = JOB_MAX_WAIT,
+        webhook_timeout: float = JOB_WEBHOOK_TIMEOUT,
+        webhook_hosts=JOB_WEBHOOK_HOSTS,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_wait = max_wait
+        self.webhook_timeout = webhook_timeout
+        self.webhook_hosts = tuple(webhook_hosts)
+        # job id -> Job, oldest submission first
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        self._deliveries: Set[asyncio.Task] = set()
+        self._client = None
+        self._running = 0
+        self._pruned_at = 0.0
+        # Moving average of how long a job runs, for Retry-After estimates
+        self._run_time = 1.0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.webhooks_sent = 0
+        self.webhook_errors = 0
+
+    def _ensure_workers(self):
+        self._tasks = [task for task in self._tasks if not task.done()]
+        loop = asyncio.get_running_loop()
+        while len(self._tasks) < self.workers:
+            self._tasks.append(loop.create_task(self._work()))
+
+    def submit(self, run: Callable[[], Awaitable[Any]], webhook: Optional[str] = None) -> Optional[Job]:
+        """Queue run() as a job, or None when the queue is full"""
+        self._prune()
+        self._ensure_workers()
+        if self._queue.full():
+            self.rejected += 1
+            return None
+        job = Job(run, webhook)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        return job
+
+    def retry_after(self) -> float:
+        """Seconds until a queued job could expect to start"""
+        return self._run_time * (self._queue.qsize() + 1) / self.workers
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Return once job has finished or timeout (capped at max_wait) has passed"""
+        if not job.finished and timeout > 0:
+            try:
+                await asyncio.wait_for(job._done.wait(), min(timeout, self.max_wait))
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = datetime.now().isoformat()
+            self._running += 1
+            started = time.monotonic()
+            try:
+                job.result = await job.run()
+                job.status = DONE
+                self.completed += 1
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "Cancelled on shutdown"
+                raise
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e) or type(e).__name__
+                self.failed += 1
+            finally:
+                self._running -= 1
+                self._run_time += (time.monotonic() - started - self._run_time) * 0.2
+                job.run = None
+                job.finished_at = datetime.now().isoformat()
+                job._finished = time.monotonic()
+                job._done.set()
+                self._queue.task_done()
+            if job.webhook:
+                # Delivered off the worker so a slow receiver cannot hold up quotes
+                task = asyncio.get_running_loop().create_task(self._deliver(job))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+
+    async def _check_webhook(self, url: str):
+        """Raise ValueError unless url is allowed and every address it resolves to is public"""
+        error = webhook_error(url, self.webhook_hosts)
+        if error:
+            raise ValueError(error)
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port)
+        for info in infos:
+            if not _public_address(info[4][0]):
+                raise ValueError(f"webhook host {parts.hostname} resolves to {info[4][0]}")
+
+    async def _deliver(self, job: Job):
+        if not HTTPX_AVAILABLE:
+            self.webhook_errors += 1
+            return
+        if self._client is None:
+            # Redirects are not followed, so an allowed host cannot bounce the POST inwards
+            self._client = httpx.AsyncClient(timeout=self.webhook_timeout, follow_redirects=False)
+        try:
+            await self._check_webhook(job.webhook)
+            response = await self._client.post(
+                job.webhook,
+                content=json.dumps(job.to_dict(), default=str),
+                headers={"Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+            self.webhooks_sent += 1
+        except Exception as e:
+            self.webhook_errors += 1
+            print(f"Webhook for job {job.id} failed: {e}")
+
+    def _prune(self):
+        """Drop jobs finished more than ttl ago, at most once a second"""
+        now = time.monotonic()
+        if now - self._pruned_at < 1 and len(self._jobs) <= self.max_entries:
+            return
+        self._pruned_at = now
+        for job_id in [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished and now - job._finished > self.ttl
+        ]:
+            del self._jobs[job_id]
+            self.expired += 1
+        # Over the cap: forget the oldest finished jobs early
+        while len(self._jobs) > self.max_entries:
+            job_id, job = next(iter(self._jobs.items()))
+            if not job.finished:
+                break
+            del self._jobs[job_id]
+            self.expired += 1
+
+    async def stop(self):
+        for task in self._tasks + list(self._deliveries):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._deliveries, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "jobs": len(self._jobs),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "webhooks_sent": self.webhooks_sent,
+            "webhook_errors": self.webhook_errors,
+        }
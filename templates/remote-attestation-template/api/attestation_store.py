@@ -0,0 +1,305 @@
+"""
+Persistent store of generated attestations
+
+Every attestation produced by /api/attestation/generate is kept in SQLite
+(WAL mode), indexed by attestation_id and by quote_hash, the SHA-256 of
+the quote text as /api/attestation/submit reports it. Verify and submit
+look prior quotes up instead of needing the client to resend them.
+
+Writes are behind: put() files the record in an in-memory index and a
+writer thread serializes and group-commits whatever has queued up in one
+transaction, so the request path never waits on SQLite. Lookups check
+the not-yet-committed index first, then do a point read on an index.
+Entries older than max_age are ignored and evicted, and the table is
+trimmed to max_entries, oldest first, every EVICT_EVERY writes.
+
+Ids are never overwritten: a row whose attestation_id already exists is
+rejected. When a group commit fails, its rows are retried one at a time so
+a single bad row costs only itself. Rows that still fail are dropped and
+counted, so the writer survives a full or locked database and the queue
+cannot grow without bound.
+
+Connections and the writer thread are opened per process on first use, so
+a store created before fork() (the simple API's prefork workers) is shared
+as a database file, never as SQLite handles or threads. The store is
+opt-in: set ATTESTATION_STORE_ENABLED=true to keep attestations.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+STORE_ENABLED = os.getenv("ATTESTATION_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+STORE_PATH = os.getenv(
+    "ATTESTATION_STORE_PATH", os.path.join(tempfile.gettempdir(), "attestations.db")
+)
+STORE_MAX_ENTRIES = int(os.getenv("ATTESTATION_STORE_MAX_ENTRIES", 100000))
+STORE_MAX_AGE = float(os.getenv("ATTESTATION_STORE_MAX_AGE", 7 * 86400))
+EVICT_EVERY = 256
+
+INSERT = (
+    "INSERT INTO attestations (attestation_id, quote_hash, created_at, record) VALUES (?, ?, ?, ?)"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attestations (
+    seq INTEGER PRIMARY KEY,
+    attestation_id TEXT NOT NULL UNIQUE,
+    quote_hash TEXT,
+    created_at REAL NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attestations_quote_hash ON attestations (quote_hash);
+CREATE INDEX IF NOT EXISTS attestations_created_at ON attestations (created_at);
+"""
+
+# attestation_id -> (quote_hash, created_at, record)
+Pending = Dict[str, Tuple[Optional[str], float, Dict[str, Any]]]
+
+
+def quote_hash(quote: str) -> str:
+    return hashlib.sha256(quote.encode()).hexdigest()
+
+
+class AttestationStore:
+    def __init__(
+        self,
+        path: str = STORE_PATH,
+        max_entries: int = STORE_MAX_ENTRIES,
+        max_age: float = STORE_MAX_AGE,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.commits = 0
+        self.write_errors = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self._pid: Optional[int] = None
+        self._init_lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _ensure(self):
+        """Open this process's connections and writer unless already done"""
+        if self._pid == os.getpid():
+            return
+        with self._init_lock:
+            if self._pid == os.getpid():
+                return
+            self._written = 0
+            # ":memory:" databases are per connection, so that case shares one
+            self._read_db = self._connect()
+            self._read_lock = threading.Lock()
+            self._write_lock = self._read_lock if self.path == ":memory:" else threading.Lock()
+            self._pending: Pending = {}
+            self._committing: Pending = {}
+            self._cond = threading.Condition()
+            self._closed = False
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        return db
+
+    def put(self, record: Dict[str, Any], quote: Optional[str] = None) -> Optional[str]:
+        """Queue an attestation record; returns the quote hash when it carries a quote
+
+        The record must not be mutated afterwards: it is serialized later by
+        the writer thread.
+        """
+        digest = quote_hash(quote) if quote else None
+        self._queue([(record, digest)])
+        return digest
+
+    def put_many(self, entries: Iterable[Tuple[Dict[str, Any], Optional[str]]]):
+        """Queue (record, quote) pairs for one group commit"""
+        self._queue([(record, quote_hash(quote) if quote else None) for record, quote in entries])
+
+    def _queue(self, entries):
+        self._ensure()
+        now = time.time()
+        with self._cond:
+            for record, digest in entries:
+                attestation_id = record["attestation_id"]
+                if attestation_id in self._pending or attestation_id in self._committing:
+                    # Same rule as the table: the first record for an id wins
+                    self._write_failed(f"{attestation_id} is already queued", 1)
+                    continue
+                self._pending[attestation_id] = (digest, now, record)
+            self._cond.notify()
+
+    def _write_loop(self):
+        db = self._read_db if self.path == ":memory:" else self._connect()
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    break
+                batch, self._pending = self._pending, {}
+                self._committing = batch
+            rows = []
+            for attestation_id, (digest, created_at, record) in batch.items():
+                try:
+                    rows.append((attestation_id, digest, created_at, json.dumps(record, default=str)))
+                except (TypeError, ValueError) as e:
+                    self._write_failed(f"{attestation_id}: {e}", 1)
+            try:
+                with self._write_lock:
+                    written = self._commit(db, rows)
+                    before, self._written = self._written, self._written + written
+                    if before // EVICT_EVERY != self._written // EVICT_EVERY:
+                        self._evict(db)
+            except Exception as e:
+                # Never let the writer die: the queue would then grow without bound
+                self._write_failed(e, 0)
+            with self._cond:
+                self._committing = {}
+                self._cond.notify_all()
+        if db is not self._read_db:
+            db.close()
+
+    def _commit(self, db: sqlite3.Connection, rows) -> int:
+        """Insert rows in one transaction, else one by one; returns how many were written"""
+        try:
+            db.execute("BEGIN")
+            db.executemany(INSERT, rows)
+            db.execute("COMMIT")
+            self.commits += 1
+            return len(rows)
+        except sqlite3.Error as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            if len(rows) == 1:
+                self._write_failed(e, 1)
+                return 0
+        written = 0
+        for row in rows:
+            try:
+                db.execute(INSERT, row)
+                written += 1
+            except sqlite3.Error as e:
+                self._write_failed(e, 1)
+        self.commits += 1
+        return written
+
+    def _write_failed(self, error, dropped: int):
+        self.write_errors += 1
+        self.dropped += dropped
+        self.last_error = str(error)
+        print(f"⚠️ Attestation store write failed: {error}")
+
+    def _find_pending(self, attestation_id: str = "", digest: Optional[str] = None):
+        with self._cond:
+            for queued in (self._pending, self._committing):
+                if attestation_id in queued:
+                    return queued[attestation_id][2]
+                if digest:
+                    # Newest first, as in the table
+                    for entry_digest, _, record in reversed(queued.values()):
+                        if entry_digest == digest:
+                            return record
+        return None
+
+    def _lookup(self, column: str, value: str) -> Optional[Dict[str, Any]]:
+        self._ensure()
+        if column == "attestation_id":
+            record = self._find_pending(attestation_id=value)
+        else:
+            record = self._find_pending(digest=value)
+        if record is None:
+            with self._read_lock:
+                row = self._read_db.execute(
+                    f"SELECT record FROM attestations WHERE {column} = ? AND created_at >= ?"
+                    " ORDER BY seq DESC LIMIT 1",
+                    (value, time.time() - self.max_age),
+                ).fetchone()
+            record = json.loads(row[0]) if row else None
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def get(self, attestation_id: str) -> Optional[Dict[str, Any]]:
+        return self._lookup("attestation_id", attestation_id)
+
+    def get_by_quote_hash(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Newest attestation for a quote; batched attestations share one quote"""
+        return self._lookup("quote_hash", digest.lower())
+
+    def find(self, attestation_id: str = "", digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Record by attestation_id, else the newest one for the quote hash"""
+        if attestation_id:
+            record = self.get(attestation_id)
+            if record is not None:
+                return record
+        if digest:
+            return self.get_by_quote_hash(digest)
+        return None
+
+    def _evict(self, db: sqlite3.Connection):
+        cursor = db.execute(
+            "DELETE FROM attestations WHERE created_at < ?", (time.time() - self.max_age,)
+        )
+        self.evicted += cursor.rowcount
+        cursor = db.execute(
+            "DELETE FROM attestations WHERE seq <= (SELECT seq FROM attestations"
+            " ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.evicted += cursor.rowcount
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued record is committed"""
+        self._ensure()
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._committing, timeout
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        self._ensure()
+        with self._read_lock:
+            (entries,) = self._read_db.execute("SELECT COUNT(*) FROM attestations").fetchone()
+        with self._cond:
+            queued = len(self._pending) + len(self._committing)
+        return {
+            "path": self.path,
+            "entries": entries,
+            "queued": queued,
+            "max_entries": self.max_entries,
+            "max_age": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "commits": self.commits,
+            "evicted": self.evicted,
+            "write_errors": self.write_errors,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+        }
+
+    def close(self):
+        if self._pid != os.getpid():
+            # Nothing was opened in this process
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        with self._read_lock:
+            self._read_db.close()
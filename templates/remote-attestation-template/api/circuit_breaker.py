@@ -0,0 +1,148 @@
+"""
+Circuit breakers for the TEE backends
+
+Each backend (the dstack SDK client, dstack.sock, tappd.sock) sits behind its
+own breaker. After BREAKER_FAILURE_THRESHOLD consecutive failures the breaker
+opens and calls are rejected immediately instead of each waiting through a
+connect or call timeout. Once the backoff has elapsed it goes half-open and
+lets exactly one probe through: success closes it, failure re-opens it with
+the backoff doubled (capped at BREAKER_MAX_BACKOFF, with jitter so workers
+do not probe in lockstep).
+
+LastGood keeps the most recent successful response per key so read-only
+calls can still be answered, marked stale, while every backend is open.
+"""
+
+import os
+import random
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 3))
+BREAKER_BASE_BACKOFF = float(os.getenv("BREAKER_BASE_BACKOFF", 1))
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", 60))
+BREAKER_STALE_MAX_AGE = float(os.getenv("BREAKER_STALE_MAX_AGE", 3600))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit open, retrying in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        base_backoff: float = BREAKER_BASE_BACKOFF,
+        max_backoff: float = BREAKER_MAX_BACKOFF,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        # Consecutive trips without a success; drives the backoff
+        self.trips = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+        self.opened = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; half-open admits a single probe"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() >= self.retry_at:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._probing = False
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        if error is not None:
+            self.last_error = str(error) or type(error).__name__
+        if self.state == OPEN:
+            # Calls admitted before the trip failing late: the breaker is already open
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            backoff = min(self.max_backoff, self.base_backoff * 2**self.trips)
+            self.retry_at = time.monotonic() + backoff * random.uniform(0.8, 1.0)
+            self.trips += 1
+            self.opened += 1
+            self.state = OPEN
+            self._probing = False
+
+    @property
+    def retry_in(self) -> float:
+        return max(0.0, self.retry_at - time.monotonic()) if self.state != CLOSED else 0.0
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs):
+        """Await fn through the breaker, raising CircuitOpenError when rejected"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in)
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        except BaseException:
+            # Cancelled mid-probe: no verdict, let the next caller probe instead
+            self._probing = False
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in": round(self.retry_in, 3),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+class LastGood:
+    """Most recent successful response per key, served stale during outages"""
+
+    def __init__(self, max_age: float = BREAKER_STALE_MAX_AGE):
+        self.max_age = max_age
+        self.served = 0
+        self._entries: Dict[str, Tuple[float, str, Any]] = {}
+
+    def remember(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic(), datetime.now().isoformat(), value)
+
+    def recall(self, key: str) -> Optional[Dict[str, Any]]:
+        """The last good dict for key marked stale, or None if missing or too old"""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.max_age:
+            return None
+        self.served += 1
+        return {**entry[2], "stale": True, "fetched_at": entry[1]}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"keys": sorted(self._entries), "served": self.served, "max_age": self.max_age}
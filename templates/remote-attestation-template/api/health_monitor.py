@@ -0,0 +1,104 @@
+"""
+Background TEE health monitor
+
+Probes TEE reachability on a fixed interval from a background task and keeps
+the last known state in memory. Health endpoints read that state instead of
+touching the dstack socket, so liveness/readiness probe traffic never
+competes with attestation traffic.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+DEFAULT_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", 10))
+DEFAULT_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", 5))
+DEFAULT_STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", 30))
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        probe: Callable[[], Awaitable[Dict[str, Any]]],
+        interval: float = DEFAULT_INTERVAL,
+        timeout: float = DEFAULT_TIMEOUT,
+        stale_after: float = DEFAULT_STALE_AFTER,
+    ):
+        self.probe = probe
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.status: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.checked_at: Optional[float] = None
+        self.checked_at_iso: Optional[str] = None
+        self.started_at = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Run the probe once and record its outcome"""
+        try:
+            status = await asyncio.wait_for(self.probe(), self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error = str(e) or type(e).__name__
+            self.consecutive_failures += 1
+        else:
+            self.status = status
+            self.last_error = None
+            self.consecutive_failures = 0
+        self.checked_at = time.monotonic()
+        self.checked_at_iso = datetime.now().isoformat()
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def age(self) -> Optional[float]:
+        if self.checked_at is None:
+            return None
+        return time.monotonic() - self.checked_at
+
+    @property
+    def stale(self) -> bool:
+        age = self.age
+        return age is None or age > self.stale_after
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def ready(self) -> bool:
+        return self.status is not None and self.last_error is None and not self.stale
+
+    def snapshot(self) -> Dict[str, Any]:
+        age = self.age
+        return {
+            "ready": self.ready,
+            "stale": self.stale,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "checked_at": self.checked_at_iso,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "monitor_running": self.running,
+        }
@@ -0,0 +1,102 @@
+"""
+Concurrent load runner behind /api/test/all
+
+Runs each test case a number of times with a bounded number of calls in
+flight and summarises latency (from time.perf_counter_ns), error rate and
+throughput per case and overall, as plain JSON-ready dicts.
+"""
+
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+TestCase = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+def percentile(sorted_values: Sequence[int], pct: float) -> int:
+    """Nearest-rank percentile of an already sorted sequence
+
+    The smallest value with at least pct percent of the values at or below
+    it, i.e. the ceil(pct / 100 * n)-th value; never interpolated.
+    """
+    if not sorted_values:
+        return 0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+def summarize(durations_ns: List[int]) -> Dict[str, float]:
+    """min/mean/p50/p95/p99/max in milliseconds"""
+    if not durations_ns:
+        return {}
+    ordered = sorted(durations_ns)
+    to_ms = 1e-6
+    return {
+        "min": ordered[0] * to_ms,
+        "mean": sum(ordered) / len(ordered) * to_ms,
+        "p50": percentile(ordered, 50) * to_ms,
+        "p95": percentile(ordered, 95) * to_ms,
+        "p99": percentile(ordered, 99) * to_ms,
+        "max": ordered[-1] * to_ms,
+    }
+
+
+async def run_cases(
+    cases: List[TestCase], iterations: int = 1, concurrency: int = 1
+) -> Dict[str, Any]:
+    """Run every case `iterations` times with at most `concurrency` calls in flight
+
+    Runs are interleaved across cases so a slow case does not hold the
+    others back to the end of the run.
+    """
+    durations: Dict[str, List[int]] = {name: [] for name, _ in cases}
+    errors: Dict[str, List[str]] = {name: [] for name, _ in cases}
+    pending = iter([case for _ in range(iterations) for case in cases])
+
+    async def worker():
+        for name, call in pending:
+            start = time.perf_counter_ns()
+            try:
+                await call()
+            except Exception as e:
+                errors[name].append(str(e) or type(e).__name__)
+            else:
+                durations[name].append(time.perf_counter_ns() - start)
+
+    started = time.perf_counter_ns()
+    workers = max(1, min(concurrency, iterations * len(cases)))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed_ns = time.perf_counter_ns() - started
+    elapsed_s = elapsed_ns / 1e9 or 1e-9
+
+    results = []
+    for name, _ in cases:
+        ok, failed = durations[name], errors[name]
+        runs = len(ok) + len(failed)
+        result = {
+            "test": name,
+            "status": "failed" if failed else "passed",
+            "runs": runs,
+            "errors": len(failed),
+            "error_rate": len(failed) / runs if runs else 0.0,
+            "duration_ms": sum(ok) / len(ok) / 1e6 if ok else None,
+            "latency_ms": summarize(ok),
+        }
+        if failed:
+            result["error"] = failed[-1]
+        results.append(result)
+
+    total_runs = sum(r["runs"] for r in results)
+    total_errors = sum(r["errors"] for r in results)
+    return {
+        "iterations": iterations,
+        "concurrency": workers,
+        "total_runs": total_runs,
+        "total_errors": total_errors,
+        "error_rate": total_errors / total_runs if total_runs else 0.0,
+        "elapsed_ms": elapsed_ns / 1e6,
+        "throughput_rps": total_runs / elapsed_s,
+        "latency_ms": summarize([d for ok in durations.values() for d in ok]),
+        "results": results,
+    }
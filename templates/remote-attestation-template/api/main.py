@@ -4,18 +4,46 @@ FastAPI backend for dstack Remote Attestation Template
 Provides Python-based TEE operations alongside the NextJS frontend
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from contextlib import asynccontextmanager, nullcontext
 import asyncio
+import hmac
 import os
 import json
+import secrets
 import socket
 import requests
+import time
 from datetime import datetime
 import uvicorn
 
+from socket_transport import DstackSocketTransport, TappdSocketTransport
+from admission import ADMISSION_ENABLED, AdmissionController, client_identity, retry_after_header
+from attestation_jobs import JOB_MAX_WAIT, JobQueue, webhook_error
+from circuit_breaker import CircuitBreaker, CircuitOpenError, LastGood
+from ttl_cache import AsyncTTLCache
+from health_monitor import HealthMonitor
+from quote_aggregator import QUOTE_BATCH_ENABLED, QuoteAggregator
+from load_runner import run_cases
+from quote_verifier import QuoteVerifier, chunked, create_pool, verify_chunk
+from rtmr_replay import RtmrReplayer
+import response_codec
+from status_stream import StatusBroadcaster
+from attestation_store import STORE_ENABLED, AttestationStore, quote_hash
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    DEMO_FALLBACKS,
+    METRICS_ENABLED,
+    REGISTRY,
+    SOCKET_CALL_LATENCY,
+    MetricsMiddleware,
+)
+
 # Import the real dstack SDK 0.5.1
 try:
     from dstack_sdk import AsyncDstackClient
@@ -27,6 +55,22 @@ except ImportError:
     print("⚠️ dstack SDK not available, using fallback")
 
 
+# Read-only socket calls whose last good response may be served stale during an outage
+STALE_OK_METHODS = frozenset(
+    {"info", "GetTEEInfo", "GetMeasurements", "GetSecurityStatus", "GetTEECapabilities"}
+)
+
+
+def _merge_event_log_check(result, replayed):
+    """Fold an RtmrReplayer.check_quotes() entry into a QuoteVerifier result"""
+    result["checks"]["event_log"] = replayed["valid"]
+    if not replayed["valid"]:
+        result["verified"] = False
+        result["errors"].append(replayed.get("error", "Event log replay does not match quote RTMRs"))
+        if "mismatches" in replayed:
+            result["event_log_mismatches"] = replayed["mismatches"]
+
+
 # Real dstack SDK integration for TEE operations
 class DStackSDK:
     def __init__(self, api_key=None, endpoint=None):
@@ -38,8 +82,26 @@ class DStackSDK:
             or os.getenv("DSTACK_ENDPOINT", "")
             or os.getenv("PHALA_ENDPOINT", "")
         )
-        self.socket_path = "/var/run/dstack.sock"
-        self.tappd_socket = "/var/run/tappd.sock"
+        self.socket_path = os.getenv("DSTACK_SOCKET_PATH", "/var/run/dstack.sock")
+        self.tappd_socket = os.getenv("TAPPD_SOCKET_PATH", "/var/run/tappd.sock")
+
+        # Pooled, keep-alive connections to both sockets
+        self.dstack_transport = DstackSocketTransport(self.socket_path)
+        self.tappd_transport = TappdSocketTransport(self.tappd_socket)
+
+        # A failing backend is skipped until its breaker's backoff elapses
+        self.breakers = {name: CircuitBreaker(name) for name in ("sdk", "dstack", "tappd")}
+        self.last_good = LastGood()
+
+        # Values that are static for the life of a CVM, cached per key
+        self.cache = AsyncTTLCache(
+            ttls={
+                "tee_info": float(os.getenv("TEE_CACHE_TTL_INFO", 300)),
+                "measurements": float(os.getenv("TEE_CACHE_TTL_MEASUREMENTS", 300)),
+                "security_status": float(os.getenv("TEE_CACHE_TTL_SECURITY", 15)),
+                "capabilities": float(os.getenv("TEE_CACHE_TTL_CAPABILITIES", 3600)),
+            }
+        )
 
         # Initialize real dstack SDK client
         if DSTACK_AVAILABLE:
@@ -53,61 +115,131 @@ class DStackSDK:
             self.real_sdk = None
             print("ℹ️ Using fallback implementation")
 
-    async def _call_dstack_api(self, method: str, params: dict = None):
-        """Call dstack API via Unix socket"""
-        try:
-            # Try dstack socket first
-            if os.path.exists(self.socket_path):
-                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                sock.connect(self.socket_path)
+        # In-process TDX quote verification; the process pool is started on first bulk use
+        self.verifier = QuoteVerifier()
+        self._verify_pool = None
+        # Event-log replay resumes from the boot prefix instead of starting over
+        self.replayer = RtmrReplayer()
 
-                request = {"method": method, "params": params or {}}
+        # Optional: coalesce concurrent quote requests under one Merkle root
+        self.aggregator = None
+        if QUOTE_BATCH_ENABLED and self.real_sdk:
+            self.aggregator = QuoteAggregator(self.real_sdk.get_quote)
 
-                sock.sendall(json.dumps(request).encode() + b"\n")
-                response = sock.recv(4096).decode()
-                sock.close()
-
-                return json.loads(response)
-
-            # Fallback to tappd socket
-            elif os.path.exists(self.tappd_socket):
-                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                sock.connect(self.tappd_socket)
-
-                # Use tappd protocol
-                request = f"GET http://dstack/prpc/Tappd.{method} HTTP/1.1\r\n\r\n"
-                sock.sendall(request.encode())
-                response = sock.recv(4096).decode()
-                sock.close()
-
-                # Parse HTTP response
-                if "200 OK" in response:
-                    body = response.split("\r\n\r\n", 1)[1]
-                    return json.loads(body) if body else {}
-
-            # If no sockets available, return TEE environment info
-            return {"error": "TEE sockets not available", "mock": True}
-
-        except Exception as e:
-            return {"error": str(e), "mock": True}
-
-    async def generate_attestation(self, data, nonce):
-        """Generate real TEE attestation - bulletproof approach"""
+    async def _call_dstack_api(self, method: str, params: dict = None):
+        """Call dstack API via Unix socket without blocking the event loop
+
+        dstack.sock is tried first, then tappd.sock, each behind its breaker.
+        When neither answers, read-only methods get their last good response
+        marked stale.
+        """
+        error = "TEE sockets not available"
+        for socket_name, path in (("dstack", self.socket_path), ("tappd", self.tappd_socket)):
+            if not os.path.exists(path):
+                continue
+            outcome = "error"
+            start = time.perf_counter()
+            try:
+                if socket_name == "dstack":
+                    result = await self.breakers["dstack"].call(
+                        self.dstack_transport.call, method, params
+                    )
+                    # The socket answered; an error in the body is the caller's to handle
+                    if not (isinstance(result, dict) and result.get("error")):
+                        outcome = "ok"
+                        if method in STALE_OK_METHODS:
+                            self.last_good.remember(method, result)
+                    return result
+                status, body = await self.breakers["tappd"].call(
+                    self.tappd_transport.call, method, params
+                )
+                if status == 200:
+                    outcome = "ok"
+                    if method in STALE_OK_METHODS and isinstance(body, dict):
+                        self.last_good.remember(method, body)
+                    return body
+                error = f"tappd returned HTTP {status}"
+            except CircuitOpenError as e:
+                # Rejected without touching the socket, so there is no latency to record
+                outcome = None
+                error = str(e)
+            except Exception as e:
+                error = str(e)
+            finally:
+                if outcome:
+                    SOCKET_CALL_LATENCY.observe(
+                        time.perf_counter() - start, (method, socket_name, outcome)
+                    )
+
+        if method in STALE_OK_METHODS:
+            stale = self.last_good.recall(method)
+            if stale is not None:
+                return stale
+        return {"error": error, "mock": True}
+
+    async def _resolve_attestation_context(self):
+        """Pick the attestation source and fetch its info once: (source, info)"""
+        if self.real_sdk:
+            try:
+                return "sdk", await self.breakers["sdk"].call(self.real_sdk.info)
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                print(f"AsyncDstackClient failed: {e}")
+        return await self._socket_attestation_context()
+
+    async def _socket_attestation_context(self):
+        result = await self._call_dstack_api("info", {})
+        if not result.get("error"):
+            return "socket", result
+        return "demo", None
+
+    async def _sdk_quote(self, data, nonce):
+        """(quote, batch info or None), through the aggregator when it is enabled"""
+        if self.aggregator:
+            batched = await self.aggregator.submit(f"{data}-{nonce}".encode())
+            return batched["quote"], batched
+        return await self.real_sdk.get_quote(f"{data}-{nonce}".encode()[:64]), None
+
+    def _process_pool(self):
+        if self._verify_pool is None:
+            self._verify_pool = create_pool()
+        return self._verify_pool
+
+    async def _replay_rtmrs(self, event_log, offload=False):
+        """Replay inline, or in a thread so the event loop is not held
+
+        A thread, not the process pool: the shared replayer keeps its boot
+        prefix checkpoint, and the event log is not pickled per call.
+        """
+        if not offload:
+            return self.replayer.replay_rtmrs(event_log)
+        return await asyncio.to_thread(self.replayer.replay_rtmrs, event_log)
+
+    async def generate_attestation(self, data, nonce, context=None, offload_replay=False):
+        """Generate real TEE attestation - bulletproof approach
+
+        context is a (source, info) pair from _resolve_attestation_context;
+        batch callers pass it in so info() is fetched once per batch.
+        offload_replay moves event-log replay off the event loop, to a thread.
+        """
+        # The nonce is client-chosen; the random suffix keeps stored ids from colliding
+        unique = f"{nonce}-{secrets.token_hex(6)}"
         try:
+            source, info = context or await self._resolve_attestation_context()
+
             # Try real dstack SDK first
-            if self.real_sdk:
+            if source == "sdk":
                 try:
-                    info = await self.real_sdk.info()
-                    quote_data = f"{data}-{nonce}".encode()[:64]
-                    quote = await self.real_sdk.get_quote(quote_data)
+                    quote, batched = await self.breakers["sdk"].call(self._sdk_quote, data, nonce)
 
-                    return {
-                        "attestation_id": f"tee-{info.app_id}-{nonce}",
+                    result = {
+                        "attestation_id": f"tee-{info.app_id}-{unique}",
                         "data": data,
                         "nonce": nonce,
                         "tee_quote": quote.quote,
                         "event_log": quote.event_log,
-                        "rtmrs": quote.replay_rtmrs(),
+                        "rtmrs": await self._replay_rtmrs(quote.event_log, offload_replay),
                         "app_id": info.app_id,
                         "instance_id": info.instance_id,
                         "device_id": info.device_id,
@@ -118,29 +250,41 @@ class DStackSDK:
                         "real_tee": True,
                         "source": "AsyncDstackClient",
                     }
+                    if batched:
+                        # report_data is the Merkle root; the proof ties this payload to it
+                        result["merkle_root"] = batched["merkle_root"]
+                        result["merkle_proof"] = batched["merkle_proof"]
+                        result["batch_size"] = batched["batch_size"]
+                    return result
+                except CircuitOpenError:
+                    source, info = await self._socket_attestation_context()
                 except Exception as e:
                     print(f"AsyncDstackClient failed: {e}")
+                    source, info = await self._socket_attestation_context()
 
             # Try socket-based approach
-            result = await self._call_dstack_api("info", {})
-            if not result.get("error"):
-                return {
-                    "attestation_id": f"socket-{nonce}",
+            if source == "socket":
+                result = {
+                    "attestation_id": f"socket-{unique}",
                     "data": data,
                     "nonce": nonce,
-                    "socket_info": result,
+                    "socket_info": info,
                     "timestamp": datetime.now().isoformat(),
                     "environment": "Intel TDX",
                     "dstack_version": "0.5.3",
                     "real_tee": True,
                     "source": "dstack Socket",
                 }
+                if info.get("stale"):
+                    result["stale"] = True
+                return result
         except Exception as e:
             print(f"All TEE methods failed: {e}")
 
         # Final fallback - always return something useful
+        DEMO_FALLBACKS.inc(("generate_attestation",))
         return {
-            "attestation_id": f"demo-{nonce}",
+            "attestation_id": f"demo-{unique}",
             "data": data,
             "nonce": nonce,
             "tee_available": os.path.exists("/var/run/dstack.sock"),
@@ -154,6 +298,38 @@ class DStackSDK:
             "note": "TEE sockets available but SDK connection failed",
         }
 
+    async def generate_attestation_batch(self, items, concurrency: int = 8, slot=None):
+        """Attest many (data, nonce) pairs, yielding (index, result, error) as each finishes
+
+        info() is resolved once for the whole batch and quote calls run with
+        at most `concurrency` in flight, each inside `slot()` when given.
+        """
+        slot = slot or nullcontext
+        context = await self._resolve_attestation_context()
+        queue: asyncio.Queue = asyncio.Queue()
+        pending = iter(enumerate(items))
+
+        async def worker():
+            for index, (data, nonce) in pending:
+                try:
+                    async with slot():
+                        result = await self.generate_attestation(data, nonce, context=context)
+                    await queue.put((index, result, None))
+                except Exception as e:
+                    await queue.put((index, None, str(e)))
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))
+        ]
+        try:
+            for _ in range(len(items)):
+                yield await queue.get()
+        finally:
+            # Client went away or the batch finished: stop outstanding quote calls
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
     async def verify_attestation(self, attestation, expected_data):
         """Verify TEE attestation"""
         result = await self._call_dstack_api(
@@ -162,11 +338,70 @@ class DStackSDK:
         )
         return result
 
+    async def verify_quote(
+        self, quote, expected_measurements=None, expected_report_data=None, event_log=None
+    ):
+        """Verify a TDX quote locally: signature chain, TCB collateral, measurements"""
+        result = await asyncio.to_thread(
+            self.verifier.verify, quote, expected_measurements, expected_report_data
+        )
+        if event_log is not None:
+            replayed = await asyncio.to_thread(self.replayer.check_quotes, [quote], [event_log])
+            _merge_event_log_check(result, replayed[0])
+        return result
+
+    async def verify_quotes(
+        self,
+        quotes,
+        expected_measurements=None,
+        expected_report_data=None,
+        event_logs=None,
+        chunksize=64,
+    ):
+        """Verify many quotes across the verification process pool, preserving order"""
+        if not quotes:
+            return []
+        # The first quote runs here so collateral is fetched once and workers read it from disk
+        first = await self.verify_quote(quotes[0], expected_measurements, expected_report_data)
+        pool = self._process_pool()
+        loop = asyncio.get_running_loop()
+        items = [(q, expected_measurements, expected_report_data) for q in quotes[1:]]
+        chunks = asyncio.gather(
+            *(
+                loop.run_in_executor(pool, verify_chunk, chunk)
+                for chunk in chunked(items, chunksize)
+            )
+        )
+        # Event logs replay here while the pool checks signatures, sharing one replay prefix
+        replays = None
+        if event_logs is not None:
+            replays = await asyncio.to_thread(self.replayer.check_quotes, quotes, event_logs)
+        results = [first] + [result for chunk in await chunks for result in chunk]
+        if replays is not None:
+            for result, replayed in zip(results, replays):
+                _merge_event_log_check(result, replayed)
+        return results
+
+    def breaker_stats(self):
+        return {
+            **{name: breaker.stats() for name, breaker in self.breakers.items()},
+            "last_good": self.last_good.stats(),
+        }
+
+    def close(self):
+        if self._verify_pool is not None:
+            self._verify_pool.shutdown(cancel_futures=True)
+            self._verify_pool = None
+
     async def get_tee_info(self):
         """Get real TEE information"""
+        return await self.cache.get_or_load("tee_info", self._load_tee_info)
+
+    async def _load_tee_info(self):
         result = await self._call_dstack_api("GetTEEInfo", {})
 
         if result.get("mock"):
+            DEMO_FALLBACKS.inc(("tee_info",))
             # Return real environment info
             return {
                 "type": "Intel TDX",
@@ -181,9 +416,13 @@ class DStackSDK:
 
     async def get_measurements(self):
         """Get TEE measurements"""
+        return await self.cache.get_or_load("measurements", self._load_measurements)
+
+    async def _load_measurements(self):
         result = await self._call_dstack_api("GetMeasurements", {})
 
         if result.get("mock"):
+            DEMO_FALLBACKS.inc(("measurements",))
             # Try to get real measurements from environment
             return {
                 "mrtd": os.getenv("MRTD", "unknown"),
@@ -205,9 +444,13 @@ class DStackSDK:
 
     async def get_security_status(self):
         """Get TEE security status"""
+        return await self.cache.get_or_load("security_status", self._load_security_status)
+
+    async def _load_security_status(self):
         result = await self._call_dstack_api("GetSecurityStatus", {})
 
         if result.get("mock"):
+            DEMO_FALLBACKS.inc(("security_status",))
             return {
                 "secure": True,
                 "tee_enabled": True,
@@ -263,9 +506,13 @@ class DStackSDK:
 
     async def get_tee_capabilities(self):
         """Get TEE capabilities"""
+        return await self.cache.get_or_load("capabilities", self._load_tee_capabilities)
+
+    async def _load_tee_capabilities(self):
         result = await self._call_dstack_api("GetTEECapabilities", {})
 
         if result.get("mock"):
+            DEMO_FALLBACKS.inc(("capabilities",))
             return {
                 "capabilities": ["attestation", "sealing", "measurement"],
                 "protocols": ["RA-TLS", "RA-HTTPS"],
@@ -275,7 +522,19 @@ class DStackSDK:
         return result
 
 
-app = FastAPI(title="dstack Remote Attestation API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    health.start()
+    yield
+    await health.stop()
+    await status_stream.stop()
+    await jobs.stop()
+    sdk.close()
+    if store:
+        store.close()
+
+
+app = FastAPI(title="dstack Remote Attestation API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS for Phala environment
 app.add_middleware(
@@ -290,21 +549,260 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so CORS preflights and errors are timed too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Batch attestation limits
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 10000))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 64))
+
+# /api/test/all load-run limits
+TEST_MAX_ITERATIONS = int(os.getenv("TEST_MAX_ITERATIONS", 1000))
+TEST_MAX_CONCURRENCY = int(os.getenv("TEST_MAX_CONCURRENCY", 64))
+
+# Bearer token for /api/cache/invalidate; without one only loopback clients may invalidate
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "::ffff:127.0.0.1")
+
 # Initialize SDK
 sdk = DStackSDK(
     api_key=os.getenv("DSTACK_API_KEY", "test-key"),
     endpoint=os.getenv("DSTACK_ENDPOINT", "https://api.dstack.network"),
 )
 
+# Per-client token buckets and a bounded slot pool in front of quote generation
+admission = AdmissionController() if ADMISSION_ENABLED else None
+
+
+def _admission_client(http_request: Request) -> str:
+    peer = http_request.client.host if http_request.client else "unknown"
+    return client_identity(peer, http_request.headers)
+
+
+def check_quote_rate(http_request: Request):
+    """Spend one of the client's tokens for a request that queues its quotes, or raise 429"""
+    if admission:
+        rejection = admission.check_rate(_admission_client(http_request))
+        if rejection is not None:
+            raise _too_many_quotes(*rejection)
+
+
+def _too_many_quotes(reason: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"error": "Too many quote requests", "reason": reason},
+        headers={"Retry-After": retry_after_header(retry_after)},
+    )
+
+
+@asynccontextmanager
+async def quote_admission(http_request: Request):
+    """Hold a quote slot for the body of the block, or raise 429 with Retry-After"""
+    if admission is None:
+        yield
+        return
+    rejection = await admission.acquire(_admission_client(http_request))
+    if rejection is not None:
+        raise _too_many_quotes(*rejection)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        admission.release(time.monotonic() - started)
+
+
+@asynccontextmanager
+async def quote_slot():
+    """Hold a quote slot for one item of already-admitted work, such as a batch"""
+    if admission is None:
+        yield
+        return
+    await admission.acquire_slot()
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        admission.release(time.monotonic() - started)
+
+
+# Quote generation for clients that asked for a job id instead of waiting
+jobs = JobQueue()
+
+
+# Generated attestations, looked up later by verify and submit
+store = AttestationStore() if STORE_ENABLED else None
+
+
+def remember_attestation(result):
+    """Persist a generated attestation and tag it with its quote_hash"""
+    if store and isinstance(result, dict) and result.get("attestation_id"):
+        quote = result.get("tee_quote")
+        if quote:
+            result["quote_hash"] = quote_hash(quote)
+        store.put(result, quote)
+    return result
+
+
+async def stored_attestation(attestation_id: str = "", digest: Optional[str] = None):
+    """Look a prior attestation up without running SQLite on the event loop"""
+    if not store:
+        return None
+    return await asyncio.to_thread(store.find, attestation_id, digest)
+
+
+async def probe_tee_health():
+    """Resolve the attestation backend the way traffic does, then warm the security status cache
+
+    AsyncDstackClient is tried first, then the dstack and tappd sockets, each
+    behind the breaker requests use. Demo mode or a stale answer means no
+    backend really responded, so the probe fails and readiness goes to 503.
+    """
+    source, info = await sdk._resolve_attestation_context()
+    if source == "demo":
+        raise RuntimeError("No TEE backend answered (AsyncDstackClient, dstack.sock, tappd.sock)")
+    if source == "socket" and (info.get("mock") or info.get("stale")):
+        raise RuntimeError("TEE socket answered from a fallback")
+    status = {**await sdk._load_security_status(), "tee_enabled": True, "backend": source}
+    sdk.cache.set("security_status", status)
+    return status
+
+
+health = HealthMonitor(probe_tee_health)
+
+
+def _stream_source(key, loader):
+    """Load straight from the TEE and refresh the request cache with the result"""
+
+    async def load():
+        value = await loader()
+        sdk.cache.set(key, value)
+        return value
+
+    return load
+
+
+status_stream = StatusBroadcaster(
+    {
+        "tee_info": _stream_source("tee_info", sdk._load_tee_info),
+        "measurements": _stream_source("measurements", sdk._load_measurements),
+        "security_status": _stream_source("security_status", sdk._load_security_status),
+    }
+)
+
+
+def _cache_metrics():
+    stats = sdk.cache.stats()
+    return [
+        (("hit",), stats["hits"]),
+        (("miss",), stats["misses"]),
+        (("coalesced",), stats["coalesced"]),
+        (("error",), stats["errors"]),
+    ]
+
+
+REGISTRY.callback(
+    "tee_cache_lookups_total", "TEE cache lookups by result", ("result",), _cache_metrics, "counter"
+)
+REGISTRY.callback(
+    "tee_cache_hit_ratio",
+    "Share of TEE cache lookups served without a load",
+    (),
+    lambda: [((), sdk.cache.stats()["hit_rate"])],
+)
+REGISTRY.callback(
+    "tee_cache_entries",
+    "Entries currently held in the TEE cache",
+    (),
+    lambda: [((), sdk.cache.stats()["entries"])],
+)
+REGISTRY.callback(
+    "tee_attestation_jobs",
+    "Attestation jobs waiting for or holding a worker",
+    ("state",),
+    lambda: [(("queued",), jobs.stats()["queued"]), (("running",), jobs.stats()["running"])],
+)
+REGISTRY.callback(
+    "tee_attestation_jobs_total",
+    "Attestation jobs by outcome",
+    ("outcome",),
+    lambda: [
+        (("done",), jobs.completed),
+        (("failed",), jobs.failed),
+        (("rejected",), jobs.rejected),
+    ],
+    "counter",
+)
+if admission:
+    REGISTRY.callback(
+        "tee_admission_rejected_total",
+        "Quote requests refused with 429, by reason",
+        ("reason",),
+        lambda: [
+            (("rate_limited",), admission.rate_limited),
+            (("queue_full",), admission.queue_full),
+            (("queue_timeout",), admission.timed_out),
+        ],
+        "counter",
+    )
+    REGISTRY.callback(
+        "tee_admission_waiting",
+        "Quote requests waiting for a slot",
+        (),
+        lambda: [((), admission.stats()["waiting"])],
+    )
+REGISTRY.callback(
+    "tee_breaker_open",
+    "1 while a TEE backend's circuit breaker is open or half-open",
+    ("backend",),
+    lambda: [((name,), int(b.state != "closed")) for name, b in sdk.breakers.items()],
+)
+REGISTRY.callback(
+    "tee_breaker_rejected_total",
+    "Calls rejected by an open TEE circuit breaker",
+    ("backend",),
+    lambda: [((name,), b.rejected) for name, b in sdk.breakers.items()],
+    "counter",
+)
+
 
 class AttestationRequest(BaseModel):
     data: str
     nonce: Optional[str] = None
+    # Implies job mode: the finished job is POSTed here
+    webhook_url: Optional[str] = None
+
+
+class BatchAttestationRequest(BaseModel):
+    items: List[AttestationRequest]
+    concurrency: Optional[int] = None
 
 
 class VerificationRequest(BaseModel):
-    attestation_id: str
-    expected_data: str
+    attestation_id: str = ""
+    expected_data: str = ""
+    # With a quote (hex or base64) verification runs locally instead of over the socket
+    quote: Optional[str] = None
+    # Or resolve a previously generated quote from the attestation store
+    quote_hash: Optional[str] = None
+    expected_measurements: Optional[Dict[str, str]] = None
+    expected_report_data: Optional[str] = None
+    # JSON event log to replay against the quote's RTMRs
+    event_log: Optional[str] = None
+
+
+class BatchVerificationRequest(BaseModel):
+    quotes: List[str]
+    expected_measurements: Optional[Dict[str, str]] = None
+    expected_report_data: Optional[str] = None
+    event_logs: Optional[List[str]] = None
+
+
+class SubmissionRequest(BaseModel):
+    quote: Optional[str] = None
+    attestation_id: str = ""
+    quote_hash: Optional[str] = None
 
 
 class TEEExecutionRequest(BaseModel):
@@ -323,8 +821,9 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint for monitoring"""
-    tee_status = await sdk.get_security_status()
+    """Health check endpoint for monitoring, served from the last background probe"""
+    # A failed or stale probe leaves the last good status behind; do not report it as current
+    tee_status = health.status if health.ready else {}
 
     return {
         "status": "healthy",
@@ -332,39 +831,263 @@ async def health_check():
         "version": "1.0.0",
         "tee_available": tee_status.get("tee_enabled", False),
         "attestation_ready": tee_status.get("attestation_available", False),
+        "health": health.snapshot(),
+        "breakers": sdk.breaker_stats(),
         "timestamp": datetime.now().isoformat(),
     }
 
 
+@app.get("/api/health/live")
+async def liveness():
+    """Liveness: the event loop is serving requests"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/api/health/ready")
+async def readiness():
+    """Readiness: the last TEE probe succeeded and is not stale"""
+    snapshot = health.snapshot()
+    return JSONResponse(
+        status_code=200 if snapshot["ready"] else 503,
+        content={
+            "status": "ready" if snapshot["ready"] else "not_ready",
+            **snapshot,
+            "timestamp": datetime.now().isoformat(),
+        },
+    )
+
+
+def negotiated_response(http_request: Request, payload) -> Response:
+    """JSON or CBOR, optionally zstd/gzip compressed, per Accept / Accept-Encoding"""
+    body, headers = response_codec.encode(
+        jsonable_encoder(payload),
+        http_request.headers.get("accept"),
+        http_request.headers.get("accept-encoding"),
+    )
+    return Response(content=body, headers=headers)
+
+
+def submit_attestation_job(request: AttestationRequest, http_request: Request):
+    """Queue quote generation and answer 202 with the job to poll"""
+    if request.webhook_url:
+        error = webhook_error(request.webhook_url, jobs.webhook_hosts)
+        if error:
+            raise HTTPException(status_code=422, detail=error)
+    # Jobs wait in their own queue, so only the client's rate applies here
+    check_quote_rate(http_request)
+    nonce = request.nonce or str(datetime.now().timestamp())
+
+    async def run():
+        # Workers share the admission slots with synchronous requests
+        async with quote_slot():
+            result = await sdk.generate_attestation(
+                data=request.data, nonce=nonce, offload_replay=True
+            )
+        return remember_attestation(result)
+
+    job = jobs.submit(run, request.webhook_url)
+    if job is None:
+        raise _too_many_quotes("job_queue_full", jobs.retry_after())
+    location = f"/api/attestation/jobs/{job.id}"
+    return JSONResponse(
+        status_code=202,
+        headers={"Location": location},
+        content={
+            "status": "accepted",
+            "job_id": job.id,
+            "job_url": location,
+            "timestamp": datetime.now().isoformat(),
+        },
+    )
+
+
 @app.post("/api/attestation/generate")
-async def generate_attestation(request: AttestationRequest):
-    try:
-        nonce = request.nonce or str(datetime.now().timestamp())
-        result = await sdk.generate_attestation(data=request.data, nonce=nonce)
-        return {
+async def generate_attestation(
+    request: AttestationRequest,
+    http_request: Request,
+    async_job: bool = Query(False, alias="async"),
+):
+    """Generate an attestation, or with ?async=true, `Prefer: respond-async` or a
+    webhook_url, queue it as a job and answer 202 with the job id
+    """
+    if (
+        async_job
+        or request.webhook_url
+        or "respond-async" in http_request.headers.get("prefer", "").lower()
+    ):
+        return submit_attestation_job(request, http_request)
+    async with quote_admission(http_request):
+        try:
+            nonce = request.nonce or str(datetime.now().timestamp())
+            result = remember_attestation(
+                await sdk.generate_attestation(data=request.data, nonce=nonce)
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    return negotiated_response(
+        http_request,
+        {
             "status": "success",
             "data": result,
             "timestamp": datetime.now().isoformat(),
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        },
+    )
+
+
+@app.get("/api/attestation/jobs/{job_id}")
+async def get_attestation_job(
+    job_id: str, http_request: Request, wait: float = Query(0, ge=0, le=JOB_MAX_WAIT)
+):
+    """A queued attestation job; with wait > 0, long-poll until it finishes or wait runs out"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    await jobs.wait(job, wait)
+    return negotiated_response(
+        http_request,
+        {
+            "status": "success",
+            "job": job.to_dict(),
+            "timestamp": datetime.now().isoformat(),
+        },
+    )
+
+
+@app.post("/api/attestation/generate/batch")
+async def generate_attestation_batch(request: BatchAttestationRequest, http_request: Request):
+    """Attest many payloads in one request, streaming NDJSON lines as each completes
+
+    With `Accept: application/cbor` the lines are CBOR items (application/cbor-seq).
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items"
+        )
+    check_quote_rate(http_request)
+    concurrency = min(request.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    base_nonce = datetime.now().timestamp()
+    items = [
+        (item.data, item.nonce or f"{base_nonce}-{index}")
+        for index, item in enumerate(request.items)
+    ]
+
+    cbor = (
+        response_codec.negotiate_media_type(http_request.headers.get("accept"))
+        == response_codec.CBOR_MEDIA_TYPE
+    )
+
+    async def stream():
+        async for index, result, error in sdk.generate_attestation_batch(
+            items, concurrency, quote_slot
+        ):
+            if error is None:
+                line = {"index": index, "status": "success", "data": remember_attestation(result)}
+            else:
+                line = {"index": index, "status": "error", "error": error}
+            if cbor:
+                yield response_codec.cbor_dumps(
+                    response_codec.binary_fields(jsonable_encoder(line))
+                )
+            else:
+                yield json.dumps(line) + "\n"
+
+    media_type = response_codec.CBOR_SEQ_MEDIA_TYPE if cbor else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
 
 
 @app.post("/api/attestation/verify")
 async def verify_attestation(request: VerificationRequest):
+    quote, event_log, stored = request.quote, request.event_log, None
+    if not quote:
+        stored = await stored_attestation(request.attestation_id, request.quote_hash)
+        if stored and stored.get("tee_quote"):
+            quote = stored["tee_quote"]
+            event_log = event_log or stored.get("event_log")
+    if quote:
+        result = await sdk.verify_quote(
+            quote,
+            request.expected_measurements,
+            request.expected_report_data,
+            event_log,
+        )
+        return {
+            "status": "success",
+            "verified": result["verified"],
+            "attestation_id": request.attestation_id or (stored or {}).get("attestation_id", ""),
+            "stored": stored is not None,
+            "verification": result,
+            "timestamp": datetime.now().isoformat(),
+        }
+    if stored is None and (store or request.quote_hash or not request.attestation_id):
+        raise HTTPException(status_code=404, detail="No quote given and no stored attestation found")
     try:
         result = await sdk.verify_attestation(
             attestation=request.attestation_id, expected_data=request.expected_data
         )
+        # A fallback or error body is not a verdict; only an explicit true counts
         return {
             "status": "success",
-            "verified": result,
+            "verified": isinstance(result, dict) and result.get("verified") is True,
+            "attestation_id": request.attestation_id,
+            "stored": stored is not None,
+            "verification": result,
             "timestamp": datetime.now().isoformat(),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/attestation/verify/batch")
+async def verify_attestation_batch(request: BatchVerificationRequest):
+    """Verify many quotes locally across a process pool"""
+    if len(request.quotes) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items"
+        )
+    if request.event_logs is not None and len(request.event_logs) != len(request.quotes):
+        raise HTTPException(status_code=422, detail="event_logs must match quotes one to one")
+    results = await sdk.verify_quotes(
+        request.quotes,
+        request.expected_measurements,
+        request.expected_report_data,
+        request.event_logs,
+    )
+    verified = len([r for r in results if r["verified"]])
+    return {
+        "status": "success",
+        "total": len(results),
+        "verified": verified,
+        "failed": len(results) - verified,
+        "results": results,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@app.post("/api/attestation/submit")
+async def submit_attestation(request: SubmissionRequest):
+    """Prepare a quote for the explorer; the quote may come from the attestation store"""
+    quote = request.quote
+    stored = None if quote else await stored_attestation(request.attestation_id, request.quote_hash)
+    if stored and stored.get("tee_quote"):
+        quote = stored["tee_quote"]
+    if not quote:
+        raise HTTPException(status_code=404, detail="No quote given or stored for this attestation")
+    digest = quote_hash(quote)
+    return {
+        "status": "success",
+        "submission": {
+            "explorer_url": "https://proof.t16z.com/",
+            "quote_hash": digest,
+            "attestation_id": request.attestation_id or (stored or {}).get("attestation_id", ""),
+            "stored": stored is not None,
+            "submission_status": "ready",
+            "verification_url": f"https://proof.t16z.com/reports/{digest[:16]}",
+            "timestamp": datetime.now().isoformat(),
+        },
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
 @app.get("/api/tee/info")
 async def get_tee_info():
     try:
@@ -419,31 +1142,110 @@ async def get_security_status():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/stream")
+async def stream_status():
+    """SSE: a snapshot of TEE info, measurements and security status, then merge-patch deltas"""
+    if status_stream.full:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers")
+    return StreamingResponse(
+        status_stream.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the TEE info cache"""
+    return {
+        "status": "success",
+        "cache": sdk.cache.stats(),
+        "rtmr_replay": sdk.replayer.stats(),
+        "attestation_store": await asyncio.to_thread(store.stats) if store else None,
+        "stream": status_stream.stats(),
+        "admission": admission.stats() if admission else None,
+        "jobs": jobs.stats(),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def require_cache_admin(http_request: Request):
+    """Token holders may drop cached TEE state; with no token configured, only localhost may"""
+    if CACHE_ADMIN_TOKEN:
+        supplied = http_request.headers.get("Authorization", "")
+        if not supplied:
+            raise HTTPException(
+                status_code=401,
+                detail="Cache invalidation needs CACHE_ADMIN_TOKEN",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        token = supplied.removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(token.encode(), CACHE_ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Invalid cache admin token")
+    elif not http_request.client or http_request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(
+            status_code=403, detail="Cache invalidation needs CACHE_ADMIN_TOKEN or localhost"
+        )
+
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(http_request: Request, key: Optional[str] = None):
+    """Drop one cached key (tee_info, measurements, ...) or the whole cache"""
+    require_cache_admin(http_request)
+    if key is not None and key not in sdk.cache.ttls:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"Unknown cache key: {key}", "keys": sorted(sdk.cache.ttls)},
+        )
+    sdk.cache.invalidate(key)
+    return {
+        "status": "success",
+        "invalidated": [key] if key else sorted(sdk.cache.ttls),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request, socket, cache and fallback metrics"""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/test/all")
-async def test_all_apis():
-    """Test all available dstack APIs"""
-    results = []
+async def test_all_apis(
+    http_request: Request,
+    iterations: int = Query(1, ge=1, le=TEST_MAX_ITERATIONS),
+    concurrency: int = Query(1, ge=1, le=TEST_MAX_CONCURRENCY),
+    cached: bool = True,
+):
+    """Test all available dstack APIs, optionally as a concurrent load run
+
+    Each test case runs `iterations` times with up to `concurrency` calls in
+    flight. With cached=false the TEE cache is bypassed so every call
+    reaches the socket. Attestations take admission slots like any other quote.
+    """
+    check_quote_rate(http_request)
+
+    async def generate():
+        async with quote_slot():
+            return await sdk.generate_attestation(data="test", nonce="123")
 
     test_cases = [
+        ("Generate Attestation", generate),
+        ("Get TEE Info", sdk.get_tee_info if cached else sdk._load_tee_info),
+        ("Get Measurements", sdk.get_measurements if cached else sdk._load_measurements),
+        (
+            "Get Security Status",
+            sdk.get_security_status if cached else sdk._load_security_status,
+        ),
         (
-            "Generate Attestation",
-            lambda: sdk.generate_attestation(data="test", nonce="123"),
+            "Get TEE Capabilities",
+            sdk.get_tee_capabilities if cached else sdk._load_tee_capabilities,
         ),
-        ("Get TEE Info", lambda: sdk.get_tee_info()),
-        ("Get Measurements", lambda: sdk.get_measurements()),
-        ("Get Security Status", lambda: sdk.get_security_status()),
-        ("Get TEE Capabilities", lambda: sdk.get_tee_capabilities()),
     ]
 
-    for name, test_func in test_cases:
-        try:
-            start = datetime.now()
-            await test_func()
-            duration = (datetime.now() - start).total_seconds() * 1000
-            results.append({"test": name, "status": "passed", "duration_ms": duration})
-        except Exception as e:
-            results.append({"test": name, "status": "failed", "error": str(e)})
-
+    report = await run_cases(test_cases, iterations, concurrency)
+    results = report["results"]
     passed = len([r for r in results if r["status"] == "passed"])
     failed = len([r for r in results if r["status"] == "failed"])
 
@@ -451,7 +1253,8 @@ async def test_all_apis():
         "total_tests": len(results),
         "passed": passed,
         "failed": failed,
-        "results": results,
+        "cached": cached,
+        **report,
         "timestamp": datetime.now().isoformat(),
     }
 
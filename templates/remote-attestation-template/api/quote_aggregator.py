@@ -0,0 +1,143 @@
+"""
+Quote request micro-batching with Merkle-rooted report_data
+
+TDX quote generation is expensive and effectively serial. The aggregator
+collects attestation payloads for a short window, builds a Merkle tree over
+them and requests a single quote whose report_data is the tree root. Every
+caller receives the shared quote plus an inclusion proof for its payload.
+
+Leaves are SHA-256(0x00 || payload) and inner nodes SHA-256(0x01 || left ||
+right); an odd node at the end of a level is promoted unchanged. The 32-byte
+root is passed as report_data (the SDK zero-pads it to 64 bytes).
+"""
+
+import asyncio
+import hashlib
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+QUOTE_BATCH_ENABLED = os.getenv("QUOTE_BATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+QUOTE_BATCH_WINDOW_MS = float(os.getenv("QUOTE_BATCH_WINDOW_MS", 5))
+QUOTE_BATCH_MAX = int(os.getenv("QUOTE_BATCH_MAX", 256))
+
+
+def merkle_leaf(payload: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + payload).digest()
+
+
+def merkle_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def build_merkle_tree(leaves: List[bytes]):
+    """Return (root, proofs) where proofs[i] is the sibling path of leaf i
+
+    Each proof step is {"side": "left"|"right", "hash": hex} giving the
+    sibling's position relative to the running hash.
+    """
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+    proofs: List[List[Dict[str, str]]] = [[] for _ in leaves]
+    # positions[i] is the index of leaf i's ancestor in the current level
+    positions = list(range(len(leaves)))
+    level = list(leaves)
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level), 2):
+            if i + 1 < len(level):
+                next_level.append(merkle_node(level[i], level[i + 1]))
+            else:
+                next_level.append(level[i])
+        for leaf_index, pos in enumerate(positions):
+            sibling = pos ^ 1
+            if sibling < len(level):
+                side = "left" if sibling < pos else "right"
+                proofs[leaf_index].append({"side": side, "hash": level[sibling].hex()})
+            positions[leaf_index] = pos // 2
+        level = next_level
+    return level[0], proofs
+
+
+def verify_inclusion(payload: bytes, proof: List[Dict[str, str]], root: bytes) -> bool:
+    """Check that payload is committed to by root via proof"""
+    current = merkle_leaf(payload)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        if step["side"] == "left":
+            current = merkle_node(sibling, current)
+        else:
+            current = merkle_node(current, sibling)
+    return current == root
+
+
+class QuoteAggregator:
+    """Coalesce concurrent quote requests into one quote per window"""
+
+    def __init__(
+        self,
+        quote_fn: Callable[[bytes], Awaitable[Any]],
+        window_ms: float = QUOTE_BATCH_WINDOW_MS,
+        max_batch: int = QUOTE_BATCH_MAX,
+    ):
+        self.quote_fn = quote_fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batches, referenced so they are not garbage collected mid-quote
+        self._batches: Set[asyncio.Task] = set()
+        self.stats = {"requests": 0, "quotes": 0, "largest_batch": 0}
+
+    async def submit(self, payload: bytes) -> Dict[str, Any]:
+        """Queue payload for the next quote; resolves to quote, root, proof and batch size"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, future))
+        self.stats["requests"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._quote_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _quote_batch(self, batch):
+        payloads = [payload for payload, _ in batch]
+        error: Optional[BaseException] = None
+        try:
+            root, proofs = build_merkle_tree([merkle_leaf(p) for p in payloads])
+            quote = await self.quote_fn(root)
+            self.stats["quotes"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            for (_, future), proof in zip(batch, proofs):
+                if not future.done():
+                    future.set_result(
+                        {
+                            "quote": quote,
+                            "merkle_root": root.hex(),
+                            "merkle_proof": proof,
+                            "batch_size": len(batch),
+                        }
+                    )
+        except Exception as e:
+            error = e
+        except BaseException as e:
+            # Cancelled (e.g. on shutdown): let it propagate once the waiters are released
+            error = e
+            raise
+        finally:
+            # No waiter is ever left hanging, whatever stopped the batch
+            for _, future in batch:
+                if not future.done():
+                    if isinstance(error, Exception):
+                        future.set_exception(error)
+                    else:
+                        future.cancel()
@@ -0,0 +1,772 @@
+"""
+Local Intel TDX quote verification
+
+Parses TDX quote v4 and checks its ECDSA chain: quote signature ->
+attestation key -> QE report -> PCK certificate -> Intel SGX root CA. The
+platform TCB is evaluated against Intel's TCB info and QE identity
+collateral, the PCK certificate is checked against the PCK CRL, and
+MRTD/RTMRs and report_data are compared against expected values.
+
+Collateral comes from Intel PCS (or a PCCS via TDX_PCCS_URL) and is kept on
+disk until its nextUpdate, so steady-state verification is CPU only. Work
+that only depends on the PCK chain (certificate parsing, chain and CRL
+checks, TCB evaluation) is memoised per chain, leaving two ECDSA
+verifications per quote. verify_many fans a batch out over a process pool.
+
+Needs the `cryptography` package; without it every quote fails
+verification with an explanatory error.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+    CRYPTO_AVAILABLE = True
+except ImportError:
+    CRYPTO_AVAILABLE = False
+
+PCCS_URL = os.getenv("TDX_PCCS_URL", "https://api.trustedservices.intel.com").rstrip("/")
+ROOT_CA_URL = os.getenv(
+    "TDX_ROOT_CA_URL",
+    "https://certificates.trustedservices.intel.com/Intel_SGX_Provisioning_Certification_RootCA.pem",
+)
+TRUSTED_ROOT_CA = os.getenv("TDX_TRUSTED_ROOT_CA", "")  # PEM file; fetched from ROOT_CA_URL if unset
+# SHA-256 of the root CA certificate (DER); a fetched root is only trusted when it matches
+TRUSTED_ROOT_CA_SHA256 = os.getenv("TDX_ROOT_CA_SHA256", "").replace(":", "").lower()
+COLLATERAL_DIR = os.getenv(
+    "TDX_COLLATERAL_DIR",
+    os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "tdx-collateral"),
+)
+COLLATERAL_MAX_AGE = float(os.getenv("TDX_COLLATERAL_MAX_AGE", 86400))
+COLLATERAL_FETCH = os.getenv("TDX_COLLATERAL_FETCH", "true").lower() in ("1", "true", "yes")
+REQUIRE_COLLATERAL = os.getenv("TDX_REQUIRE_COLLATERAL", "true").lower() in ("1", "true", "yes")
+ALLOW_STALE_COLLATERAL = os.getenv("TDX_ALLOW_STALE_COLLATERAL", "false").lower() in ("1", "true", "yes")
+ACCEPTED_TCB_STATUSES = tuple(
+    os.getenv("TDX_ACCEPTED_TCB_STATUSES", "UpToDate,SWHardeningNeeded").split(",")
+)
+VERIFY_PROCESSES = int(os.getenv("VERIFY_PROCESSES", os.cpu_count() or 1))
+
+HEADER_LEN = 48
+BODY_LEN = 584
+QE_REPORT_LEN = 384
+TDX_TEE_TYPE = 0x81
+ECDSA_P256 = 2
+QE_REPORT_CERT_DATA = 6
+PCK_CERT_CHAIN = 5
+
+# TD quote body layout (TDX DCAP quote v4), in order
+BODY_FIELDS = (
+    ("tee_tcb_svn", 16),
+    ("mr_seam", 48),
+    ("mr_signer_seam", 48),
+    ("seam_attributes", 8),
+    ("td_attributes", 8),
+    ("xfam", 8),
+    ("mrtd", 48),
+    ("mr_config_id", 48),
+    ("mr_owner", 48),
+    ("mr_owner_config", 48),
+    ("rtmr0", 48),
+    ("rtmr1", 48),
+    ("rtmr2", 48),
+    ("rtmr3", 48),
+    ("report_data", 64),
+)
+MEASUREMENT_FIELDS = ("mrtd", "rtmr0", "rtmr1", "rtmr2", "rtmr3")
+
+SGX_EXTENSION_OID = "1.2.840.113741.1.13.1"
+SGX_TCB_OID = SGX_EXTENSION_OID + ".2"
+SGX_FMSPC_OID = SGX_EXTENSION_OID + ".4"
+
+REQUIRED_CHECKS = ("structure", "quote_signature", "qe_report_binding", "qe_report_signature", "pck_chain")
+COLLATERAL_CHECKS = ("pck_not_revoked", "tcb_info", "qe_identity")
+
+
+class QuoteFormatError(ValueError):
+    pass
+
+
+class CollateralError(Exception):
+    pass
+
+
+@dataclass
+class TdxQuote:
+    raw: bytes
+    version: int
+    attestation_key_type: int
+    tee_type: int
+    body: Dict[str, bytes]
+    signature: bytes
+    attestation_key: bytes
+    qe_report: bytes
+    qe_report_signature: bytes
+    qe_auth_data: bytes
+    pck_chain_pem: bytes
+
+    @property
+    def signed_bytes(self) -> bytes:
+        return self.raw[: HEADER_LEN + BODY_LEN]
+
+
+def decode_quote(value) -> bytes:
+    """Accept raw bytes, hex (optionally 0x-prefixed) or base64"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    text = value.strip()
+    if text[:2] in ("0x", "0X"):
+        text = text[2:]
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        return base64.b64decode(text, validate=True)
+
+
+def parse_quote(data: bytes) -> TdxQuote:
+    """Parse a TDX DCAP quote v4 with QE report certification data"""
+    view = memoryview(data)
+
+    def take(offset, length, what):
+        if offset + length > len(view):
+            raise QuoteFormatError(f"Quote truncated in {what}")
+        return bytes(view[offset : offset + length])
+
+    if len(view) < HEADER_LEN + BODY_LEN + 4:
+        raise QuoteFormatError("Quote shorter than header and TD report body")
+    version, key_type, tee_type = struct.unpack_from("<HHI", view, 0)
+    if version != 4:
+        raise QuoteFormatError(f"Unsupported quote version {version}")
+    if tee_type != TDX_TEE_TYPE:
+        raise QuoteFormatError(f"Not a TDX quote (tee_type {tee_type:#x})")
+    if key_type != ECDSA_P256:
+        raise QuoteFormatError(f"Unsupported attestation key type {key_type}")
+
+    body = {}
+    offset = HEADER_LEN
+    for name, length in BODY_FIELDS:
+        body[name] = take(offset, length, name)
+        offset += length
+
+    (sig_len,) = struct.unpack_from("<I", view, offset)
+    offset += 4
+    if offset + sig_len > len(view):
+        raise QuoteFormatError("Quote truncated in signature data")
+    signature = take(offset, 64, "quote signature")
+    attestation_key = take(offset + 64, 64, "attestation key")
+    offset += 128
+
+    cert_type, cert_size = struct.unpack_from("<HI", take(offset, 6, "certification data"))
+    offset += 6
+    if cert_type != QE_REPORT_CERT_DATA:
+        raise QuoteFormatError(f"Unsupported certification data type {cert_type}")
+    qe_report = take(offset, QE_REPORT_LEN, "QE report")
+    qe_report_signature = take(offset + QE_REPORT_LEN, 64, "QE report signature")
+    offset += QE_REPORT_LEN + 64
+    (auth_len,) = struct.unpack("<H", take(offset, 2, "QE auth data"))
+    qe_auth_data = take(offset + 2, auth_len, "QE auth data")
+    offset += 2 + auth_len
+
+    inner_type, inner_size = struct.unpack("<HI", take(offset, 6, "PCK certification data"))
+    if inner_type != PCK_CERT_CHAIN:
+        raise QuoteFormatError(f"Unsupported PCK certification data type {inner_type}")
+    pck_chain_pem = take(offset + 6, inner_size, "PCK certificate chain").rstrip(b"\x00")
+
+    return TdxQuote(
+        raw=bytes(view),
+        version=version,
+        attestation_key_type=key_type,
+        tee_type=tee_type,
+        body=body,
+        signature=signature,
+        attestation_key=attestation_key,
+        qe_report=qe_report,
+        qe_report_signature=qe_report_signature,
+        qe_auth_data=qe_auth_data,
+        pck_chain_pem=pck_chain_pem,
+    )
+
+
+def _der_items(data: bytes):
+    """Yield (tag, content) for each DER TLV in data"""
+    i = 0
+    while i < len(data):
+        tag, length = data[i], data[i + 1]
+        i += 2
+        if length & 0x80:
+            n = length & 0x7F
+            length = int.from_bytes(data[i : i + n], "big")
+            i += n
+        yield tag, data[i : i + length]
+        i += length
+
+
+def _der_oid(content: bytes) -> str:
+    parts = [content[0] // 40, content[0] % 40]
+    value = 0
+    for byte in content[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(map(str, parts))
+
+
+def parse_sgx_extension(der: bytes) -> Dict[str, Any]:
+    """FMSPC, PCESVN and CPUSVN components from the PCK certificate's SGX extension"""
+    result: Dict[str, Any] = {"cpusvn_components": [0] * 16, "pcesvn": 0, "fmspc": ""}
+    (_, sequence), = _der_items(der)
+    for _, entry in _der_items(sequence):
+        (_, oid), (tag, value) = list(_der_items(entry))[:2]
+        oid = _der_oid(oid)
+        if oid == SGX_FMSPC_OID:
+            result["fmspc"] = value.hex()
+        elif oid == SGX_TCB_OID:
+            for _, component in _der_items(value):
+                (_, comp_oid), (_, comp_value) = list(_der_items(component))[:2]
+                index = int(_der_oid(comp_oid).rsplit(".", 1)[1])
+                if 1 <= index <= 16:
+                    result["cpusvn_components"][index - 1] = int.from_bytes(comp_value, "big")
+                elif index == 17:
+                    result["pcesvn"] = int.from_bytes(comp_value, "big")
+    return result
+
+
+def _raw_signature_valid(public_key, signature: bytes, message: bytes) -> bool:
+    """ECDSA P-256/SHA-256 check of a raw r||s signature"""
+    der = encode_dss_signature(
+        int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big")
+    )
+    try:
+        public_key.verify(der, message, ec.ECDSA(hashes.SHA256()))
+        return True
+    except InvalidSignature:
+        return False
+
+
+def _public_key_der(key) -> bytes:
+    return key.public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def verify_chain(certs: Sequence["x509.Certificate"], trusted_root, now: datetime) -> Optional[str]:
+    """Check certs (leaf first) chain up to trusted_root; returns an error or None"""
+    if not certs:
+        return "Empty certificate chain"
+    for cert in certs:
+        if not cert.not_valid_before_utc <= now <= cert.not_valid_after_utc:
+            return f"Certificate {cert.subject.rfc4514_string()} is outside its validity period"
+    for cert, issuer in zip(certs, certs[1:]):
+        try:
+            cert.verify_directly_issued_by(issuer)
+        except (ValueError, TypeError, InvalidSignature):
+            return f"{cert.subject.rfc4514_string()} is not signed by {issuer.subject.rfc4514_string()}"
+    root = certs[-1]
+    if _public_key_der(root.public_key()) != _public_key_der(trusted_root.public_key()):
+        return "Chain does not end at the trusted root CA"
+    return None
+
+
+def evaluate_tdx_tcb(tcb_info: Dict[str, Any], pck: Dict[str, Any], tee_tcb_svn: bytes) -> str:
+    """Status of the first TCB level the platform meets, or "Unknown" """
+    for level in tcb_info.get("tcbLevels", []):
+        tcb = level["tcb"]
+        sgx = [c["svn"] for c in tcb.get("sgxtcbcomponents", [])]
+        tdx = [c["svn"] for c in tcb.get("tdxtcbcomponents", [])]
+        if (
+            all(have >= need for have, need in zip(pck["cpusvn_components"], sgx))
+            and pck["pcesvn"] >= tcb.get("pcesvn", 0)
+            and all(have >= need for have, need in zip(tee_tcb_svn, tdx))
+        ):
+            return level["tcbStatus"]
+    return "Unknown"
+
+
+def evaluate_qe_identity(identity: Dict[str, Any], qe_report: bytes) -> Tuple[bool, str]:
+    """Match the QE report against Intel's QE identity; returns (matches, tcb status)"""
+    miscselect = struct.unpack_from("<I", qe_report, 16)[0]
+    attributes = qe_report[48:64]
+    mrsigner = qe_report[128:160]
+    isvprodid, isvsvn = struct.unpack_from("<HH", qe_report, 256)
+
+    misc_mask = int(identity["miscselectMask"], 16)
+    attr_mask = bytes.fromhex(identity["attributesMask"])
+    matches = (
+        mrsigner.hex() == identity["mrsigner"].lower()
+        and isvprodid == identity["isvprodid"]
+        and miscselect & misc_mask == int(identity["miscselect"], 16) & misc_mask
+        and bytes(a & m for a, m in zip(attributes, attr_mask))
+        == bytes(a & m for a, m in zip(bytes.fromhex(identity["attributes"]), attr_mask))
+    )
+    for level in identity.get("tcbLevels", []):
+        if isvsvn >= level["tcb"]["isvsvn"]:
+            return matches, level["tcbStatus"]
+    return matches, "Unknown"
+
+
+def _signed_json_field(body: bytes, field: str) -> bytes:
+    """Exact bytes of body[field], as signed by Intel (re-serialising would change them)"""
+    start = body.index(f'"{field}":'.encode()) + len(field) + 3
+    end = body.rindex(b',"signature"')
+    return body[start:end]
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class CollateralCache:
+    """Intel PCS collateral kept on disk (and in memory) until it expires
+
+    Entries expire at the collateral's own nextUpdate, capped at max_age.
+    When a refresh fails the stale copy is returned with "stale": True so
+    the caller can decide whether to accept it. The disk copy is only used
+    when the directory is private to this user (owned by it, not group or
+    world writable); otherwise entries are kept in memory only.
+    """
+
+    def __init__(
+        self,
+        directory: str = COLLATERAL_DIR,
+        base_url: str = PCCS_URL,
+        fetch: bool = COLLATERAL_FETCH,
+        max_age: float = COLLATERAL_MAX_AGE,
+        timeout: float = 10.0,
+    ):
+        self.directory = directory
+        self.base_url = base_url
+        self.fetch_enabled = fetch
+        self.max_age = max_age
+        self.timeout = timeout
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self._private: Optional[bool] = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "fetches": 0, "fetch_errors": 0}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _disk_usable(self) -> bool:
+        """Create the directory 0700 if needed, and refuse one others could write to"""
+        if self._private is None:
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                info = os.stat(self.directory)
+                self._private = info.st_uid == os.getuid() and not info.st_mode & 0o022
+            except OSError:
+                self._private = False
+            if not self._private:
+                print(f"⚠️ {self.directory} is not private to this user; collateral kept in memory only")
+        return self._private
+
+    def _load(self, name: str) -> Optional[Dict[str, Any]]:
+        if not self._disk_usable():
+            return None
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, name: str, body: bytes, issuer_chain: str = "", expires_at: Optional[float] = None):
+        """Store collateral, e.g. to pre-seed an air-gapped verifier"""
+        now = time.time()
+        entry = {
+            "body": base64.b64encode(body).decode(),
+            "issuer_chain": issuer_chain,
+            "fetched_at": now,
+            "expires_at": min(expires_at or now + self.max_age, now + self.max_age),
+        }
+        if self._disk_usable():
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{name}-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(name))
+        self._memory[name] = entry
+        return entry
+
+    def get(self, name: str, url: str, issuer_header: Optional[str] = None, expiry=None):
+        """Return {"body": bytes, "issuer_chain", "fetched_at", "expires_at", "stale"}"""
+        now = time.time()
+        entry = self._memory.get(name)
+        if entry and entry["expires_at"] > now:
+            self.stats["memory_hits"] += 1
+            return self._decoded(entry, False)
+        entry = self._load(name) or entry
+        if entry and entry["expires_at"] > now:
+            self.stats["disk_hits"] += 1
+            self._memory[name] = entry
+            return self._decoded(entry, False)
+
+        if self.fetch_enabled:
+            try:
+                self.stats["fetches"] += 1
+                with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                    body = response.read()
+                    chain = urllib.parse.unquote(response.headers.get(issuer_header, "")) if issuer_header else ""
+                return self._decoded(self.put(name, body, chain, expiry(body) if expiry else None), False)
+            except Exception as e:
+                self.stats["fetch_errors"] += 1
+                if not entry:
+                    raise CollateralError(f"Could not fetch {name}: {e}") from e
+        if not entry:
+            raise CollateralError(f"No cached {name} and fetching is disabled")
+        return self._decoded(entry, True)
+
+    @staticmethod
+    def _decoded(entry, stale):
+        return {
+            "body": base64.b64decode(entry["body"]),
+            "issuer_chain": entry["issuer_chain"],
+            "fetched_at": entry["fetched_at"],
+            "expires_at": entry["expires_at"],
+            "stale": stale,
+        }
+
+    @staticmethod
+    def _json_expiry(field):
+        return lambda body: _parse_time(json.loads(body)[field]["nextUpdate"])
+
+    @staticmethod
+    def _crl_expiry(body):
+        return x509.load_der_x509_crl(body).next_update_utc.timestamp()
+
+    def tcb_info(self, fmspc: str):
+        return self.get(
+            f"tcb-info-{fmspc}",
+            f"{self.base_url}/tdx/certification/v4/tcb?fmspc={fmspc}",
+            "TCB-Info-Issuer-Chain",
+            self._json_expiry("tcbInfo"),
+        )
+
+    def qe_identity(self):
+        return self.get(
+            "qe-identity",
+            f"{self.base_url}/tdx/certification/v4/qe/identity",
+            "SGX-Enclave-Identity-Issuer-Chain",
+            self._json_expiry("enclaveIdentity"),
+        )
+
+    def pck_crl(self, ca: str):
+        return self.get(
+            f"pck-crl-{ca}",
+            f"{self.base_url}/sgx/certification/v4/pckcrl?ca={ca}&encoding=der",
+            "SGX-PCK-CRL-Issuer-Chain",
+            self._crl_expiry,
+        )
+
+    def root_ca(self):
+        return self.get("root-ca", ROOT_CA_URL)
+
+
+class QuoteVerifier:
+    """Verify TDX quotes locally; see the module docstring for the checks performed"""
+
+    def __init__(
+        self,
+        collateral: Optional[CollateralCache] = None,
+        trusted_root_pem: Optional[bytes] = None,
+        accepted_tcb_statuses: Sequence[str] = ACCEPTED_TCB_STATUSES,
+        require_collateral: bool = REQUIRE_COLLATERAL,
+        allow_stale_collateral: bool = ALLOW_STALE_COLLATERAL,
+        max_cached_chains: int = 1024,
+        trusted_root_sha256: str = TRUSTED_ROOT_CA_SHA256,
+    ):
+        self.collateral = collateral or CollateralCache()
+        self.trusted_root_sha256 = trusted_root_sha256
+        self.accepted_tcb_statuses = tuple(accepted_tcb_statuses)
+        self.require_collateral = require_collateral
+        self.allow_stale_collateral = allow_stale_collateral
+        self.max_cached_chains = max_cached_chains
+        self._trusted_root_pem = trusted_root_pem
+        self._trusted_root = None
+        # sha256(PCK chain PEM) -> (expires_at, platform checks)
+        self._platforms: Dict[bytes, Tuple[float, Dict[str, Any]]] = {}
+
+    def trusted_root(self):
+        """The trust anchor: configured explicitly, or fetched and matched against a pin"""
+        if self._trusted_root is None:
+            pem = self._trusted_root_pem
+            if pem is None and TRUSTED_ROOT_CA:
+                with open(TRUSTED_ROOT_CA, "rb") as f:
+                    pem = f.read()
+            if pem is not None:
+                self._trusted_root = x509.load_pem_x509_certificate(pem)
+                return self._trusted_root
+            if not self.trusted_root_sha256:
+                raise CollateralError(
+                    "No trusted root CA: set TDX_TRUSTED_ROOT_CA or pin TDX_ROOT_CA_SHA256"
+                )
+            root = x509.load_pem_x509_certificate(self.collateral.root_ca()["body"])
+            fingerprint = root.fingerprint(hashes.SHA256()).hex()
+            if fingerprint != self.trusted_root_sha256:
+                raise CollateralError(f"Fetched root CA {fingerprint} does not match TDX_ROOT_CA_SHA256")
+            self._trusted_root = root
+        return self._trusted_root
+
+    def _fresh(self, entry, what: str):
+        if entry["stale"] and not self.allow_stale_collateral:
+            raise CollateralError(f"{what} could not be refreshed and has expired")
+        return entry
+
+    def _signed_collateral(self, entry, field: str, now: datetime) -> Dict[str, Any]:
+        """Check Intel's signature over a TCB info / QE identity document"""
+        self._fresh(entry, field)
+        chain = x509.load_pem_x509_certificates(entry["issuer_chain"].encode())
+        error = verify_chain(chain, self.trusted_root(), now)
+        if error:
+            raise CollateralError(f"{field} issuer chain: {error}")
+        document = json.loads(entry["body"])
+        if not _raw_signature_valid(
+            chain[0].public_key(),
+            bytes.fromhex(document["signature"]),
+            _signed_json_field(entry["body"], field),
+        ):
+            raise CollateralError(f"{field} signature is invalid")
+        content = document[field]
+        if _parse_time(content["nextUpdate"]) < now.timestamp() and not self.allow_stale_collateral:
+            raise CollateralError(f"{field} has expired")
+        return content
+
+    def _platform(self, quote: TdxQuote) -> Dict[str, Any]:
+        """Chain, CRL and TCB results shared by every quote from one PCK chain"""
+        key = hashlib.sha256(quote.pck_chain_pem).digest()
+        now_ts = time.time()
+        cached = self._platforms.get(key)
+        if cached and cached[0] > now_ts:
+            return cached[1]
+
+        now = datetime.now(timezone.utc)
+        result: Dict[str, Any] = {"checks": {}, "errors": [], "leaf_key": None, "expires_at": now_ts + 300}
+        checks, errors = result["checks"], result["errors"]
+        try:
+            certs = x509.load_pem_x509_certificates(quote.pck_chain_pem)
+            error = verify_chain(certs, self.trusted_root(), now)
+            checks["pck_chain"] = error is None
+            if error:
+                errors.append(error)
+            leaf = certs[0]
+            result["leaf_key"] = leaf.public_key()
+            result["expires_at"] = min(c.not_valid_after_utc.timestamp() for c in certs)
+            extension = leaf.extensions.get_extension_for_oid(x509.ObjectIdentifier(SGX_EXTENSION_OID))
+            pck = parse_sgx_extension(extension.value.value)
+            result["fmspc"] = pck["fmspc"]
+        except Exception as e:
+            checks["pck_chain"] = False
+            errors.append(f"PCK certificate chain: {e}")
+            return result
+
+        stale = False
+        # Re-evaluate when the certificates or any collateral expire; soon if collateral was missing
+        expiries = [result["expires_at"], now_ts + self.collateral.max_age]
+        try:
+            ca = "processor" if "Processor" in leaf.issuer.rfc4514_string() else "platform"
+            crl_entry = self._fresh(self.collateral.pck_crl(ca), "PCK CRL")
+            stale |= crl_entry["stale"]
+            expiries.append(crl_entry["expires_at"])
+            crl = x509.load_der_x509_crl(crl_entry["body"])
+            if not crl.is_signature_valid(certs[1].public_key()):
+                raise CollateralError("PCK CRL signature is invalid")
+            checks["pck_not_revoked"] = crl.get_revoked_certificate_by_serial_number(leaf.serial_number) is None
+            if not checks["pck_not_revoked"]:
+                errors.append("PCK certificate is revoked")
+        except Exception as e:
+            checks["pck_not_revoked"] = None
+            errors.append(f"PCK CRL: {e}")
+            expiries.append(now_ts + 60)
+
+        try:
+            entry = self.collateral.tcb_info(pck["fmspc"])
+            stale |= entry["stale"]
+            expiries.append(entry["expires_at"])
+            tcb_info = self._signed_collateral(entry, "tcbInfo", now)
+            if tcb_info.get("fmspc", "").lower() != pck["fmspc"]:
+                raise CollateralError("TCB info FMSPC does not match the PCK certificate")
+            result["tcb_info"] = tcb_info
+            result["pck"] = pck
+            checks["tcb_info"] = True
+        except Exception as e:
+            checks["tcb_info"] = None
+            errors.append(f"TCB info: {e}")
+            expiries.append(now_ts + 60)
+
+        try:
+            entry = self.collateral.qe_identity()
+            stale |= entry["stale"]
+            expiries.append(entry["expires_at"])
+            result["qe_identity"] = self._signed_collateral(entry, "enclaveIdentity", now)
+        except Exception as e:
+            errors.append(f"QE identity: {e}")
+            expiries.append(now_ts + 60)
+
+        result["collateral_stale"] = stale
+        result["expires_at"] = min(expiries)
+        if len(self._platforms) >= self.max_cached_chains:
+            self._platforms.clear()
+        self._platforms[key] = (result["expires_at"], result)
+        return result
+
+    def verify(
+        self,
+        quote_bytes,
+        expected_measurements: Optional[Dict[str, str]] = None,
+        expected_report_data: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Verify one quote; never raises, failures are reported in the result"""
+        checks: Dict[str, Optional[bool]] = {name: None for name in REQUIRED_CHECKS + COLLATERAL_CHECKS}
+        errors: List[str] = []
+        result: Dict[str, Any] = {"verified": False, "checks": checks, "errors": errors}
+        if not CRYPTO_AVAILABLE:
+            errors.append("The cryptography package is required for local quote verification")
+            return result
+
+        try:
+            quote = parse_quote(decode_quote(quote_bytes))
+            checks["structure"] = True
+        except Exception as e:
+            checks["structure"] = False
+            errors.append(f"Malformed quote: {e}")
+            return result
+
+        body = quote.body
+        result["measurements"] = {name: body[name].hex() for name in MEASUREMENT_FIELDS}
+        result["report_data"] = body["report_data"].hex()
+        result["tee_tcb_svn"] = body["tee_tcb_svn"].hex()
+
+        try:
+            attestation_key = ec.EllipticCurvePublicKey.from_encoded_point(
+                ec.SECP256R1(), b"\x04" + quote.attestation_key
+            )
+        except ValueError as e:
+            checks["quote_signature"] = False
+            errors.append(f"Attestation key: {e}")
+        else:
+            checks["quote_signature"] = _raw_signature_valid(
+                attestation_key, quote.signature, quote.signed_bytes
+            )
+            if not checks["quote_signature"]:
+                errors.append("Quote signature does not match the attestation key")
+
+        # The QE vouches for the attestation key through its report_data
+        expected_binding = hashlib.sha256(quote.attestation_key + quote.qe_auth_data).digest()
+        checks["qe_report_binding"] = quote.qe_report[320:352] == expected_binding
+        if not checks["qe_report_binding"]:
+            errors.append("QE report does not bind the attestation key")
+
+        platform = self._platform(quote)
+        checks.update(platform["checks"])
+        errors.extend(platform["errors"])
+        result["fmspc"] = platform.get("fmspc")
+        if platform["leaf_key"] is not None:
+            checks["qe_report_signature"] = _raw_signature_valid(
+                platform["leaf_key"], quote.qe_report_signature, quote.qe_report
+            )
+            if not checks["qe_report_signature"]:
+                errors.append("QE report is not signed by the PCK certificate")
+
+        if "tcb_info" in platform:
+            status = evaluate_tdx_tcb(platform["tcb_info"], platform["pck"], body["tee_tcb_svn"])
+            result["tcb_status"] = status
+            checks["tcb_info"] = status in self.accepted_tcb_statuses
+            if not checks["tcb_info"]:
+                errors.append(f"Platform TCB status {status} is not accepted")
+        if "qe_identity" in platform:
+            matches, qe_status = evaluate_qe_identity(platform["qe_identity"], quote.qe_report)
+            result["qe_tcb_status"] = qe_status
+            checks["qe_identity"] = matches and qe_status in self.accepted_tcb_statuses
+            if not checks["qe_identity"]:
+                errors.append(f"QE identity mismatch or QE TCB status {qe_status} not accepted")
+        if platform.get("collateral_stale"):
+            result["collateral_stale"] = True
+
+        if expected_measurements:
+            mismatches = {}
+            for name, expected in expected_measurements.items():
+                actual = body.get(name)
+                if actual is None or name == "report_data":
+                    errors.append(f"Unknown measurement {name}")
+                    mismatches[name] = {"expected": expected, "actual": None}
+                elif actual.hex() != str(expected).lower().removeprefix("0x"):
+                    mismatches[name] = {"expected": expected, "actual": actual.hex()}
+            checks["measurements"] = not mismatches
+            if mismatches:
+                result["mismatches"] = mismatches
+        if expected_report_data is not None:
+            try:
+                expected = bytes.fromhex(expected_report_data.removeprefix("0x"))
+            except ValueError as e:
+                expected = None
+                errors.append(f"expected_report_data is not hex: {e}")
+            if expected is None or len(expected) > 64:
+                checks["report_data"] = False
+                if expected is not None:
+                    errors.append("expected_report_data is longer than 64 bytes")
+            else:
+                checks["report_data"] = body["report_data"] == expected.ljust(64, b"\x00")
+
+        required = REQUIRED_CHECKS + (COLLATERAL_CHECKS if self.require_collateral else ())
+        result["verified"] = all(checks[name] for name in required) and all(
+            value is not False for value in checks.values()
+        )
+        return result
+
+
+# Per-process verifier for pool workers, so memoised chains survive across tasks
+_worker_verifier: Optional[QuoteVerifier] = None
+
+
+def _init_worker(options: Dict[str, Any]):
+    global _worker_verifier
+    _worker_verifier = QuoteVerifier(**options)
+
+
+def verify_chunk(items: List[Tuple[Any, Optional[Dict[str, str]], Optional[str]]]):
+    return [_worker_verifier.verify(*item) for item in items]
+
+
+def create_pool(processes: int = VERIFY_PROCESSES, **verifier_options) -> ProcessPoolExecutor:
+    """Process pool whose workers each hold a QuoteVerifier built from verifier_options"""
+    return ProcessPoolExecutor(
+        max_workers=processes, initializer=_init_worker, initargs=(verifier_options,)
+    )
+
+
+def chunked(items: Sequence[Any], size: int) -> List[Sequence[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def verify_many(
+    quotes: Sequence[Any],
+    expected_measurements: Optional[Dict[str, str]] = None,
+    expected_report_data: Optional[str] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+    chunksize: int = 64,
+) -> List[Dict[str, Any]]:
+    """Verify quotes across a process pool, preserving order"""
+    items = [(q, expected_measurements, expected_report_data) for q in quotes]
+    own_pool = pool is None
+    pool = pool or create_pool()
+    try:
+        results: List[Dict[str, Any]] = []
+        for chunk in pool.map(verify_chunk, chunked(items, chunksize)):
+            results.extend(chunk)
+        return results
+    finally:
+        if own_pool:
+            pool.shutdown()
@@ -0,0 +1,243 @@
+"""
+Negotiated response encoding for quote-heavy endpoints
+
+JSON carries a TDX quote as a hex string (twice its size) and the event
+log as an escaped JSON string inside JSON. Clients that send
+`Accept: application/cbor` get CBOR (RFC 8949) instead: quotes and RTMRs
+travel as raw byte strings and the event log as plain text. Bodies of
+COMPRESS_MIN_BYTES or more are compressed with zstd (when the
+`zstandard` package is installed) or gzip, per Accept-Encoding.
+
+The CBOR encoder is dependency-free and covers the JSON data model plus
+bytes; byte strings are appended as memoryviews so a quote is copied once,
+into the final body.
+"""
+
+import gzip
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+
+    _zstd_compressor = zstandard.ZstdCompressor(level=int(os.getenv("RESPONSE_ZSTD_LEVEL", 3)))
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+
+JSON_MEDIA_TYPE = "application/json"
+CBOR_MEDIA_TYPE = "application/cbor"
+# RFC 8742: concatenated CBOR items, the binary counterpart of NDJSON
+CBOR_SEQ_MEDIA_TYPE = "application/cbor-seq"
+
+# Hex-string fields sent as byte strings in CBOR
+BINARY_FIELDS = frozenset({"tee_quote", "quote"})
+BINARY_MAPS = frozenset({"rtmrs"})
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def _head(major: int, value: int) -> bytes:
+    if value < 24:
+        return bytes([major << 5 | value])
+    if value < 0x100:
+        return bytes([major << 5 | 24, value])
+    if value < 0x10000:
+        return struct.pack(">BH", major << 5 | 25, value)
+    if value < 0x100000000:
+        return struct.pack(">BI", major << 5 | 26, value)
+    return struct.pack(">BQ", major << 5 | 27, value)
+
+
+def _encode(value: Any, out: List[Any]):
+    if value is None:
+        out.append(b"\xf6")
+    elif value is True:
+        out.append(b"\xf5")
+    elif value is False:
+        out.append(b"\xf4")
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out.append(_head(3, len(data)))
+        out.append(data)
+    elif isinstance(value, int):
+        if -(2**64) <= value < 2**64:
+            out.append(_head(0, value) if value >= 0 else _head(1, -1 - value))
+        else:
+            _encode(str(value), out)
+    elif isinstance(value, float):
+        out.append(struct.pack(">Bd", 0xFB, value))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        view = memoryview(value)
+        out.append(_head(2, view.nbytes))
+        out.append(view)
+    elif isinstance(value, dict):
+        out.append(_head(5, len(value)))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    elif isinstance(value, (list, tuple)):
+        out.append(_head(4, len(value)))
+        for item in value:
+            _encode(item, out)
+    else:
+        _encode(str(value), out)
+
+
+def cbor_dumps(value: Any) -> bytes:
+    out: List[Any] = []
+    _encode(value, out)
+    return b"".join(out)
+
+
+def cbor_loads(data: bytes) -> Any:
+    """Decode one CBOR item produced by cbor_dumps (definite lengths only)"""
+    value, end = _decode(memoryview(data), 0)
+    if end != len(data):
+        raise ValueError("Trailing bytes after CBOR item")
+    return value
+
+
+def cbor_seq_loads(data: bytes) -> List[Any]:
+    view, pos, items = memoryview(data), 0, []
+    while pos < len(view):
+        item, pos = _decode(view, pos)
+        items.append(item)
+    return items
+
+
+def _decode(view: memoryview, pos: int) -> Tuple[Any, int]:
+    initial = view[pos]
+    major, info = initial >> 5, initial & 0x1F
+    pos += 1
+    if major == 7:
+        if info == 20:
+            return False, pos
+        if info == 21:
+            return True, pos
+        if info == 22:
+            return None, pos
+        if info == 27:
+            return struct.unpack_from(">d", view, pos)[0], pos + 8
+        raise ValueError(f"Unsupported CBOR simple value {info}")
+    if info < 24:
+        value = info
+    elif info <= 27:
+        size = 1 << (info - 24)
+        value = int.from_bytes(view[pos : pos + size], "big")
+        pos += size
+    else:
+        raise ValueError("Indefinite-length CBOR items are not supported")
+    if major == 0:
+        return value, pos
+    if major == 1:
+        return -1 - value, pos
+    if major == 2:
+        return bytes(view[pos : pos + value]), pos + value
+    if major == 3:
+        return str(view[pos : pos + value], "utf-8"), pos + value
+    if major == 4:
+        items = []
+        for _ in range(value):
+            item, pos = _decode(view, pos)
+            items.append(item)
+        return items, pos
+    if major == 5:
+        mapping = {}
+        for _ in range(value):
+            key, pos = _decode(view, pos)
+            mapping[key], pos = _decode(view, pos)
+        return mapping, pos
+    raise ValueError(f"Unsupported CBOR major type {major}")
+
+
+def _unhex(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return bytes.fromhex(value.removeprefix("0x"))
+        except ValueError:
+            pass
+    return value
+
+
+def binary_fields(value: Any) -> Any:
+    """Copy of a JSON-ready payload with hex quote/RTMR strings turned into bytes"""
+    if isinstance(value, dict):
+        converted = {}
+        for key, item in value.items():
+            if key in BINARY_FIELDS:
+                converted[key] = _unhex(item)
+            elif key in BINARY_MAPS and isinstance(item, dict):
+                converted[key] = {k: _unhex(v) for k, v in item.items()}
+            else:
+                converted[key] = binary_fields(item)
+        return converted
+    if isinstance(value, list):
+        return [binary_fields(item) for item in value]
+    return value
+
+
+def _qualities(header: str) -> Dict[str, float]:
+    qualities = {}
+    for part in header.split(","):
+        name, *params = part.strip().split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name.strip().lower()] = quality
+    return qualities
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """CBOR only when asked for explicitly and preferred at least as much as JSON"""
+    if not accept or "cbor" not in accept:
+        return JSON_MEDIA_TYPE
+    qualities = _qualities(accept)
+    cbor = qualities.get(CBOR_MEDIA_TYPE, 0.0)
+    json_q = max(qualities.get(name, 0.0) for name in (JSON_MEDIA_TYPE, "application/*", "*/*"))
+    return CBOR_MEDIA_TYPE if cbor > 0 and cbor >= json_q else JSON_MEDIA_TYPE
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    qualities = _qualities(accept_encoding)
+    candidates = [("zstd", qualities.get("zstd", 0.0))] if ZSTD_AVAILABLE else []
+    candidates.append(("gzip", qualities.get("gzip", qualities.get("*", 0.0))))
+    best = max(candidates, key=lambda c: c[1])
+    return best[0] if best[1] > 0 else None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == "zstd":
+        return _zstd_compressor.compress(body), "zstd"
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+
+
+def encode(
+    payload: Any, accept: Optional[str] = None, accept_encoding: Optional[str] = None
+) -> Tuple[bytes, Dict[str, str]]:
+    """Serialize a JSON-ready payload per the request's Accept / Accept-Encoding"""
+    media_type = negotiate_media_type(accept)
+    if media_type == CBOR_MEDIA_TYPE:
+        body = cbor_dumps(binary_fields(payload))
+    else:
+        body = _json_encoder.encode(payload).encode("utf-8")
+    body, encoding = compress(body, negotiate_encoding(accept_encoding))
+    headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return body, headers
@@ -0,0 +1,182 @@
+"""
+Incremental RTMR replay of the dstack event log
+
+Replaying an event log extends each RTMR from zero with SHA-384 over every
+event digest, in order. The boot events (RTMR0-2) never change for a
+running CVM and runtime events are only ever appended to RTMR3, so the
+replayer keeps checkpoints of the register state: one after the boot
+prefix and one after the last log it saw. A new log that starts with a
+checkpoint's text only has its tail decoded and hashed, making replay cost
+proportional to the newly appended events rather than the whole log.
+
+replay_rtmrs() returns the same {index: hex} mapping as the dstack SDK's
+GetQuoteResponse.replay_rtmrs(). check_quotes() replays many event logs
+and compares them with the RTMRs embedded in their quotes in one pass.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from quote_verifier import BODY_FIELDS, HEADER_LEN, decode_quote
+
+RTMR_COUNT = 4
+RTMR_LEN = 48
+INIT_MR = bytes(RTMR_LEN)
+BOOT_RTMRS = (0, 1, 2)
+# RTMR0-3 are contiguous in the TD quote body
+RTMR_OFFSET = HEADER_LEN + sum(
+    length for name, length in BODY_FIELDS[: [n for n, _ in BODY_FIELDS].index("rtmr0")]
+)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+Registers = Tuple[bytes, ...]
+
+
+def extend(mr: bytes, digest: str) -> bytes:
+    """RTMR extend: SHA-384(mr || digest), short digests zero-padded to 48 bytes"""
+    content = bytes.fromhex(digest)
+    if len(content) < RTMR_LEN:
+        content = content.ljust(RTMR_LEN, b"\x00")
+    return hashlib.sha384(mr + content).digest()
+
+
+def _iter_events(text: str, pos: int):
+    """Yield (event, end_offset) for each event object of a JSON array from pos
+
+    pos is either just after the opening bracket or just after a previous
+    event object, so replay can resume in the middle of a log.
+    """
+    end = len(text)
+    while True:
+        while pos < end and text[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= end:
+            raise ValueError("Unterminated event log")
+        char = text[pos]
+        if char == "]":
+            return
+        if char == ",":
+            pos += 1
+            while pos < end and text[pos] in _WHITESPACE:
+                pos += 1
+        event, pos = _decoder.raw_decode(text, pos)
+        yield event, pos
+
+
+def _apply(registers: List[bytes], event: Dict[str, Any]) -> int:
+    imr = event.get("imr")
+    if isinstance(imr, int) and 0 <= imr < RTMR_COUNT:
+        registers[imr] = extend(registers[imr], event["digest"])
+    return imr
+
+
+class _Checkpoint:
+    __slots__ = ("prefix", "registers", "events")
+
+    def __init__(self, prefix: str, registers: Registers, events: int):
+        self.prefix = prefix
+        self.registers = registers
+        self.events = events
+
+
+class RtmrReplayer:
+    def __init__(self):
+        self._boot: Optional[_Checkpoint] = None
+        self._latest: Optional[_Checkpoint] = None
+        self._lock = threading.Lock()
+        self.full_replays = 0
+        self.incremental_replays = 0
+        self.events_replayed = 0
+
+    def _resume_point(self, text: str) -> Optional[_Checkpoint]:
+        # The newest checkpoint first; the boot one survives RTMR3 divergence
+        for checkpoint in (self._latest, self._boot):
+            if checkpoint and text.startswith(checkpoint.prefix):
+                return checkpoint
+        return None
+
+    def replay(self, event_log) -> Registers:
+        """Final RTMR0-3 values as bytes for a JSON event log (str) or list of events"""
+        if not isinstance(event_log, str):
+            registers = [INIT_MR] * RTMR_COUNT
+            for event in event_log:
+                _apply(registers, event)
+            self.full_replays += 1
+            return tuple(registers)
+
+        with self._lock:
+            start = self._resume_point(event_log)
+        if start is None:
+            pos = event_log.index("[") + 1
+            registers, count = [INIT_MR] * RTMR_COUNT, 0
+            self.full_replays += 1
+        else:
+            pos = len(start.prefix)
+            registers, count = list(start.registers), start.events
+            self.incremental_replays += 1
+
+        boot = None
+        replayed = 0
+        for event, pos in _iter_events(event_log, pos):
+            imr = _apply(registers, event)
+            replayed += 1
+            if imr in BOOT_RTMRS:
+                boot = (pos, tuple(registers), count + replayed)
+        self.events_replayed += replayed
+        result = tuple(registers)
+
+        with self._lock:
+            if boot is not None:
+                # The boot prefix only moves if this log carried boot events we had not seen
+                self._boot = _Checkpoint(event_log[: boot[0]], boot[1], boot[2])
+            self._latest = _Checkpoint(event_log[:pos], result, count + replayed)
+        return result
+
+    def replay_rtmrs(self, event_log) -> Dict[int, str]:
+        """Drop-in for GetQuoteResponse.replay_rtmrs()"""
+        return {index: mr.hex() for index, mr in enumerate(self.replay(event_log))}
+
+    def check_quotes(self, quotes: Sequence[Any], event_logs: Sequence[Any]) -> List[Dict[str, Any]]:
+        """Compare each quote's RTMRs with its replayed event log
+
+        Identical logs are replayed once and distinct ones resume from the
+        shared checkpoints; each comparison is a single 192-byte compare.
+        """
+        replayed: Dict[Any, Registers] = {}
+        results = []
+        for quote, event_log in zip(quotes, event_logs):
+            try:
+                raw = decode_quote(quote)
+                quoted = raw[RTMR_OFFSET : RTMR_OFFSET + RTMR_COUNT * RTMR_LEN]
+                if len(quoted) != RTMR_COUNT * RTMR_LEN:
+                    raise ValueError("Quote too short to hold RTMRs")
+                key = event_log if isinstance(event_log, str) else json.dumps(event_log)
+                registers = replayed.get(key)
+                if registers is None:
+                    registers = replayed[key] = self.replay(event_log)
+            except Exception as e:
+                results.append({"valid": False, "error": f"Event log replay failed: {e}"})
+                continue
+            if b"".join(registers) == quoted:
+                results.append({"valid": True})
+                continue
+            mismatches = {}
+            for index, mr in enumerate(registers):
+                actual = quoted[index * RTMR_LEN : (index + 1) * RTMR_LEN]
+                if mr != actual:
+                    mismatches[f"rtmr{index}"] = {"replayed": mr.hex(), "quoted": actual.hex()}
+            results.append({"valid": False, "mismatches": mismatches})
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "full_replays": self.full_replays,
+            "incremental_replays": self.incremental_replays,
+            "events_replayed": self.events_replayed,
+            "boot_prefix_events": self._boot.events if self._boot else 0,
+        }
+
@@ -0,0 +1,380 @@
+"""
+Pooled asyncio transport for the dstack and tappd Unix sockets
+
+Keeps a small set of open connections per socket so bursts of TEE calls do
+not pay connect/teardown on every request. Idle connections are health
+checked before reuse and evicted after an idle timeout; a semaphore caps
+the number of calls in flight per socket. All I/O goes through
+asyncio.open_unix_connection, so socket calls never block the event loop,
+and every call runs under a timeout and can be cancelled.
+
+Responses are read with explicit framing (newline or 4-byte length prefix on
+dstack.sock, Content-Length or chunked HTTP on tappd.sock) into a reusable
+preallocated buffer, so large quotes and event logs arrive whole and memory
+stays bounded by DSTACK_MAX_RESPONSE_BYTES.
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+DEFAULT_POOL_SIZE = int(os.getenv("DSTACK_POOL_SIZE", 4))
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("DSTACK_POOL_MAX_IN_FLIGHT", 16))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("DSTACK_POOL_IDLE_TIMEOUT", 30))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("DSTACK_CONNECT_TIMEOUT", 2))
+DEFAULT_CALL_TIMEOUT = float(os.getenv("DSTACK_CALL_TIMEOUT", 10))
+DEFAULT_MAX_RESPONSE_BYTES = int(os.getenv("DSTACK_MAX_RESPONSE_BYTES", 8 * 1024 * 1024))
+DSTACK_FRAMING = os.getenv("DSTACK_FRAMING", "auto")  # auto | newline | length
+READ_CHUNK = 64 * 1024
+# Buffers that grew past this are dropped back to READ_CHUNK between calls
+RETAINED_BUFFER_BYTES = 1024 * 1024
+
+
+class TransportError(Exception):
+    """Raised when a pooled socket call fails"""
+
+
+class ResponseTooLarge(TransportError):
+    """Raised when a response frame exceeds the configured size limit"""
+
+
+class FrameBuffer:
+    """Receive buffer filled in place through a memoryview
+
+    Starts at a preallocated capacity and doubles up to the size limit, so a
+    response is assembled with one copy per received chunk rather than by
+    repeatedly concatenating bytes.
+    """
+
+    def __init__(self, capacity: int = READ_CHUNK, limit: int = DEFAULT_MAX_RESPONSE_BYTES):
+        self.limit = limit
+        self._buf = bytearray(min(capacity, limit))
+        self.size = 0
+
+    def clear(self):
+        self.size = 0
+        if len(self._buf) > RETAINED_BUFFER_BYTES:
+            self._buf = bytearray(min(READ_CHUNK, self.limit))
+
+    def reserve(self, n: int):
+        needed = self.size + n
+        if needed > self.limit:
+            raise ResponseTooLarge(f"Response exceeds {self.limit} bytes")
+        capacity = len(self._buf)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            grown = bytearray(min(capacity, self.limit))
+            grown[: self.size] = memoryview(self._buf)[: self.size]
+            self._buf = grown
+
+    def write(self, data: bytes):
+        self.reserve(len(data))
+        end = self.size + len(data)
+        memoryview(self._buf)[self.size : end] = data
+        self.size = end
+
+    async def fill_exact(self, reader: asyncio.StreamReader, n: int):
+        """Append exactly n bytes from reader"""
+        self.reserve(n)
+        view = memoryview(self._buf)
+        remaining = n
+        while remaining:
+            chunk = await reader.read(min(remaining, READ_CHUNK))
+            if not chunk:
+                raise TransportError("Connection closed mid-frame")
+            view[self.size : self.size + len(chunk)] = chunk
+            self.size += len(chunk)
+            remaining -= len(chunk)
+
+    async def fill_until(self, reader: asyncio.StreamReader, delimiter: bytes) -> bool:
+        """Append chunks until one ends with delimiter
+
+        Returns False when bytes arrived after the delimiter; the frame is
+        still complete but the connection is no longer in a known state.
+        """
+        while True:
+            chunk = await reader.read(READ_CHUNK)
+            if not chunk:
+                raise TransportError("Connection closed mid-frame")
+            index = chunk.find(delimiter)
+            if index == -1:
+                self.write(chunk)
+                continue
+            self.write(chunk[:index])
+            return index + len(delimiter) == len(chunk)
+
+    async def fill_to_eof(self, reader: asyncio.StreamReader):
+        while True:
+            chunk = await reader.read(READ_CHUNK)
+            if not chunk:
+                return
+            self.write(chunk)
+
+    def json(self):
+        """Decode the buffered frame straight from the memoryview"""
+        if not self.size:
+            return {}
+        return json.loads(str(memoryview(self._buf)[: self.size], "utf-8"))
+
+
+class PooledConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.reusable = True
+        self.buffer = None
+
+    def is_healthy(self) -> bool:
+        """An idle connection must still be open on both ends"""
+        return (
+            not self.writer.is_closing()
+            and not self.reader.at_eof()
+            and self.reader.exception() is None
+        )
+
+    def close(self):
+        self.writer.close()
+
+
+class UnixSocketPool:
+    """Bounded pool of connections to one Unix socket"""
+
+    def __init__(
+        self,
+        path: str,
+        size: int = DEFAULT_POOL_SIZE,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        call_timeout: float = DEFAULT_CALL_TIMEOUT,
+        max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+    ):
+        self.path = path
+        self.size = size
+        self.max_in_flight = max_in_flight
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.call_timeout = call_timeout
+        self.max_response_bytes = max_response_bytes
+        self._idle = []
+        self._in_flight = None
+        self._loop = None
+        self.stats = {"connects": 0, "reuses": 0, "evictions": 0, "discards": 0}
+
+    def _bind_loop(self):
+        # Streams and semaphores belong to one event loop; start fresh if the
+        # pool is used from a new loop (tests, reloads)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+
+    async def _connect(self) -> PooledConnection:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(self.path), self.connect_timeout
+        )
+        self.stats["connects"] += 1
+        conn = PooledConnection(reader, writer)
+        # Each connection owns its receive buffer, reused across calls
+        conn.buffer = FrameBuffer(limit=self.max_response_bytes)
+        return conn
+
+    def _take_idle(self):
+        now = time.monotonic()
+        conn = None
+        # Evict everything past the idle timeout, oldest first
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            self._idle.pop(0).close()
+            self.stats["evictions"] += 1
+        # Reuse the most recently used connection (warmest)
+        while self._idle and conn is None:
+            candidate = self._idle.pop()
+            if candidate.is_healthy():
+                conn = candidate
+            else:
+                candidate.close()
+                self.stats["evictions"] += 1
+        return conn
+
+    def _put_idle(self, conn: PooledConnection):
+        conn.last_used = time.monotonic()
+        if len(self._idle) < self.size:
+            self._idle.append(conn)
+            return
+        self.stats["discards"] += 1
+        conn.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Yield a pooled connection; it is returned to the pool only on success
+
+        Any exception, timeout or cancellation while the connection is out
+        leaves it in an unknown state, so it is closed instead of reused.
+        """
+        self._bind_loop()
+        async with self._in_flight:
+            conn = self._take_idle()
+            if conn is None:
+                conn = await self._connect()
+            else:
+                self.stats["reuses"] += 1
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            if conn.reusable:
+                self._put_idle(conn)
+            else:
+                conn.close()
+
+    def close(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class _PooledTransport:
+    def __init__(self, path: str, **pool_options):
+        self.pool = UnixSocketPool(path, **pool_options)
+
+    async def call(self, method: str, params: dict = None, timeout: float = None):
+        """Run one request under a deadline covering queueing, connect and I/O"""
+        deadline = self.pool.call_timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(self._call(method, params), deadline)
+        except asyncio.TimeoutError:
+            raise TransportError(
+                f"{method} on {self.pool.path} timed out after {deadline}s"
+            ) from None
+
+
+class DstackSocketTransport(_PooledTransport):
+    """JSON requests over /var/run/dstack.sock
+
+    Requests are newline terminated. Responses are either newline terminated
+    JSON or a 4-byte big-endian length prefix followed by the JSON body; with
+    DSTACK_FRAMING=auto the first byte tells them apart.
+    """
+
+    def __init__(self, path: str, framing: str = DSTACK_FRAMING, **pool_options):
+        super().__init__(path, **pool_options)
+        self.framing = framing
+
+    async def _call(self, method: str, params: dict = None) -> dict:
+        request = json.dumps({"method": method, "params": params or {}}).encode()
+        async with self.pool.connection() as conn:
+            conn.writer.write(request + b"\n")
+            await conn.writer.drain()
+            buffer = conn.buffer
+            buffer.clear()
+            await self._read_frame(conn, buffer)
+            result = buffer.json()
+        return result
+
+    async def _read_frame(self, conn: PooledConnection, buffer: FrameBuffer):
+        reader = conn.reader
+        framing = self.framing
+        first = b""
+        if framing == "auto":
+            try:
+                first = await reader.readexactly(1)
+            except asyncio.IncompleteReadError:
+                raise TransportError("dstack socket closed the connection") from None
+            framing = "newline" if first in b"{[ \t\r\n" else "length"
+
+        if framing == "length":
+            try:
+                prefix = first + await reader.readexactly(4 - len(first))
+            except asyncio.IncompleteReadError:
+                raise TransportError("dstack socket closed the connection") from None
+            await buffer.fill_exact(reader, int.from_bytes(prefix, "big"))
+            return
+
+        buffer.write(first)
+        if first != b"\n":
+            conn.reusable = await buffer.fill_until(reader, b"\n")
+
+
+class TappdSocketTransport(_PooledTransport):
+    """Keep-alive HTTP/1.1 prpc requests over /var/run/tappd.sock"""
+
+    async def _call(self, method: str, params: dict = None):
+        """Return (status, parsed body) for Tappd.<method>"""
+        if params:
+            body = json.dumps(params).encode()
+            head = (
+                f"POST /prpc/Tappd.{method} HTTP/1.1\r\n"
+                "Host: dstack\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "\r\n"
+            )
+        else:
+            body = b""
+            head = f"GET /prpc/Tappd.{method} HTTP/1.1\r\nHost: dstack\r\n\r\n"
+
+        async with self.pool.connection() as conn:
+            conn.writer.write(head.encode() + body)
+            await conn.writer.drain()
+            status, headers = await self._read_head(conn.reader)
+            buffer = conn.buffer
+            buffer.clear()
+            length = headers.get("content-length")
+            if "chunked" in headers.get("transfer-encoding", "").lower():
+                await self._read_chunked(conn.reader, buffer)
+            elif length is not None:
+                await buffer.fill_exact(conn.reader, int(length))
+            else:
+                # No framing information: body runs until the peer closes
+                await buffer.fill_to_eof(conn.reader)
+                conn.reusable = False
+            if headers.get("connection", "").lower() == "close":
+                conn.reusable = False
+            result = buffer.json()
+
+        return status, result
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader, buffer: FrameBuffer):
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise TransportError("tappd socket closed mid-chunk")
+            try:
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise TransportError(f"Malformed chunk size: {size_line!r}") from None
+            if size == 0:
+                # Skip trailers up to the terminating blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            await buffer.fill_exact(reader, size)
+            if await reader.readline() not in (b"\r\n", b"\n"):
+                raise TransportError("Malformed chunk terminator")
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise TransportError("tappd socket closed the connection")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise TransportError(f"Malformed status line: {status_line!r}")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return int(parts[1]), headers
@@ -0,0 +1,173 @@
+"""
+Server-sent events stream of TEE status
+
+One background poller loads every source (TEE info, measurements, security
+status) on a fixed interval and fans changes out to all /api/stream
+subscribers, so N open dashboards cost one upstream poll instead of N
+polls per source. The poller only runs while someone is subscribed.
+
+A subscriber first gets a `snapshot` event with the full state, then
+`delta` events carrying a JSON merge patch (RFC 7396) of what changed:
+changed values, with removed keys as null. Each event is serialized once
+and shared by every subscriber. A subscriber that falls more than
+STREAM_QUEUE_SIZE events behind has its backlog replaced by a fresh
+snapshot instead of slowing the others down.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", 2))
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", 15))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 32))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", 1000))
+
+HEARTBEAT_EVENT = ": keep-alive\n\n"
+
+
+def merge_patch(old: Any, new: Any) -> Any:
+    """RFC 7396 patch turning old into new, or None when they are equal"""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None if old == new else new
+    patch = {key: None for key in old if key not in new}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            if isinstance(old[key], dict) and isinstance(value, dict):
+                patch[key] = merge_patch(old[key], value)
+            else:
+                patch[key] = value
+    return patch or None
+
+
+def format_event(event: str, event_id: int, data: Any) -> str:
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class StatusBroadcaster:
+    def __init__(
+        self,
+        sources: Dict[str, Callable[[], Awaitable[Any]]],
+        interval: float = STREAM_POLL_INTERVAL,
+        heartbeat: float = STREAM_HEARTBEAT,
+        queue_size: int = STREAM_QUEUE_SIZE,
+        max_subscribers: int = STREAM_MAX_SUBSCRIBERS,
+    ):
+        self.sources = sources
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.state: Dict[str, Any] = {}
+        self.version = 0
+        self.polls = 0
+        self.deltas = 0
+        self.resyncs = 0
+        self.errors: Dict[str, str] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def poll(self):
+        """Load every source once and broadcast a delta if anything changed"""
+        names = list(self.sources)
+        values = await asyncio.gather(
+            *(self.sources[name]() for name in names), return_exceptions=True
+        )
+        new_state = dict(self.state)
+        for name, value in zip(names, values):
+            if isinstance(value, Exception):
+                # Keep the last good value; the failure is visible in stats()
+                self.errors[name] = str(value) or type(value).__name__
+            else:
+                self.errors.pop(name, None)
+                new_state[name] = value
+        self.polls += 1
+        patch = merge_patch(self.state, new_state)
+        self.state = new_state
+        if patch is not None:
+            self.version += 1
+            if self._ready.is_set():
+                self.deltas += 1
+                self._broadcast(format_event("delta", self.version, patch))
+        self._ready.set()
+
+    def _broadcast(self, event: str):
+        for queue in self._subscribers:
+            if queue.full():
+                # Too far behind: drop the backlog and resync from a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._snapshot_event())
+                self.resyncs += 1
+            else:
+                queue.put_nowait(event)
+
+    def _snapshot_event(self) -> str:
+        return format_event("snapshot", self.version, self.state)
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors["poller"] = str(e) or type(e).__name__
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    async def events(self):
+        """SSE text for one subscriber: a snapshot, then deltas and heartbeats"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        self._ensure_running()
+        try:
+            await self._ready.wait()
+            yield f"retry: {int(self.interval * 1000)}\n" + self._snapshot_event()
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_EVENT
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers and self._task is not None:
+                # Nobody is listening: stop polling upstream until the next subscriber
+                self._task.cancel()
+                self._task = None
+                self._ready.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "polling": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "version": self.version,
+            "polls": self.polls,
+            "deltas": self.deltas,
+            "resyncs": self.resyncs,
+            "errors": dict(self.errors),
+        }
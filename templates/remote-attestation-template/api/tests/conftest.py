@@ -0,0 +1,70 @@
+import asyncio
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(API_DIR))), "benchmarks")
+sys.path[:0] = [API_DIR, BENCHMARKS_DIR]
+
+
+@pytest.fixture
+def socket_dir():
+    """A short directory for Unix sockets (sun_path is limited to ~108 bytes)"""
+    directory = tempfile.mkdtemp(prefix="tee-", dir="/tmp")
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def tdx_platform():
+    pytest.importorskip("cryptography")
+    from fake_tdx import FakeTdxPlatform
+
+    return FakeTdxPlatform()
+
+
+@pytest.fixture(scope="session")
+def main_app(tmp_path_factory):
+    """api/main.py imported with its store enabled in a scratch directory and no TEE socket"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    overrides = {
+        "ATTESTATION_STORE_ENABLED": "true",
+        "ATTESTATION_STORE_PATH": str(tmp_path_factory.mktemp("store") / "attestations.db"),
+        "DSTACK_SOCKET_PATH": "/nonexistent/dstack.sock",
+        "TAPPD_SOCKET_PATH": "/nonexistent/tappd.sock",
+    }
+    saved = {name: os.environ.get(name) for name in overrides}
+    os.environ.update(overrides)
+    try:
+        # main and the store module read their settings on import
+        sys.modules.pop("main", None)
+        sys.modules.pop("attestation_store", None)
+        yield importlib.import_module("main")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.fixture
+def api_request(main_app):
+    """api_request(method, path, client=(host, port), **httpx_kwargs) -> httpx.Response"""
+    import httpx
+
+    def send(method, path, client=("198.51.100.7", 4000), **kwargs):
+        async def run():
+            transport = httpx.ASGITransport(app=main_app.app, client=client)
+            async with httpx.AsyncClient(transport=transport, base_url="http://api") as http:
+                return await http.request(method, path, **kwargs)
+
+        return asyncio.run(run())
+
+    return send
@@ -0,0 +1,133 @@
+import asyncio
+
+from admission import AdmissionController, client_address, client_identity, parse_networks, retry_after_header
+
+PROXIES = parse_networks("10.0.0.0/8, 192.0.2.1")
+
+
+def test_token_bucket_is_per_client():
+    async def main():
+        admission = AdmissionController(rate=1, burst=2, concurrency=4)
+        for _ in range(2):
+            assert await admission.acquire("10.0.0.1") is None
+            admission.release(0.01)
+        reason, retry_after = await admission.acquire("10.0.0.1")
+        assert reason == "rate_limited"
+        assert 0 < retry_after <= 1
+        assert await admission.acquire("10.0.0.2") is None
+        admission.release(0.01)
+        assert admission.stats()["rate_limited"] == 1
+        assert admission.stats()["clients"] == 2
+
+    asyncio.run(main())
+
+
+def test_zero_rate_disables_the_bucket():
+    admission = AdmissionController(rate=0, burst=0)
+    assert all(admission.check_rate("client") is None for _ in range(100))
+
+
+def test_queue_full_when_no_room_to_wait():
+    async def main():
+        admission = AdmissionController(rate=0, concurrency=1, queue_depth=0)
+        assert await admission.acquire("a") is None
+        reason, retry_after = await admission.acquire("b")
+        assert reason == "queue_full"
+        assert retry_after > 0
+        admission.release(0.01)
+        assert await admission.acquire("b") is None
+
+    asyncio.run(main())
+
+
+def test_queued_request_times_out():
+    async def main():
+        admission = AdmissionController(rate=0, concurrency=1, queue_depth=4, queue_timeout=0.02)
+        assert await admission.acquire("a") is None
+        reason, _ = await admission.acquire("b")
+        assert reason == "queue_timeout"
+        stats = admission.stats()
+        assert (stats["queue_timeout"], stats["waiting"], stats["in_use"]) == (1, 0, 1)
+
+    asyncio.run(main())
+
+
+def test_queued_request_gets_released_slot():
+    async def main():
+        admission = AdmissionController(rate=0, concurrency=1, queue_depth=4, queue_timeout=1)
+        assert await admission.acquire("a") is None
+        waiter = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0.01)
+        assert admission.stats()["waiting"] == 1
+        admission.release(0.01)
+        assert await waiter is None
+        assert admission.stats()["admitted"] == 2
+
+    asyncio.run(main())
+
+
+def test_acquire_slot_bounds_concurrency():
+    async def main():
+        admission = AdmissionController(rate=0, concurrency=2)
+        running = peak = 0
+
+        async def item():
+            nonlocal running, peak
+            await admission.acquire_slot()
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            admission.release(0.01)
+
+        await asyncio.gather(*(item() for _ in range(8)))
+        assert peak == 2
+        assert admission.stats()["admitted"] == 8
+        assert admission.stats()["in_use"] == 0
+
+    asyncio.run(main())
+
+
+def test_client_table_is_bounded():
+    admission = AdmissionController(rate=1, burst=1, max_clients=3)
+    for i in range(10):
+        admission.check_rate(f"10.0.0.{i}")
+    assert admission.stats()["clients"] == 3
+
+
+def test_retry_after_header_rounds_up():
+    assert retry_after_header(0.01) == "1"
+    assert retry_after_header(2.1) == "3"
+
+
+def test_forwarded_for_is_ignored_without_a_trusted_proxy():
+    assert client_address("198.51.100.7", "203.0.113.9", ()) == "198.51.100.7"
+    assert client_address("198.51.100.7", "203.0.113.9", PROXIES) == "198.51.100.7"
+
+
+def test_rightmost_untrusted_hop_behind_trusted_proxies():
+    # The client wrote "1.2.3.4"; the proxies appended the address they saw
+    assert client_address("10.0.0.5", "1.2.3.4, 203.0.113.9, 192.0.2.1", PROXIES) == "203.0.113.9"
+    assert client_address("10.0.0.5", "10.1.1.1, 10.2.2.2", PROXIES) == "10.1.1.1"
+    assert client_address("10.0.0.5", " , ", PROXIES) == "10.0.0.5"
+    assert client_address("10.0.0.5", None, PROXIES) == "10.0.0.5"
+
+
+def test_client_identity_uses_only_valid_api_keys():
+    keys = frozenset({"secret-a", "secret-b"})
+    a = client_identity("198.51.100.7", {"X-API-Key": "secret-a"}, keys)
+    assert a.startswith("key:") and "secret" not in a
+    # Same key from another address shares the bucket; another key does not
+    assert client_identity("203.0.113.9", {"X-API-Key": "secret-a"}, keys) == a
+    assert client_identity("198.51.100.7", {"X-API-Key": "secret-b"}, keys) != a
+    # Unknown keys cannot mint buckets
+    assert client_identity("198.51.100.7", {"X-API-Key": "made-up"}, keys) == "ip:198.51.100.7"
+    assert client_identity("198.51.100.7", {"X-API-Key": "secret-a"}, frozenset()) == "ip:198.51.100.7"
+
+
+def test_spoofed_forwarded_for_shares_the_peer_bucket(main_app, api_request, monkeypatch):
+    monkeypatch.setattr(main_app, "admission", AdmissionController(rate=1, burst=1))
+    for spoofed in ("1.1.1.1", "2.2.2.2"):
+        response = api_request("GET", "/api/test/all", headers={"X-Forwarded-For": spoofed})
+    assert response.status_code == 429
+    assert main_app.admission.stats()["clients"] == 1
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+
+import pytest
+
+from attestation_jobs import DONE, FAILED, JobQueue, _public_address, webhook_error
+from rtmr_replay import RtmrReplayer
+
+
+def _event(imr, label):
+    return {"imr": imr, "event_type": 1, "digest": hashlib.sha384(label.encode()).hexdigest(), "event": label}
+
+
+def test_jobs_run_and_report_results():
+    async def main():
+        jobs = JobQueue(workers=2)
+
+        async def ok():
+            return {"quote": "q"}
+
+        async def failing():
+            raise RuntimeError("tdx unavailable")
+
+        done, failed = jobs.submit(ok), jobs.submit(failing)
+        await jobs.wait(done, 1)
+        await jobs.wait(failed, 1)
+        assert (done.status, done.result) == (DONE, {"quote": "q"})
+        assert (failed.status, failed.error) == (FAILED, "tdx unavailable")
+        assert jobs.get(done.id) is done
+        assert done.to_dict()["finished_at"] is not None
+        stats = jobs.stats()
+        assert (stats["completed"], stats["failed"], stats["running"]) == (1, 1, 0)
+        await jobs.stop()
+
+    asyncio.run(main())
+
+
+def test_workers_bound_concurrency_and_queue_rejects_when_full():
+    async def main():
+        jobs = JobQueue(workers=1, queue_size=1)
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+
+        first = jobs.submit(blocked)
+        await asyncio.sleep(0.01)
+        assert jobs.stats()["running"] == 1
+        assert jobs.submit(blocked) is not None
+        assert jobs.submit(blocked) is None
+        assert jobs.stats()["rejected"] == 1
+        assert jobs.retry_after() > 0
+        release.set()
+        await jobs.wait(first, 1)
+        assert first.status == DONE
+        await jobs.stop()
+
+    asyncio.run(main())
+
+
+def test_wait_times_out_on_a_running_job():
+    async def main():
+        jobs = JobQueue(workers=1, max_wait=0.02)
+        job = jobs.submit(lambda: asyncio.sleep(60))
+        assert (await jobs.wait(job, 10)).finished is False
+        await jobs.stop()
+        assert job.status == FAILED
+        assert job.error == "Cancelled on shutdown"
+
+    asyncio.run(main())
+
+
+def test_finished_jobs_expire():
+    async def main():
+        jobs = JobQueue(workers=1, ttl=0)
+
+        async def ok():
+            return 1
+
+        job = jobs.submit(ok)
+        await jobs.wait(job, 1)
+        jobs._pruned_at = 0
+        assert jobs.get(job.id) is None
+        assert jobs.stats()["expired"] == 1
+        await jobs.stop()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    "address, public",
+    [("8.8.8.8", True), ("127.0.0.1", False), ("10.1.2.3", False), ("169.254.169.254", False),
+     ("::1", False), ("::ffff:127.0.0.1", False), ("fe80::1%eth0", False), ("224.0.0.1", False)],
+)
+def test_public_address(address, public):
+    assert _public_address(address) is public
+
+
+@pytest.mark.parametrize(
+    "url, error",
+    [
+        ("https://hooks.example.com/done", None),
+        ("https://a.b.example.com/done", None),
+        ("https://example.com.evil.net/", "not in ATTESTATION_JOB_WEBHOOK_HOSTS"),
+        ("https://other.net/", "not in ATTESTATION_JOB_WEBHOOK_HOSTS"),
+        ("ftp://hooks.example.com/", "http(s) URL"),
+        ("http://127.0.0.1:8080/", "not a public address"),
+        ("http://[::1]/", "not a public address"),
+    ],
+)
+def test_webhook_error(url, error):
+    allowed = (".example.com", "127.0.0.1", "::1")
+    reason = webhook_error(url, allowed)
+    if error is None:
+        assert reason is None
+    else:
+        assert error in reason
+
+
+def test_webhooks_disabled_without_allowlist():
+    assert webhook_error("https://hooks.example.com/", ())
+
+
+def test_delivery_refuses_names_resolving_to_loopback():
+    async def main():
+        jobs = JobQueue(webhook_hosts=("localhost",))
+        with pytest.raises(ValueError, match="resolves to"):
+            await jobs._check_webhook("http://localhost:9/hook")
+
+    asyncio.run(main())
+
+
+def test_job_mode_replay_keeps_the_shared_checkpoints(main_app, monkeypatch):
+    monkeypatch.setattr(main_app.sdk, "replayer", RtmrReplayer())
+    monkeypatch.setattr(main_app.sdk, "_verify_pool", None)
+    boot = [_event(imr, f"boot-{imr}") for imr in (0, 1, 2)]
+
+    async def main():
+        await main_app.sdk._replay_rtmrs(json.dumps(boot + [_event(3, "app-1")]), offload=True)
+        return await main_app.sdk._replay_rtmrs(json.dumps(boot + [_event(3, "app-2")]), offload=True)
+
+    rtmrs = asyncio.run(main())
+    assert main_app.sdk.replayer.replay_rtmrs(json.dumps(boot + [_event(3, "app-2")])) == rtmrs
+    # Replays ran on the shared replayer, not in a pool worker that forgets its checkpoints
+    stats = main_app.sdk.replayer.stats()
+    assert stats["full_replays"] == 1
+    assert stats["incremental_replays"] == 2
+    assert main_app.sdk._verify_pool is None
@@ -0,0 +1,143 @@
+import os
+
+import pytest
+
+import attestation_store
+from attestation_store import AttestationStore, quote_hash
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AttestationStore(str(tmp_path / "attestations.db"))
+    yield store
+    store.close()
+
+
+def _record(attestation_id, **extra):
+    return {"attestation_id": attestation_id, "data": "x", **extra}
+
+
+def test_lookup_before_and_after_commit(store):
+    digest = store.put(_record("a1"), quote="quote-1")
+    assert digest == quote_hash("quote-1")
+    assert store.get("a1")["data"] == "x"
+    assert store.flush(5)
+    assert store.get("a1")["attestation_id"] == "a1"
+    assert store.get_by_quote_hash(digest.upper())["attestation_id"] == "a1"
+    assert store.get("missing") is None
+    stats = store.stats()
+    assert (stats["entries"], stats["queued"], stats["misses"]) == (1, 0, 1)
+
+
+def test_newest_record_wins_for_a_shared_quote(store):
+    store.put(_record("b1"), quote="shared")
+    store.put(_record("b2"), quote="shared")
+    assert store.get_by_quote_hash(quote_hash("shared"))["attestation_id"] == "b2"
+    store.flush(5)
+    assert store.get_by_quote_hash(quote_hash("shared"))["attestation_id"] == "b2"
+
+
+def test_ids_are_never_overwritten(store):
+    store.put(_record("dup", data="first"))
+    store.put(_record("dup", data="queued twice"))
+    store.flush(5)
+    store.put(_record("dup", data="after commit"))
+    store.flush(5)
+    assert store.get("dup")["data"] == "first"
+    stats = store.stats()
+    assert (stats["entries"], stats["dropped"], stats["write_errors"]) == (1, 2, 2)
+
+
+def test_bad_row_costs_only_itself(store):
+    circular = _record("bad")
+    circular["self"] = circular
+    store.put(_record("good1"))
+    store.put(circular)
+    store.put(_record("good2"))
+    store.flush(5)
+    assert store.get("good1") and store.get("good2")
+    assert store.stats()["dropped"] == 1
+    assert "bad" in store.stats()["last_error"]
+
+
+def test_writer_survives_sqlite_errors(store):
+    # Commit once first so the writer has opened (and created) its schema
+    store.put(_record("first"))
+    store.flush(5)
+    with store._read_lock:
+        store._read_db.execute("DROP TABLE attestations")
+    store.put(_record("lost"))
+    assert store.flush(5)
+    assert store._writer.is_alive()
+    assert store.write_errors >= 1
+    assert store.dropped == 1
+
+
+def test_table_is_trimmed_to_max_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(attestation_store, "EVICT_EVERY", 2)
+    store = AttestationStore(str(tmp_path / "small.db"), max_entries=3)
+    try:
+        for i in range(6):
+            store.put(_record(f"e{i}"))
+            store.flush(5)
+        assert store.stats()["entries"] == 3
+        assert store.get("e0") is None
+        assert store.get("e5") is not None
+    finally:
+        store.close()
+
+
+def test_expired_rows_are_ignored(tmp_path):
+    store = AttestationStore(str(tmp_path / "old.db"), max_age=-1)
+    try:
+        store.put(_record("old"))
+        store.flush(5)
+        assert store.get("old") is None
+    finally:
+        store.close()
+
+
+def test_in_memory_store():
+    store = AttestationStore(":memory:")
+    try:
+        store.put(_record("m"))
+        store.flush(5)
+        assert store.stats()["entries"] == 1
+        assert store.get("m")["attestation_id"] == "m"
+    finally:
+        store.close()
+
+
+def test_put_many_and_find(store):
+    store.put_many([(_record("p1"), "quote-p"), (_record("p2"), None), (_record("p1", data="dup"), None)])
+    assert store.find("p2")["attestation_id"] == "p2"
+    assert store.find("missing", quote_hash("quote-p"))["attestation_id"] == "p1"
+    assert store.find() is None
+    store.flush(5)
+    assert store.find("p1")["data"] == "x"
+    stats = store.stats()
+    assert (stats["entries"], stats["dropped"]) == (2, 1)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_store_created_before_fork(tmp_path):
+    store = AttestationStore(str(tmp_path / "forked.db"))
+    try:
+        store.put(_record("parent"))
+        store.flush(5)
+        pid = os.fork()
+        if pid == 0:
+            # The child must not reuse the parent's connections or writer thread
+            code = 1
+            try:
+                store.put(_record("child"))
+                if store.flush(5) and store.get("parent") and store._writer.is_alive():
+                    code = 0
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert store.get("child")["attestation_id"] == "child"
+    finally:
+        store.close()
+
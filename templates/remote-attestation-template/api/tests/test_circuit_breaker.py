@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, LastGood
+
+
+async def _fail():
+    raise ConnectionError("refused")
+
+
+async def _ok():
+    return "ok"
+
+
+def _open_breaker(**options):
+    breaker = CircuitBreaker("dstack", failure_threshold=2, base_backoff=0.02, **options)
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await breaker.call(_fail)
+
+    asyncio.run(main())
+    return breaker
+
+
+def test_opens_after_threshold_and_rejects():
+    breaker = _open_breaker()
+    assert breaker.state == OPEN
+    assert breaker.last_error == "refused"
+
+    async def main():
+        with pytest.raises(CircuitOpenError) as excinfo:
+            await breaker.call(_ok)
+        assert excinfo.value.name == "dstack"
+
+    asyncio.run(main())
+    assert breaker.stats()["rejected"] == 1
+    assert breaker.stats()["opened"] == 1
+
+
+def test_half_open_admits_one_probe_and_success_closes():
+    breaker = _open_breaker()
+    time.sleep(0.03)
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.retry_in == 0.0
+
+
+def test_failed_probe_reopens_with_longer_backoff():
+    breaker = _open_breaker()
+    first = breaker.retry_at - time.monotonic()
+    time.sleep(0.03)
+    assert breaker.allow()
+    breaker.record_failure(ConnectionError("still down"))
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+    # Second trip backs off 2x the base, jittered down by at most 20%
+    assert breaker.retry_at - time.monotonic() > first
+    assert breaker.retry_in <= 0.04
+
+
+def test_backoff_is_capped():
+    breaker = CircuitBreaker("tappd", failure_threshold=1, base_backoff=1, max_backoff=2)
+    breaker.record_failure()
+    for _ in range(4):
+        breaker.retry_at = 0.0
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.trips == 5
+    assert 1.6 <= breaker.retry_in <= 2
+
+
+def test_concurrent_failures_trip_once():
+    breaker = CircuitBreaker("dstack", failure_threshold=2, base_backoff=60)
+
+    async def slow_fail():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("refused")
+
+    async def main():
+        # Ten calls admitted while closed all fail after the breaker has opened
+        results = await asyncio.gather(*(breaker.call(slow_fail) for _ in range(10)),
+                                       return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+
+    asyncio.run(main())
+    assert breaker.state == OPEN
+    assert (breaker.trips, breaker.opened) == (1, 1)
+    # Still on the first backoff, not doubled by the late failures
+    assert 48 <= breaker.retry_in <= 60
+
+
+def test_cancelled_probe_lets_the_next_caller_probe():
+    breaker = _open_breaker()
+    time.sleep(0.03)
+
+    async def main():
+        task = asyncio.create_task(breaker.call(asyncio.sleep, 60))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert await breaker.call(_ok) == "ok"
+
+    asyncio.run(main())
+    assert breaker.state == CLOSED
+
+
+def test_last_good_is_served_stale_until_too_old():
+    last_good = LastGood(max_age=60)
+    assert last_good.recall("info") is None
+    last_good.remember("info", {"tee_enabled": True})
+    recalled = last_good.recall("info")
+    assert recalled["tee_enabled"] is True
+    assert recalled["stale"] is True
+    assert "fetched_at" in recalled
+    assert last_good.stats()["served"] == 1
+
+    expired = LastGood(max_age=-1)
+    expired.remember("info", {"tee_enabled": True})
+    assert expired.recall("info") is None
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from fake_dstack import FakeDstackServer
+from socket_transport import DstackSocketTransport, FrameBuffer, ResponseTooLarge, TransportError
+
+
+def _reader(*chunks, eof=True):
+    reader = asyncio.StreamReader()
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    if eof:
+        reader.feed_eof()
+    return reader
+
+
+def test_frame_buffer_grows_up_to_limit():
+    buffer = FrameBuffer(capacity=4, limit=16)
+    buffer.write(b'{"a":')
+    buffer.write(b"12345}")
+    assert buffer.size == 11
+    assert buffer.json() == {"a": 12345}
+    with pytest.raises(ResponseTooLarge):
+        buffer.write(b"x" * 6)
+    buffer.clear()
+    assert buffer.size == 0
+    assert buffer.json() == {}
+
+
+def test_frame_buffer_fill_exact_across_chunks():
+    async def main():
+        buffer = FrameBuffer(capacity=2)
+        await buffer.fill_exact(_reader(b'{"k"', b':"v"}', b"rest"), 9)
+        assert buffer.json() == {"k": "v"}
+        with pytest.raises(TransportError):
+            await FrameBuffer().fill_exact(_reader(b"abc"), 10)
+
+    asyncio.run(main())
+
+
+def test_frame_buffer_fill_until_reports_trailing_bytes():
+    async def main():
+        buffer = FrameBuffer()
+        assert await buffer.fill_until(_reader(b'{"a"', b":1}\n", eof=False), b"\n") is True
+        assert buffer.json() == {"a": 1}
+
+        buffer = FrameBuffer()
+        assert await buffer.fill_until(_reader(b'{"a":2}\n{"b"'), b"\n") is False
+        assert buffer.json() == {"a": 2}
+
+        with pytest.raises(TransportError):
+            await FrameBuffer().fill_until(_reader(b'{"a":'), b"\n")
+
+    asyncio.run(main())
+
+
+def test_oversized_response_is_rejected_and_connection_dropped(socket_dir):
+    async def main(path):
+        transport = DstackSocketTransport(path, max_response_bytes=1024)
+        for _ in range(2):
+            with pytest.raises(ResponseTooLarge):
+                await transport.call("Info")
+        return transport.pool.stats
+
+    with FakeDstackServer(socket_dir, payload_bytes=4096) as server:
+        stats = asyncio.run(main(server.dstack_path))
+    assert stats["connects"] == 2
+    assert stats["reuses"] == 0
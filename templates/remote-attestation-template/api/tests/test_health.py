@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from circuit_breaker import CircuitBreaker
+from fake_dstack import FakeDstackServer
+from health_monitor import HealthMonitor
+from socket_transport import DstackSocketTransport
+
+
+class _FakeClient:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    async def info(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("dstack client unavailable")
+        return SimpleNamespace(app_id="app", instance_id="instance", device_id="device", tcb_info={})
+
+
+@pytest.fixture
+def probe(main_app, monkeypatch):
+    """Fresh breakers and health monitor; returns a function that probes once"""
+    breakers = {name: CircuitBreaker(name) for name in ("sdk", "dstack", "tappd")}
+    monkeypatch.setattr(main_app.sdk, "breakers", breakers)
+    monkeypatch.setattr(main_app.sdk, "real_sdk", None)
+    monitor = HealthMonitor(main_app.probe_tee_health)
+    monkeypatch.setattr(main_app, "health", monitor)
+
+    def run():
+        asyncio.run(monitor.refresh())
+        return monitor
+
+    return run
+
+
+def test_not_ready_without_a_tee_backend(probe, api_request):
+    assert "No TEE backend answered" in probe().last_error
+    response = api_request("GET", "/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+    assert api_request("GET", "/api/health/live").status_code == 200
+
+
+def test_ready_through_the_sdk_client(main_app, probe, api_request, monkeypatch):
+    client = _FakeClient()
+    monkeypatch.setattr(main_app.sdk, "real_sdk", client)
+    monitor = probe()
+    assert client.calls == 1
+    assert monitor.status["backend"] == "sdk"
+    assert api_request("GET", "/api/health/ready").status_code == 200
+    assert api_request("GET", "/api/health").json()["tee_available"] is True
+
+
+def test_falls_back_to_the_socket_like_traffic(main_app, probe, api_request, monkeypatch, socket_dir):
+    monkeypatch.setattr(main_app.sdk, "real_sdk", _FakeClient(fail=True))
+    with FakeDstackServer(socket_dir) as server:
+        monkeypatch.setattr(main_app.sdk, "socket_path", server.dstack_path)
+        monkeypatch.setattr(main_app.sdk, "dstack_transport", DstackSocketTransport(server.dstack_path))
+        monitor = probe()
+    assert monitor.status["backend"] == "socket"
+    assert main_app.sdk.breakers["sdk"].failures == 1
+    assert api_request("GET", "/api/health/ready").status_code == 200
+
+
+def test_stale_socket_answer_is_not_ready(main_app, probe, monkeypatch):
+    async def stale(method, params=None):
+        return {"stale": True}
+
+    monkeypatch.setattr(main_app.sdk, "_call_dstack_api", stale)
+    assert "fallback" in probe().last_error
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from load_runner import percentile, run_cases, summarize
+
+
+@pytest.mark.parametrize(
+    "values, pct, expected",
+    [
+        ([], 50, 0),
+        ([7], 99, 7),
+        ([1, 2, 3, 4], 50, 2),
+        ([1, 2, 3, 4], 51, 3),
+        ([1, 2, 3, 4], 0, 1),
+        ([1, 2, 3, 4], 100, 4),
+        (list(range(1, 101)), 95, 95),
+        (list(range(1, 21)), 95, 19),
+        (list(range(1, 11)), 99, 10),
+    ],
+)
+def test_nearest_rank(values, pct, expected):
+    assert percentile(values, pct) == expected
+
+
+def test_summarize_reports_milliseconds():
+    summary = summarize([3_000_000, 1_000_000, 2_000_000])
+    assert summary["min"] == 1.0
+    assert summary["p50"] == 2.0
+    assert summary["max"] == 3.0
+    assert summary["mean"] == 2.0
+
+
+def test_run_cases_counts_errors_and_caps_concurrency():
+    in_flight = peak = 0
+
+    async def ok():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    report = asyncio.run(run_cases([("ok", ok), ("broken", broken)], iterations=10, concurrency=3))
+    assert peak <= 3
+    assert (report["total_runs"], report["total_errors"], report["error_rate"]) == (20, 10, 0.5)
+    ok_result, broken_result = report["results"]
+    assert (ok_result["status"], ok_result["runs"]) == ("passed", 10)
+    assert (broken_result["status"], broken_result["error"]) == ("failed", "boom")
+    assert broken_result["latency_ms"] == {}
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from quote_aggregator import QuoteAggregator, build_merkle_tree, merkle_leaf, verify_inclusion
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 9])
+def test_every_leaf_has_a_valid_proof(size):
+    payloads = [f"payload-{i}".encode() for i in range(size)]
+    root, proofs = build_merkle_tree([merkle_leaf(p) for p in payloads])
+    assert len(root) == 32
+    for payload, proof in zip(payloads, proofs):
+        assert verify_inclusion(payload, proof, root)
+    assert not verify_inclusion(b"forged", proofs[0], root)
+    if size > 1:
+        assert not verify_inclusion(payloads[0], proofs[1], root)
+
+
+def test_single_leaf_root_is_the_leaf():
+    root, proofs = build_merkle_tree([merkle_leaf(b"only")])
+    assert root == merkle_leaf(b"only")
+    assert proofs == [[]]
+
+
+def test_empty_tree_is_rejected():
+    with pytest.raises(ValueError):
+        build_merkle_tree([])
+
+
+def test_window_coalesces_into_one_quote():
+    async def main():
+        roots = []
+
+        async def quote_fn(root):
+            roots.append(root)
+            return "quote-" + root.hex()
+
+        aggregator = QuoteAggregator(quote_fn, window_ms=10)
+        payloads = [f"p{i}".encode() for i in range(5)]
+        results = await asyncio.gather(*(aggregator.submit(p) for p in payloads))
+        assert len(roots) == 1
+        for payload, result in zip(payloads, results):
+            assert result["quote"] == "quote-" + roots[0].hex()
+            assert result["batch_size"] == 5
+            assert verify_inclusion(payload, result["merkle_proof"], bytes.fromhex(result["merkle_root"]))
+        assert aggregator.stats == {"requests": 5, "quotes": 1, "largest_batch": 5}
+
+    asyncio.run(main())
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    async def main():
+        calls = []
+
+        async def quote_fn(root):
+            calls.append(root)
+            return "q"
+
+        aggregator = QuoteAggregator(quote_fn, window_ms=60000, max_batch=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(aggregator.submit(bytes([i])) for i in range(4))), 1
+        )
+        assert len(calls) == 2
+        assert {r["batch_size"] for r in results} == {2}
+
+    asyncio.run(main())
+
+
+def test_quote_failure_reaches_every_waiter():
+    async def main():
+        async def quote_fn(root):
+            raise RuntimeError("tdx unavailable")
+
+        aggregator = QuoteAggregator(quote_fn, window_ms=1)
+        results = await asyncio.gather(
+            aggregator.submit(b"a"), aggregator.submit(b"b"), return_exceptions=True
+        )
+        assert [str(r) for r in results] == ["tdx unavailable"] * 2
+
+    asyncio.run(main())
+
+
+def test_cancelled_batch_releases_waiters():
+    async def main():
+        started = asyncio.Event()
+
+        async def quote_fn(root):
+            started.set()
+            await asyncio.sleep(60)
+
+        aggregator = QuoteAggregator(quote_fn, window_ms=1)
+        waiters = [asyncio.create_task(aggregator.submit(bytes([i]))) for i in range(3)]
+        await started.wait()
+        for task in list(aggregator._batches):
+            task.cancel()
+        results = await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 1)
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        assert not aggregator._batches
+
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+import base64
+import hashlib
+import os
+import struct
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+import quote_verifier  # noqa: E402
+from quote_verifier import (  # noqa: E402
+    HEADER_LEN,
+    CollateralCache,
+    CollateralError,
+    QuoteFormatError,
+    QuoteVerifier,
+    parse_quote,
+)
+
+
+@pytest.fixture
+def collateral(tdx_platform, tmp_path):
+    cache = CollateralCache(str(tmp_path / "collateral"), fetch=False)
+    tdx_platform.seed(cache)
+    return cache
+
+
+@pytest.fixture
+def verifier(tdx_platform, collateral):
+    return QuoteVerifier(collateral, trusted_root_pem=tdx_platform.root_pem)
+
+
+def test_parse_quote_fields(tdx_platform):
+    measurements = tdx_platform.measurements(b"parse")
+    quote = parse_quote(tdx_platform.quote(b"nonce", measurements))
+    assert (quote.version, quote.tee_type) == (4, 0x81)
+    assert quote.body["report_data"] == b"nonce".ljust(64, b"\x00")
+    assert quote.body["rtmr3"] == measurements["rtmr3"]
+    assert quote.pck_chain_pem == tdx_platform.pck_chain
+    assert len(quote.signed_bytes) == HEADER_LEN + 584
+
+
+@pytest.mark.parametrize(
+    "mutate, message",
+    [
+        (lambda q: q[:600], "shorter than header"),
+        (lambda q: struct.pack("<H", 3) + q[2:], "version 3"),
+        (lambda q: q[:4] + struct.pack("<I", 0) + q[8:], "Not a TDX quote"),
+        (lambda q: q[:-200], "truncated"),
+    ],
+)
+def test_parse_quote_rejects_malformed(tdx_platform, mutate, message):
+    with pytest.raises(QuoteFormatError, match=message):
+        parse_quote(mutate(tdx_platform.quote()))
+
+
+def test_valid_quote_verifies(tdx_platform, verifier):
+    result = verifier.verify(tdx_platform.quote(b"hello").hex())
+    assert result["verified"] is True, result["errors"]
+    assert all(result["checks"].values())
+    assert result["tcb_status"] == "UpToDate"
+    assert result["fmspc"] == "00806f050000"
+
+
+def test_quote_encodings(tdx_platform, verifier):
+    raw = tdx_platform.quote(b"enc")
+    for value in (raw, "0x" + raw.hex(), base64.b64encode(raw).decode()):
+        assert verifier.verify(value)["verified"] is True
+
+
+def test_tampered_body_fails_signature(tdx_platform, verifier):
+    raw = bytearray(tdx_platform.quote(b"hello"))
+    raw[HEADER_LEN + 150] ^= 1  # inside mrtd
+    result = verifier.verify(bytes(raw))
+    assert result["verified"] is False
+    assert result["checks"]["quote_signature"] is False
+
+
+def test_malformed_quote_is_reported_not_raised(verifier):
+    result = verifier.verify("not a quote")
+    assert result["verified"] is False
+    assert result["checks"]["structure"] is False
+
+
+def test_untrusted_root_fails_chain(tdx_platform, collateral):
+    from fake_tdx import FakeTdxPlatform
+
+    other = FakeTdxPlatform()
+    result = QuoteVerifier(collateral, trusted_root_pem=other.root_pem).verify(tdx_platform.quote())
+    assert result["verified"] is False
+    assert result["checks"]["pck_chain"] is False
+
+
+def test_expected_measurements(tdx_platform, verifier):
+    measurements = tdx_platform.measurements(b"m")
+    quote = tdx_platform.quote(b"", measurements)
+    expected = {name: value.hex() for name, value in measurements.items()}
+    assert verifier.verify(quote, expected)["checks"]["measurements"] is True
+
+    expected["rtmr3"] = "00" * 48
+    result = verifier.verify(quote, expected)
+    assert result["verified"] is False
+    assert list(result["mismatches"]) == ["rtmr3"]
+
+
+@pytest.mark.parametrize(
+    "expected, ok, error",
+    [
+        (b"nonce".hex(), True, None),
+        ("0x" + b"nonce".hex(), True, None),
+        (b"other".hex(), False, None),
+        ("zz", False, "not hex"),
+        ("00" * 65, False, "longer than 64 bytes"),
+    ],
+)
+def test_expected_report_data(tdx_platform, verifier, expected, ok, error):
+    result = verifier.verify(tdx_platform.quote(b"nonce"), expected_report_data=expected)
+    assert result["checks"]["report_data"] is ok
+    assert result["verified"] is ok
+    if error:
+        assert any(error in e for e in result["errors"])
+
+
+def test_unaccepted_tcb_status(tdx_platform, collateral):
+    verifier = QuoteVerifier(
+        collateral, trusted_root_pem=tdx_platform.root_pem, accepted_tcb_statuses=("SWHardeningNeeded",)
+    )
+    result = verifier.verify(tdx_platform.quote())
+    assert result["verified"] is False
+    assert result["checks"]["tcb_info"] is False
+
+
+def test_missing_collateral_only_fails_when_required(tdx_platform, tmp_path):
+    empty = CollateralCache(str(tmp_path / "empty"), fetch=False)
+    strict = QuoteVerifier(empty, trusted_root_pem=tdx_platform.root_pem)
+    assert strict.verify(tdx_platform.quote())["verified"] is False
+    lenient = QuoteVerifier(empty, trusted_root_pem=tdx_platform.root_pem, require_collateral=False)
+    assert lenient.verify(tdx_platform.quote())["verified"] is True
+
+
+def test_fetched_root_must_match_the_pin(tdx_platform, collateral, monkeypatch):
+    monkeypatch.setattr(quote_verifier, "TRUSTED_ROOT_CA", "")
+    with pytest.raises(CollateralError, match="No trusted root CA"):
+        QuoteVerifier(collateral, trusted_root_sha256="").trusted_root()
+
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.x509 import load_pem_x509_certificate
+
+    pin = load_pem_x509_certificate(tdx_platform.root_pem).fingerprint(hashes.SHA256()).hex()
+    pinned = QuoteVerifier(collateral, trusted_root_sha256=pin)
+    assert pinned.verify(tdx_platform.quote())["verified"] is True
+
+    with pytest.raises(CollateralError, match="does not match"):
+        QuoteVerifier(collateral, trusted_root_sha256="00" * 32).trusted_root()
+
+
+def test_collateral_cache_refuses_shared_directory(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    cache = CollateralCache(str(shared), fetch=False)
+    cache.put("qe-identity", b"{}")
+    assert os.listdir(shared) == []
+    assert cache.get("qe-identity", "unused")["body"] == b"{}"
+
+    private = CollateralCache(str(tmp_path / "private"), fetch=False)
+    private.put("qe-identity", b"{}")
+    assert os.stat(tmp_path / "private").st_mode & 0o777 == 0o700
+    reloaded = CollateralCache(str(tmp_path / "private"), fetch=False)
+    assert reloaded.get("qe-identity", "unused")["body"] == b"{}"
+    assert reloaded.stats["disk_hits"] == 1
+
+
+def test_expired_collateral_is_stale_without_fetch(tmp_path):
+    cache = CollateralCache(str(tmp_path), fetch=False)
+    cache.put("qe-identity", b"{}", expires_at=1)
+    assert cache.get("qe-identity", "unused")["stale"] is True
+    with pytest.raises(CollateralError):
+        cache.get("missing", "unused")
+
+
+def test_platform_checks_are_memoised(tdx_platform, verifier):
+    verifier.verify(tdx_platform.quote(b"a"))
+    verifier.verify(tdx_platform.quote(b"b"))
+    assert len(verifier._platforms) == 1
+    assert hashlib.sha256(tdx_platform.pck_chain).digest() in verifier._platforms
@@ -0,0 +1,117 @@
+import gzip
+import json
+
+import pytest
+
+from response_codec import (
+    CBOR_MEDIA_TYPE,
+    COMPRESS_MIN_BYTES,
+    JSON_MEDIA_TYPE,
+    binary_fields,
+    cbor_dumps,
+    cbor_loads,
+    cbor_seq_loads,
+    encode,
+    negotiate_encoding,
+    negotiate_media_type,
+)
+
+
+@pytest.mark.parametrize(
+    "value, encoded",
+    [
+        (0, "00"),
+        (23, "17"),
+        (24, "1818"),
+        (1000, "1903e8"),
+        (1000000, "1a000f4240"),
+        (2**32, "1b0000000100000000"),
+        (-1, "20"),
+        (-1000, "3903e7"),
+        ("a", "6161"),
+        ("ü", "62c3bc"),
+        (b"\x01\x02", "420102"),
+        ([1, [2, 3]], "8201820203"),
+        ({"a": 1}, "a1616101"),
+        (None, "f6"),
+        (True, "f5"),
+        (False, "f4"),
+        (1.5, "fb3ff8000000000000"),
+    ],
+)
+def test_rfc8949_vectors(value, encoded):
+    assert cbor_dumps(value).hex() == encoded
+    assert cbor_loads(bytes.fromhex(encoded)) == value
+
+
+def test_round_trip_of_a_response():
+    payload = {"quote": b"\x00" * 5000, "event_log": "[]", "rtmrs": {"0": b"\x01" * 48}, "n": [1, -2, 3.25]}
+    assert cbor_loads(cbor_dumps(payload)) == payload
+
+
+def test_out_of_range_ints_and_unknown_types_become_strings():
+    assert cbor_loads(cbor_dumps(2**70)) == str(2**70)
+    assert cbor_loads(cbor_dumps((1, 2))) == [1, 2]
+
+
+def test_sequence_and_trailing_bytes():
+    data = cbor_dumps({"a": 1}) + cbor_dumps([2])
+    assert cbor_seq_loads(data) == [{"a": 1}, [2]]
+    with pytest.raises(ValueError):
+        cbor_loads(data)
+    with pytest.raises(ValueError):
+        cbor_loads(b"\x9f")  # indefinite-length array
+
+
+def test_binary_fields_converts_hex_quotes_and_rtmrs():
+    payload = {
+        "tee_quote": "0xabcd",
+        "nested": [{"quote": "00ff"}],
+        "rtmrs": {"rtmr0": "11" * 48},
+        "quote_hash": "abcd",
+        "data": "abcd",
+    }
+    converted = binary_fields(payload)
+    assert converted["tee_quote"] == b"\xab\xcd"
+    assert converted["nested"][0]["quote"] == b"\x00\xff"
+    assert converted["rtmrs"]["rtmr0"] == b"\x11" * 48
+    assert converted["quote_hash"] == "abcd"
+    assert converted["data"] == "abcd"
+    assert binary_fields({"quote": "not hex"}) == {"quote": "not hex"}
+    assert payload["tee_quote"] == "0xabcd"
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, JSON_MEDIA_TYPE),
+        ("*/*", JSON_MEDIA_TYPE),
+        ("application/cbor", CBOR_MEDIA_TYPE),
+        ("application/json, application/cbor", CBOR_MEDIA_TYPE),
+        ("application/json, application/cbor;q=0.5", JSON_MEDIA_TYPE),
+        ("application/cbor;q=0", JSON_MEDIA_TYPE),
+    ],
+)
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(accept) == expected
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("br") is None
+
+
+def test_encode_compresses_only_large_bodies():
+    small, headers = encode({"a": 1}, None, "gzip")
+    assert json.loads(small) == {"a": 1}
+    assert "Content-Encoding" not in headers
+
+    payload = {"quote": "ab" * COMPRESS_MIN_BYTES}
+    body, headers = encode(payload, "application/cbor", "gzip")
+    assert headers["Content-Type"] == CBOR_MEDIA_TYPE
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Vary"] == "Accept, Accept-Encoding"
+    assert cbor_loads(gzip.decompress(body)) == {"quote": b"\xab" * COMPRESS_MIN_BYTES}
@@ -0,0 +1,85 @@
+import hashlib
+import json
+
+import pytest
+
+from rtmr_replay import INIT_MR, RTMR_COUNT, RTMR_LEN, RTMR_OFFSET, RtmrReplayer, extend
+
+
+def _event(imr, label):
+    return {"imr": imr, "event_type": 1, "digest": hashlib.sha384(label.encode()).hexdigest(), "event": label}
+
+
+BOOT = [_event(imr, f"boot-{imr}-{i}") for i in range(3) for imr in (0, 1, 2)]
+RUNTIME = [_event(3, f"app-{i}") for i in range(4)]
+
+
+def _reference(events):
+    registers = [INIT_MR] * RTMR_COUNT
+    for event in events:
+        registers[event["imr"]] = hashlib.sha384(
+            registers[event["imr"]] + bytes.fromhex(event["digest"])
+        ).digest()
+    return tuple(registers)
+
+
+def _quote_with(registers):
+    return bytes(RTMR_OFFSET) + b"".join(registers) + bytes(64)
+
+
+def test_extend_pads_short_digests():
+    assert extend(INIT_MR, "ab") == hashlib.sha384(INIT_MR + b"\xab".ljust(RTMR_LEN, b"\x00")).digest()
+
+
+def test_replay_matches_reference_for_text_and_lists():
+    events = BOOT + RUNTIME
+    replayer = RtmrReplayer()
+    assert replayer.replay(events) == _reference(events)
+    assert replayer.replay(json.dumps(events)) == _reference(events)
+    assert replayer.replay_rtmrs(json.dumps(events)) == {
+        i: mr.hex() for i, mr in enumerate(_reference(events))
+    }
+
+
+def test_events_outside_rtmrs_are_ignored():
+    events = BOOT + [{"imr": 4, "digest": "00"}, {"event": "no imr"}]
+    assert RtmrReplayer().replay(json.dumps(events)) == _reference(BOOT)
+
+
+def test_appended_log_replays_only_the_tail():
+    replayer = RtmrReplayer()
+    replayer.replay(json.dumps(BOOT + RUNTIME[:2]))
+    before = replayer.events_replayed
+    assert replayer.replay(json.dumps(BOOT + RUNTIME)) == _reference(BOOT + RUNTIME)
+    assert replayer.events_replayed - before == 2
+    assert replayer.stats()["incremental_replays"] == 1
+    assert replayer.stats()["boot_prefix_events"] == len(BOOT)
+
+
+def test_divergent_runtime_log_resumes_from_boot():
+    replayer = RtmrReplayer()
+    replayer.replay(json.dumps(BOOT + RUNTIME))
+    other = BOOT + [_event(3, "other-app")]
+    before = replayer.events_replayed
+    assert replayer.replay(json.dumps(other)) == _reference(other)
+    assert replayer.events_replayed - before == 1
+
+
+def test_unterminated_log_raises():
+    with pytest.raises(ValueError):
+        RtmrReplayer().replay(json.dumps(BOOT)[:-1])
+
+
+def test_check_quotes():
+    events = BOOT + RUNTIME
+    registers = _reference(events)
+    replayer = RtmrReplayer()
+    results = replayer.check_quotes(
+        [_quote_with(registers), _quote_with(registers).hex(), _quote_with(_reference(BOOT)), b"short"],
+        [json.dumps(events), events, json.dumps(events), json.dumps(events)],
+    )
+    assert results[0] == {"valid": True}
+    assert results[1] == {"valid": True}
+    assert results[2]["valid"] is False
+    assert list(results[2]["mismatches"]) == ["rtmr3"]
+    assert results[3]["valid"] is False and "error" in results[3]
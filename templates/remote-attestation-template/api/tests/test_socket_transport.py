@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from fake_dstack import FakeDstackServer
+from socket_transport import DstackSocketTransport, TappdSocketTransport, TransportError
+
+
+@pytest.mark.parametrize("framing", ["newline", "length"])
+def test_dstack_calls_reuse_one_connection(socket_dir, framing):
+    async def main(path):
+        transport = DstackSocketTransport(path, framing="auto", size=2)
+        for i in range(5):
+            result = await transport.call("Info", {"n": i})
+            assert result["method"] == "Info"
+            assert result["params"] == {"n": i}
+        transport.pool.close()
+        return transport.pool.stats
+
+    with FakeDstackServer(socket_dir, framing=framing) as server:
+        stats = asyncio.run(main(server.dstack_path))
+        assert server.requests_served["dstack"] == 5
+    assert stats["connects"] == 1
+    assert stats["reuses"] == 4
+
+
+def test_pool_caps_calls_in_flight(socket_dir):
+    async def main(path):
+        transport = DstackSocketTransport(path, size=2, max_in_flight=2)
+        results = await asyncio.gather(*(transport.call("Info", {"n": i}) for i in range(10)))
+        assert [r["params"]["n"] for r in results] == list(range(10))
+        transport.pool.close()
+        return transport.pool.stats
+
+    with FakeDstackServer(socket_dir, latency_ms=5) as server:
+        stats = asyncio.run(main(server.dstack_path))
+    assert stats["connects"] == 2
+    assert stats["connects"] + stats["reuses"] == 10
+
+
+def test_call_timeout_closes_the_connection(socket_dir):
+    async def main(path):
+        transport = DstackSocketTransport(path, call_timeout=0.05)
+        with pytest.raises(TransportError, match="timed out"):
+            await transport.call("Info")
+        assert transport.pool._idle == []
+        result = await transport.call("Info", timeout=2)
+        assert result["method"] == "Info"
+        return transport.pool.stats
+
+    with FakeDstackServer(socket_dir, latency_ms=200) as server:
+        stats = asyncio.run(main(server.dstack_path))
+    assert stats["connects"] == 2
+
+
+def test_slow_calls_do_not_block_the_event_loop(socket_dir):
+    async def main(path):
+        transport = DstackSocketTransport(path, size=4, max_in_flight=4)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(*(transport.call("Info") for _ in range(4)))
+        elapsed = asyncio.get_running_loop().time() - started
+        task.cancel()
+        transport.pool.close()
+        return ticks, elapsed
+
+    with FakeDstackServer(socket_dir, latency_ms=100) as server:
+        ticks, elapsed = asyncio.run(main(server.dstack_path))
+    assert elapsed < 0.3
+    assert ticks >= 10
+
+
+def test_missing_socket_raises():
+    async def main():
+        transport = DstackSocketTransport("/nonexistent/dstack.sock")
+        with pytest.raises(OSError):
+            await transport.call("Info")
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_tappd_keep_alive(socket_dir, chunked):
+    async def main(path):
+        transport = TappdSocketTransport(path)
+        status, body = await transport.call("Info")
+        assert status == 200
+        assert body["method"] == "Info"
+        status, body = await transport.call("TdxQuote", {"report_data": "ab"})
+        assert body["params"] == {"report_data": "ab"}
+        transport.pool.close()
+        return transport.pool.stats
+
+    with FakeDstackServer(socket_dir, payload_bytes=20000, chunked=chunked) as server:
+        stats = asyncio.run(main(server.tappd_path))
+    assert stats["connects"] == 1
+    assert stats["reuses"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+from status_stream import HEARTBEAT_EVENT, StatusBroadcaster, format_event, merge_patch
+
+
+def _parse(event):
+    fields = dict(line.split(": ", 1) for line in event.strip().splitlines() if not line.startswith("retry"))
+    return fields["event"], json.loads(fields["data"])
+
+
+class _Source:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        value = self.values[min(self.calls, len(self.values)) - 1]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def test_merge_patch():
+    assert merge_patch({"a": 1, "b": {"c": 1, "d": 2}}, {"a": 1, "b": {"c": 2, "d": 2}}) == {"b": {"c": 2}}
+    assert merge_patch({"a": 1, "gone": 1}, {"a": 1, "new": 2}) == {"gone": None, "new": 2}
+    assert merge_patch({"a": [1]}, {"a": [1]}) is None
+    assert merge_patch(1, {"a": 1}) == {"a": 1}
+
+
+def test_format_event():
+    assert format_event("delta", 3, {"a": 1}) == 'id: 3\nevent: delta\ndata: {"a":1}\n\n'
+
+
+def test_subscribers_share_one_poller_and_get_deltas():
+    source = _Source({"v": 1}, {"v": 1}, {"v": 2})
+
+    async def run():
+        stream = StatusBroadcaster({"info": source}, interval=3600, heartbeat=3600)
+        first, second = stream.events(), stream.events()
+        assert _parse(await first.__anext__()) == ("snapshot", {"info": {"v": 1}})
+        assert _parse(await second.__anext__()) == ("snapshot", {"info": {"v": 1}})
+        await stream.poll()  # unchanged: no event
+        await stream.poll()
+        for subscriber in (first, second):
+            assert _parse(await subscriber.__anext__()) == ("delta", {"info": {"v": 2}})
+        assert source.calls == 3
+        assert stream.stats()["subscribers"] == 2
+        await first.aclose()
+        assert stream.stats()["polling"] is True
+        await second.aclose()
+        assert stream.stats()["polling"] is False
+        return stream.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["polls"], stats["deltas"], stats["version"]) == (3, 1, 2)
+
+
+def test_failed_source_keeps_its_last_value():
+    source = _Source({"v": 1}, RuntimeError("socket gone"))
+
+    async def run():
+        stream = StatusBroadcaster({"info": source}, interval=3600)
+        await stream.poll()
+        await stream.poll()
+        return stream
+
+    stream = asyncio.run(run())
+    assert stream.state == {"info": {"v": 1}}
+    assert stream.stats()["errors"] == {"info": "socket gone"}
+
+
+def test_slow_subscriber_is_resynced_with_a_snapshot():
+    counter = iter(range(100))
+
+    async def source():
+        return next(counter)
+
+    async def run():
+        stream = StatusBroadcaster({"n": source}, interval=3600, queue_size=2)
+        events = stream.events()
+        await events.__anext__()
+        for _ in range(5):
+            await stream.poll()
+        received = [_parse(await events.__anext__())]
+        await events.aclose()
+        return stream, received
+
+    stream, received = asyncio.run(run())
+    # Backlog replaced twice (at polls 3 and 5); the latest state arrives as one snapshot
+    assert received == [("snapshot", {"n": 5})]
+    assert stream.stats()["resyncs"] == 2
+
+
+def test_heartbeat_when_nothing_changes():
+    async def run():
+        stream = StatusBroadcaster({"info": _Source({"v": 1})}, interval=3600, heartbeat=0.01)
+        events = stream.events()
+        await events.__anext__()
+        event = await events.__anext__()
+        await events.aclose()
+        return event
+
+    assert asyncio.run(run()) == HEARTBEAT_EVENT
+
+
+def test_stream_endpoint_rejects_subscribers_over_the_cap(main_app, api_request, monkeypatch):
+    monkeypatch.setattr(main_app.status_stream, "max_subscribers", 0)
+    response = api_request("GET", "/api/stream")
+    assert response.status_code == 503
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+
+from ttl_cache import STALE_TTL, AsyncTTLCache
+
+
+def _counting_loader(value="v", delay=0.0):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+
+    return loader, calls
+
+
+def test_hit_after_load_and_expiry():
+    async def main():
+        cache = AsyncTTLCache(default_ttl=0.05)
+        loader, calls = _counting_loader()
+        assert await cache.get_or_load("info", loader) == "v"
+        assert await cache.get_or_load("info", loader) == "v"
+        assert len(calls) == 1
+        await asyncio.sleep(0.06)
+        assert cache.peek("info") is None
+        await cache.get_or_load("info", loader)
+        assert len(calls) == 2
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(main())
+
+
+def test_concurrent_misses_share_one_load():
+    async def main():
+        cache = AsyncTTLCache()
+        loader, calls = _counting_loader(delay=0.01)
+        results = await asyncio.gather(*(cache.get_or_load("info", loader) for _ in range(5)))
+        assert results == ["v"] * 5
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert (stats["misses"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+    asyncio.run(main())
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def main():
+        cache = AsyncTTLCache()
+        loader, calls = _counting_loader(delay=0.05)
+        leader = asyncio.create_task(cache.get_or_load("info", loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_load("info", loader)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await asyncio.gather(*waiters) == ["v"] * 3
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert len(calls) == 1
+        assert cache.peek("info") == "v"
+
+    asyncio.run(main())
+
+
+def test_failed_load_is_shared_and_not_cached():
+    async def main():
+        cache = AsyncTTLCache()
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("socket down")
+
+        results = await asyncio.gather(
+            *(cache.get_or_load("info", failing) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert len(calls) == 1
+        assert cache.stats()["errors"] == 1
+        loader, _ = _counting_loader("ok")
+        assert await cache.get_or_load("info", loader) == "ok"
+
+    asyncio.run(main())
+
+
+def test_stale_values_expire_quickly():
+    cache = AsyncTTLCache(default_ttl=3600)
+    cache.set("info", {"stale": True})
+    assert cache._entries["info"][1] - time.monotonic() <= STALE_TTL
+    cache.set("fresh", {"stale": False})
+    assert cache._entries["fresh"][1] - time.monotonic() > STALE_TTL
+
+
+def test_invalidate():
+    cache = AsyncTTLCache(ttls={"a": 10})
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.ttl_for("a") == 10
+    cache.invalidate("a")
+    assert cache.peek("a") is None and cache.peek("b") == 2
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+LOCAL = ("127.0.0.1", 4000)
+
+
+def test_invalidate_is_local_only_without_a_token(main_app, api_request):
+    assert api_request("POST", "/api/cache/invalidate").status_code == 403
+    response = api_request("POST", "/api/cache/invalidate", client=LOCAL)
+    assert response.status_code == 200
+    assert response.json()["invalidated"] == sorted(main_app.sdk.cache.ttls)
+
+
+def test_invalidate_needs_the_admin_token(main_app, api_request, monkeypatch):
+    monkeypatch.setattr(main_app, "CACHE_ADMIN_TOKEN", "s3cret")
+    main_app.sdk.cache.set("tee_info", {"cached": True})
+    assert api_request("POST", "/api/cache/invalidate", client=LOCAL).status_code == 401
+    wrong = {"Authorization": "Bearer nope"}
+    assert api_request("POST", "/api/cache/invalidate", headers=wrong).status_code == 403
+    assert main_app.sdk.cache.peek("tee_info") == {"cached": True}
+
+    right = {"Authorization": "Bearer s3cret"}
+    response = api_request("POST", "/api/cache/invalidate?key=tee_info", headers=right)
+    assert response.status_code == 200
+    assert response.json()["invalidated"] == ["tee_info"]
+    assert main_app.sdk.cache.peek("tee_info") is None
+    assert api_request("POST", "/api/cache/invalidate?key=bogus", headers=right).status_code == 400
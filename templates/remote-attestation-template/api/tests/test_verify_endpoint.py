@@ -0,0 +1,27 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "body", [{}, {"attestation_id": "tee-unknown"}, {"quote_hash": "00" * 32}]
+)
+def test_verify_unknown_attestation_is_404(api_request, body):
+    response = api_request("POST", "/api/attestation/verify", json=body)
+    assert response.status_code == 404
+
+
+def test_verify_malformed_quote_is_not_verified(api_request):
+    response = api_request("POST", "/api/attestation/verify", json={"quote": "00" * 16})
+    assert response.status_code == 200
+    assert response.json()["verified"] is False
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"quote": 42},
+        {"quote": "00", "expected_measurements": ["mrtd"]},
+        {"quote": "00", "expected_report_data": {"hex": "00"}},
+    ],
+)
+def test_verify_rejects_wrongly_typed_fields(api_request, body):
+    assert api_request("POST", "/api/attestation/verify", json=body).status_code == 422
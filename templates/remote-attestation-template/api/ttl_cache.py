@@ -0,0 +1,100 @@
+"""
+Async TTL cache with single-flight loading
+
+Values that barely change for the life of a CVM (TEE info, measurements,
+capabilities) are cached per key with their own TTL. Concurrent misses on
+the same key share one in-flight load, so a burst of dashboard polls costs
+a single upstream call. The load runs as its own task, so the request that
+started it being cancelled does not fail the others waiting on it.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+DEFAULT_TTL = float(os.getenv("TEE_CACHE_TTL", 60))
+# Stale fallbacks served while the TEE is unreachable are re-checked this soon
+STALE_TTL = float(os.getenv("TEE_CACHE_STALE_TTL", 5))
+
+
+class AsyncTTLCache:
+    def __init__(self, default_ttl: float = DEFAULT_TTL, ttls: Optional[Dict[str, float]] = None):
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self._entries: Dict[str, tuple] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def ttl_for(self, key: str) -> float:
+        return self.ttls.get(key, self.default_ttl)
+
+    def peek(self, key: str):
+        """Return the cached value if fresh, else None, without loading"""
+        entry = self._entries.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl_for(key) if ttl is None else ttl
+        if isinstance(value, dict) and value.get("stale"):
+            ttl = min(ttl, STALE_TTL)
+        self._entries[key] = (value, time.monotonic() + ttl)
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None
+    ):
+        entry = self._entries.get(key)
+        if entry and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            # shield: one waiter being cancelled must not cancel the shared load
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # The load is its own task: the caller that started it being cancelled
+        # must not cancel it for the callers coalesced onto it
+        task = asyncio.get_running_loop().create_task(self._load(key, loader, ttl))
+        # Mark retrieved so an unobserved failure does not log a warning
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float]):
+        try:
+            value = await loader()
+        except Exception:
+            self.errors += 1
+            raise
+        else:
+            self.set(key, value, ttl)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one key, or everything when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,97 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+import pytest
+from support import http_get, wait_for
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT, "benchmarks"),
+    os.path.join(ROOT, "templates", "remote-attestation-template", "api"),
+]
+
+
+@pytest.fixture(scope="session")
+def simple_api():
+    """simple-python-api.py loaded as a module, with its store enabled in a scratch directory"""
+    from bench_serialization import load_api
+
+    directory = tempfile.mkdtemp(prefix="simple-api-")
+    os.environ["ATTESTATION_STORE_ENABLED"] = "true"
+    os.environ["ATTESTATION_STORE_PATH"] = os.path.join(directory, "attestations.db")
+    try:
+        # The shared store module reads its settings on import
+        sys.modules.pop("attestation_store", None)
+        return load_api()
+    finally:
+        del os.environ["ATTESTATION_STORE_ENABLED"]
+        del os.environ["ATTESTATION_STORE_PATH"]
+
+
+@pytest.fixture(scope="session")
+def simple_server(simple_api):
+    server = simple_api.create_server(0, "threaded")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def request_json(simple_server):
+    """request_json(method, path, body=None, headers=None) -> (status, parsed body)"""
+
+    def send(method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", simple_server.server_address[1], timeout=10)
+        try:
+            payload = None if body is None else json.dumps(body)
+            conn.request(method, path, body=payload, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read() or b"null")
+        finally:
+            conn.close()
+
+    return send
+
+
+@pytest.fixture
+def spawn_api(tmp_path):
+    """spawn_api(**env) -> (process, port): simple-python-api.py in a subprocess, once it is live"""
+    started = []
+
+    def spawn(**env):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        env = {
+            **os.environ,
+            "PORT": str(port),
+            "DSTACK_SOCKET_PATH": str(tmp_path / "dstack.sock"),
+            "TAPPD_SOCKET_PATH": str(tmp_path / "tappd.sock"),
+            **env,
+        }
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "simple-python-api.py")], env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        started.append(proc)
+        wait_for(lambda: http_get(port, "/api/health/live")[0] == 200)
+        return proc, port
+
+    yield spawn
+    for proc in started:
+        if proc.poll() is None:
+            proc.terminate()
+        proc.wait(10)
+
+
+@pytest.fixture(scope="session")
+def tdx_platform():
+    pytest.importorskip("cryptography")
+    from fake_tdx import FakeTdxPlatform
+
+    return FakeTdxPlatform()
@@ -0,0 +1,28 @@
+"""Helpers shared by the simple API tests"""
+
+import http.client
+import time
+
+
+def wait_for(predicate, timeout=15):
+    """Poll predicate until it is true, treating OSError as not yet"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise AssertionError("condition not met in time")
+
+
+def http_get(port, path):
+    """(status, body bytes) of a GET to the API on port"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
@@ -0,0 +1,102 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+from support import http_get, wait_for
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+needs_fork = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs os.fork")
+
+
+def _children(pid):
+    path = f"/proc/{pid}/task/{pid}/children"
+    if not os.path.exists(path):
+        pytest.skip("needs /proc/<pid>/task/<pid>/children")
+    with open(path) as f:
+        return {int(child) for child in f.read().split()}
+
+
+@pytest.fixture
+def prefork(spawn_api):
+    return spawn_api(API_SERVER_MODE="prefork", API_PROCESSES="2", API_RESPAWN_BACKOFF="0.01")
+
+
+def test_create_server_modes(simple_api):
+    for mode, cls in (("single", simple_api.SingleHTTPServer), ("threaded", simple_api.ThreadPoolHTTPServer),
+                      ("prefork", simple_api.ThreadPoolHTTPServer)):
+        server = simple_api.create_server(0, mode)
+        try:
+            assert type(server) is cls
+        finally:
+            server.server_close()
+    with pytest.raises(ValueError):
+        simple_api.create_server(0, "forking")
+
+
+def test_idle_connection_does_not_block_threaded_server(simple_server, request_json):
+    with socket.create_connection(("127.0.0.1", simple_server.server_address[1])):
+        assert request_json("GET", "/api/health/live")[0] == 200
+
+
+@needs_fork
+def test_prefork_workers_share_the_socket(prefork):
+    proc, port = prefork
+    wait_for(lambda: len(_children(proc.pid)) == 2)
+    assert all(http_get(port, "/api/health/live")[0] == 200 for _ in range(20))
+
+
+@needs_fork
+def test_prefork_replaces_a_killed_worker(prefork):
+    proc, port = prefork
+    wait_for(lambda: len(_children(proc.pid)) == 2)
+    before = _children(proc.pid)
+    os.kill(min(before), signal.SIGKILL)
+    wait_for(lambda: len(_children(proc.pid)) == 2 and _children(proc.pid) != before)
+    assert proc.poll() is None
+    assert http_get(port, "/api/health/live")[0] == 200
+
+
+@needs_fork
+def test_sigterm_stops_supervisor_and_workers(prefork):
+    proc, _ = prefork
+    wait_for(lambda: len(_children(proc.pid)) == 2)
+    workers = _children(proc.pid)
+    proc.terminate()
+    assert proc.wait(10) == 0
+
+    def gone(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        return False
+
+    wait_for(lambda: all(gone(pid) for pid in workers))
+
+
+@needs_fork
+def test_supervisor_gives_up_on_crashing_workers():
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {os.path.join(ROOT, "benchmarks")!r})
+        from bench_serialization import load_api
+
+        class Broken:
+            def serve_forever(self):
+                raise RuntimeError("worker crashed")
+
+        api = load_api()
+        api._serve_prefork(Broken(), 2, crash_limit=5, crash_window=60, backoff=0.01, backoff_max=0.05)
+    """)
+    started = time.monotonic()
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=30)
+    assert result.returncode == 1
+    assert "5 workers died" in result.stderr
+    assert result.stderr.count("RuntimeError: worker crashed") < 10
+    assert time.monotonic() - started < 20
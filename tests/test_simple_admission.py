@@ -0,0 +1,50 @@
+import functools
+import threading
+import time
+
+import pytest
+
+
+def test_admission_limits(simple_api):
+    admission = simple_api.AdmissionController(rate=1, burst=1, concurrency=1, queue_depth=1,
+                                               queue_timeout=0.2)
+    assert admission.acquire("10.0.0.1") is None
+    assert admission.acquire("10.0.0.1")[0] == "rate_limited"
+    assert admission.acquire("10.0.0.2")[0] == "queue_timeout"
+    holder = threading.Thread(target=admission.acquire, args=("10.0.0.3",))
+    holder.start()
+    time.sleep(0.02)
+    assert admission.acquire("10.0.0.4")[0] == "queue_full"
+    holder.join()
+    admission.release(0.01)
+    assert admission.stats()["in_use"] == 0
+
+
+@pytest.fixture
+def admission(simple_api, monkeypatch):
+    if simple_api.ADMISSION is None:
+        pytest.skip("admission control is disabled")
+    controller = simple_api.AdmissionController(rate=1, burst=1)
+    monkeypatch.setattr(simple_api, "ADMISSION", controller)
+    return controller
+
+
+def _quote(request_json, **headers):
+    return request_json("POST", "/api/tee/quote", {"data": "x"}, headers)[0]
+
+
+def test_spoofed_forwarded_for_shares_the_peer_bucket(admission, request_json):
+    assert _quote(request_json, **{"X-Forwarded-For": "1.1.1.1"}) == 200
+    assert _quote(request_json, **{"X-Forwarded-For": "2.2.2.2"}) == 429
+    assert admission.stats()["clients"] == 1
+
+
+def test_valid_api_keys_get_their_own_bucket(simple_api, admission, request_json, monkeypatch):
+    monkeypatch.setattr(simple_api, "client_identity",
+                        functools.partial(simple_api.client_identity, api_keys=frozenset({"team-a"})))
+    assert _quote(request_json) == 200
+    assert _quote(request_json, **{"X-API-Key": "team-a"}) == 200
+    assert _quote(request_json, **{"X-API-Key": "team-a"}) == 429
+    # An unknown key falls back to the (already spent) address bucket
+    assert _quote(request_json, **{"X-API-Key": "made-up"}) == 429
+    assert admission.stats()["clients"] == 2
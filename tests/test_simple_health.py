@@ -0,0 +1,56 @@
+import os
+import socket
+import tempfile
+
+import pytest
+
+
+@pytest.fixture
+def listening_socket():
+    directory = tempfile.mkdtemp(prefix="tee-", dir="/tmp")
+    path = os.path.join(directory, "dstack.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    yield path
+    server.close()
+    os.unlink(path)
+    os.rmdir(directory)
+
+
+def test_not_ready_without_a_tee_socket(simple_api, request_json, monkeypatch):
+    monkeypatch.setattr(simple_api, "TEE_PROBE", simple_api.TeeSocketProbe(["/nonexistent/dstack.sock"]))
+    status, response = request_json("GET", "/api/health/ready")
+    assert status == 503
+    assert (response["status"], response["ready"]) == ("not_ready", False)
+    assert request_json("GET", "/api/health/live")[0] == 200
+
+
+def test_ready_when_a_socket_accepts(simple_api, request_json, monkeypatch, listening_socket):
+    probe = simple_api.TeeSocketProbe(["/nonexistent/dstack.sock", listening_socket])
+    monkeypatch.setattr(simple_api, "TEE_PROBE", probe)
+    status, response = request_json("GET", "/api/health/ready")
+    assert status == 200
+    assert response["socket"] == listening_socket
+
+
+def test_socket_that_refuses_is_not_ready(simple_api, listening_socket):
+    probe = simple_api.TeeSocketProbe([listening_socket], interval=0)
+    assert probe.check()[0] == listening_socket
+    stale = listening_socket + ".stale"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(stale)
+    try:
+        probe.socket_paths = (stale,)
+        answered, error = probe.check()
+        assert answered is None
+        assert stale in error
+    finally:
+        os.unlink(stale)
+
+
+def test_probe_result_is_reused_within_the_interval(simple_api, listening_socket):
+    probe = simple_api.TeeSocketProbe([listening_socket], interval=60)
+    assert probe.check()[0] == listening_socket
+    probe.socket_paths = ("/nonexistent/dstack.sock",)
+    assert probe.check()[0] == listening_socket
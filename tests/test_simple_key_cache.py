@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+
+class _Key:
+    def __init__(self, key):
+        self.key = key
+
+
+class _Client:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def get_key(self, path, purpose):
+        self.calls += 1
+        if path == "slow":
+            time.sleep(self.delay)
+        if path == "bad":
+            raise RuntimeError("no such key")
+        return _Key("ab" * 32)
+
+
+@pytest.fixture
+def key_cache(simple_api, monkeypatch):
+    """(cache, client, derive): a fresh KEY_CACHE served by a fake dstack client"""
+    client = _Client(delay=0.3)
+    monkeypatch.setattr(simple_api.DSTACK_CLIENTS, "get", lambda: client)
+    cache = simple_api.KeyCache(timeout=0.05)
+    monkeypatch.setattr(simple_api, "KEY_CACHE", cache)
+    return cache, client, lambda keys: simple_api._derive_keys(client, keys)
+
+
+def _constant(keys):
+    return {key: (bytes([len(key[0])]) * 32, "test") for key in keys}
+
+
+def test_lru_eviction_zeroizes_the_oldest_key(simple_api):
+    cache = simple_api.KeyCache(max_entries=2)
+    cache.get_many([("a", "x"), ("bb", "x")], _constant)
+    oldest = cache._entries[("a", "x")][0]
+    cache.get_many([("a", "x")], _constant)  # now most recently used
+    second = cache._entries[("bb", "x")][0]
+    cache.get_many([("ccc", "x")], _constant)
+    assert list(cache._entries) == [("a", "x"), ("ccc", "x")]
+    assert second == bytearray(32)
+    assert oldest == bytearray([1]) * 32
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_and_cleared_keys_are_zeroized(simple_api):
+    cache = simple_api.KeyCache(ttl=-1)
+    cache.get_many([("a", "x")], _constant)
+    material = cache._entries[("a", "x")][0]
+    assert cache.get_many([("a", "x")], _constant)[("a", "x")][2] is False
+    assert material == bytearray(32)
+    material = cache._entries[("a", "x")][0]
+    cache.clear()
+    assert material == bytearray(32)
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_misses_share_one_derivation(simple_api):
+    cache = simple_api.KeyCache(timeout=5)
+    calls = []
+
+    def slow(keys):
+        calls.append(keys)
+        time.sleep(0.1)
+        return _constant(keys)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_many([("a", "x")], slow)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len({result[("a", "x")][0] for result in results}) == 1
+    assert cache.stats()["coalesced"] == 3
+
+
+def test_key_cache_reports_per_key_errors(key_cache):
+    cache, client, derive = key_cache
+    errors = {}
+    derived = cache.get_many([("a", "x"), ("bad", "x"), ("slow", "x")], derive, errors)
+    assert list(derived) == [("a", "x")]
+    assert isinstance(errors[("bad", "x")], RuntimeError)
+    assert isinstance(errors[("slow", "x")], TimeoutError)
+    assert cache.get_many([("a", "x")], derive)[("a", "x")][2] is True
+    with pytest.raises(RuntimeError):
+        cache.get_many([("bad", "y")], derive)
+
+
+def test_coalesced_waiters_time_out(key_cache):
+    cache, client, derive = key_cache
+    cache.timeout = 1
+    leader = threading.Thread(target=cache.get_many, args=([("slow", "y")], derive))
+    leader.start()
+    time.sleep(0.05)
+    cache.timeout = 0.05
+    errors = {}
+    assert cache.get_many([("slow", "y")], derive, errors) == {}
+    assert isinstance(errors[("slow", "y")], TimeoutError)
+    leader.join()
+    assert client.calls == 1
+    stats = cache.stats()
+    assert (stats["coalesced"], stats["timeouts"]) == (1, 1)
+
+
+def test_real_keys_are_cached(key_cache, request_json):
+    cache, client, _ = key_cache
+    for cached in (False, True):
+        status, response = request_json("POST", "/api/tee/key", {"path": "real"})
+        assert status == 200
+        assert response["key_data"]["cached"] is cached
+    assert client.calls == 1
+
+
+def test_demo_keys_are_not_cached(simple_api, request_json, monkeypatch):
+    cache = simple_api.KeyCache()
+    monkeypatch.setattr(simple_api, "KEY_CACHE", cache)
+    monkeypatch.setattr(simple_api.DSTACK_CLIENTS, "get", lambda: None)
+    for _ in range(2):
+        status, response = request_json("POST", "/api/tee/key", {"path": "demo"})
+        assert status == 200
+        assert response["key_data"]["cached"] is False
+    status, response = request_json("POST", "/api/tee/key/batch", {"paths": ["demo", "other"]})
+    assert status == 200
+    assert response["derived"] == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_client_rebuild_clears_cached_keys(simple_api, monkeypatch, tmp_path):
+    cache = simple_api.KeyCache()
+    monkeypatch.setattr(simple_api, "KEY_CACHE", cache)
+    socket_path = tmp_path / "dstack.sock"
+    registry = simple_api.DstackClientRegistry((str(socket_path),), recheck_interval=0)
+    registry.get()
+    cache.get_many([("a", "x")], _constant)
+    material = cache._entries[("a", "x")][0]
+    registry.get()  # same socket: keys stay
+    assert cache.stats()["entries"] == 1
+    socket_path.touch()  # a new socket appears, so the client is rebuilt
+    registry.get()
+    assert cache.stats()["entries"] == 0
+    assert material == bytearray(32)
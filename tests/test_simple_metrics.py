@@ -0,0 +1,91 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+from support import http_get, wait_for
+
+
+def _scrape(port):
+    status, body = http_get(port, "/metrics")
+    assert status == 200
+    return body.decode()
+
+
+def _value(text, series):
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_request_series_and_histogram(simple_server, request_json):
+    port = simple_server.server_address[1]
+    before = _value(_scrape(port), 'http_requests_total{method="GET",route="/api/health",status="200"}') or 0
+    for _ in range(3):
+        request_json("GET", "/api/health?x=1")
+    request_json("GET", "/api/nope")
+    text = _scrape(port)
+    assert _value(text, 'http_requests_total{method="GET",route="/api/health",status="200"}') == before + 3
+    assert _value(text, 'http_requests_total{method="GET",route="unmatched",status="404"}') >= 1
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    inf = _value(text, 'http_request_duration_seconds_bucket{method="GET",route="/api/health",le="+Inf"}')
+    assert inf == _value(text, 'http_request_duration_seconds_count{method="GET",route="/api/health"}')
+    assert _value(text, "http_requests_in_flight") == 1
+
+
+def test_key_cache_and_admission_series(simple_server):
+    text = _scrape(simple_server.server_address[1])
+    for series in ('tee_key_cache_lookups_total{result="hit"}', 'tee_key_cache_lookups_total{result="miss"}',
+                   'tee_key_cache_lookups_total{result="coalesced"}', "tee_key_cache_evictions_total",
+                   "tee_key_cache_timeouts_total", "tee_key_cache_entries",
+                   'tee_admission_rejected_total{reason="rate_limited"}', "tee_admission_waiting"):
+        assert _value(text, series) is not None, series
+
+
+def test_series_cap_and_label_escaping(simple_api):
+    metric = simple_api.Metric("counter", "demo_total", "Demo", ("name",), max_series=2)
+    for name in ("a", "b", "c", "d"):
+        metric.inc((name,))
+    metric.inc(('say "hi"\n',))
+    lines = metric.render()
+    assert 'demo_total{name="a"} 1' in lines
+    assert 'demo_total{name="other"} 3' in lines
+    fresh = simple_api.Metric("counter", "quoted_total", "Quoted", ("name",))
+    fresh.inc(('say "hi"\n',))
+    assert 'quoted_total{name="say \\"hi\\"\\n"} 1' in fresh.render()
+
+
+def test_spool_sums_workers_and_drops_dead_gauges(simple_api, tmp_path):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    other = {
+        "http_requests_total": [[["GET", "/api/health", "200"], 5]],
+        "http_requests_in_flight": [[[], 7]],
+        "http_request_duration_seconds": [[["GET", "/api/health"], [[1] + [0] * 14, 0.0004]]],
+        "tee_key_cache_lookups_total": [[["hit"], 4]],
+    }
+    (tmp_path / f"{dead.pid}.json").write_text(json.dumps({"pid": dead.pid, "families": other}))
+    (tmp_path / "garbage.json").write_text("{")
+    spool = simple_api.MetricsSpool(str(tmp_path))
+    own = dict(simple_api.HTTP_REQUESTS.samples()).get(("GET", "/api/health", "200"), 0)
+    own_hits = simple_api.KEY_CACHE.stats()["hits"]
+
+    families = {metric.name: dict(samples) for metric, samples in spool.collect()}
+    assert os.path.exists(tmp_path / f"{os.getpid()}.json")
+    assert families["http_requests_total"][("GET", "/api/health", "200")] == own + 5
+    assert families["tee_key_cache_lookups_total"][("hit",)] == own_hits + 4
+    assert families["http_requests_in_flight"].get((), 0) < 7
+    histogram = families["http_request_duration_seconds"][("GET", "/api/health")]
+    assert histogram[0][0] >= 1 and histogram[1] >= 0.0004
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs os.fork")
+def test_prefork_scrape_reports_every_worker(spawn_api):
+    _, port = spawn_api(API_SERVER_MODE="prefork", API_PROCESSES="3", METRICS_SPOOL_INTERVAL="0.05")
+    for _ in range(30):
+        assert http_get(port, "/api/health")[0] == 200
+    series = 'http_requests_total{method="GET",route="/api/health",status="200"}'
+    # Each scrape lands on one worker, but reports the total across all three
+    wait_for(lambda: all(_value(_scrape(port), series) == 30 for _ in range(6)))
+    assert _value(_scrape(port), "tee_key_cache_entries") == 0
@@ -0,0 +1,86 @@
+import http.client
+import json
+
+import pytest
+
+
+@pytest.fixture
+def conn(simple_server):
+    conn = http.client.HTTPConnection("127.0.0.1", simple_server.server_address[1], timeout=10)
+    yield conn
+    conn.close()
+
+
+def _send(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    return response, response.read()
+
+
+def test_table_is_built_from_decorated_handlers(simple_api):
+    router = simple_api.ROUTER
+    assert router.routes[("GET", "/api/health")] is simple_api.TEEAPIHandler._get_health
+    assert router.routes[("POST", "/api/attestation/generate")].__name__ == "_post_attestation_generate"
+    assert router.allowed["/api/health"] == ["GET"]
+
+    class Handler:
+        @simple_api.route("GET", "/a")
+        @simple_api.route("POST", "/a")
+        def both(self):
+            pass
+
+    assert sorted(simple_api.Router.from_handler_class(Handler).allowed["/a"]) == ["GET", "POST"]
+    router = simple_api.Router()
+    router.add("GET", "/a", None)
+    with pytest.raises(ValueError, match="Duplicate route"):
+        router.add("GET", "/a", None)
+
+
+def test_query_string_does_not_affect_matching(request_json):
+    status, response = request_json("GET", "/api/health?verbose=1")
+    assert status == 200
+    assert response["status"] == "healthy"
+
+
+def test_unknown_path_is_404(request_json):
+    status, response = request_json("GET", "/api/nope")
+    assert status == 404
+    assert response["path"] == "/api/nope"
+
+
+def test_wrong_method_is_405_with_allow(conn):
+    response, body = _send(conn, "POST", "/api/health")
+    assert response.status == 405
+    assert response.getheader("Allow") == "GET, OPTIONS"
+    assert json.loads(body)["error"] == "Method not allowed"
+
+
+def test_body_limits_are_checked_before_dispatch(simple_api, conn):
+    response, _ = _send(conn, "POST", "/api/attestation/generate", headers={"Content-Length": "-1"})
+    assert response.status == 400
+    conn.close()
+    response, body = _send(conn, "POST", "/api/attestation/generate",
+                           headers={"Content-Length": str(simple_api.MAX_BODY_BYTES + 1)})
+    assert response.status == 413
+    assert response.getheader("Connection") == "close"
+
+
+def test_keep_alive_serves_several_requests(conn):
+    for path in ("/api/health", "/api/health/live", "/api/nope"):
+        response, _ = _send(conn, "GET", path)
+        assert not response.will_close
+    assert conn.sock is not None
+
+
+def test_route_hooks_see_the_route_template(simple_api, request_json, monkeypatch):
+    seen = []
+    monkeypatch.setattr(simple_api, "ROUTE_HOOKS", [lambda *args: seen.append(args[:3])])
+    request_json("GET", "/api/health?x=1")
+    request_json("GET", "/api/tee/key-that-does-not-exist")
+    assert seen == [("GET", "/api/health", 200), ("GET", "unmatched", 404)]
+
+
+def test_options_preflight(conn):
+    response, _ = _send(conn, "OPTIONS", "/api/attestation/generate")
+    assert response.status == 200
+    assert "POST" in response.getheader("Access-Control-Allow-Methods")
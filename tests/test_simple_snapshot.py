@@ -0,0 +1,82 @@
+import http.client
+import json
+import os
+import threading
+import time
+
+import pytest
+from support import http_get, wait_for
+
+
+def _generation(simple_api):
+    return simple_api.SNAPSHOT.generation
+
+
+def test_snapshot_refresh_is_gated(simple_api, request_json, monkeypatch):
+    status, response = request_json("POST", "/api/snapshot/refresh")
+    assert status == 200
+    assert response["status"] == "success"
+
+    monkeypatch.setattr(simple_api, "SNAPSHOT_REFRESH_TOKEN", "s3cret")
+    for path, body in (("/api/snapshot/refresh", None), ("/api/cache/invalidate", {"key": "snapshot"}),
+                       ("/api/cache/invalidate", {})):
+        assert request_json("POST", path, body)[0] == 401
+        assert request_json("POST", path, body, {"Authorization": "Bearer wrong"})[0] == 403
+    generation = _generation(simple_api)
+    status, _ = request_json("POST", "/api/snapshot/refresh", headers={"Authorization": "Bearer s3cret"})
+    assert status == 200
+    assert _generation(simple_api) == generation + 1
+
+
+def test_invalidate_reports_what_it_dropped(simple_api, request_json, monkeypatch):
+    monkeypatch.setattr(simple_api, "SNAPSHOT_REFRESH_TOKEN", "s3cret")
+    generation = _generation(simple_api)
+    # Dropping derived keys alone needs no token
+    status, response = request_json("POST", "/api/cache/invalidate", {"key": "keys"})
+    assert (status, response["invalidated"]) == (200, ["keys"])
+    assert _generation(simple_api) == generation
+
+    status, response = request_json("POST", "/api/cache/invalidate", {},
+                                    {"Authorization": "Bearer s3cret"})
+    assert (status, response["invalidated"]) == (200, ["keys", "snapshot"])
+    assert _generation(simple_api) == generation + 1
+
+
+def test_invalidate_rejects_unknown_keys(request_json):
+    status, response = request_json("POST", "/api/cache/invalidate", {"key": "tee_info"})
+    assert status == 400
+    assert response["keys"] == ["keys", "snapshot"]
+
+
+def test_concurrent_refreshes_get_distinct_generations(simple_api):
+    generation = _generation(simple_api)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(simple_api.refresh_snapshot().generation))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(seen) == list(range(generation + 1, generation + 9))
+    assert _generation(simple_api) == generation + 8
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs os.fork")
+def test_prefork_refresh_does_not_block_and_reaches_every_worker(spawn_api):
+    _, port = spawn_api(API_SERVER_MODE="prefork", API_PROCESSES="2")
+
+    def generations():
+        return {json.loads(http_get(port, "/api/cache/stats")[1])["snapshot"]["generation"] for _ in range(20)}
+
+    assert generations() == {1}
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        started = time.monotonic()
+        conn.request("POST", "/api/snapshot/refresh")
+        response = conn.getresponse()
+        body = json.loads(response.read())
+    finally:
+        conn.close()
+    assert time.monotonic() - started < 1
+    assert (response.status, body["status"]) == (202, "pending")
+    wait_for(lambda: generations() == {2})
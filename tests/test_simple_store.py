@@ -0,0 +1,39 @@
+import http.client
+import json
+import time
+
+
+def _wait_committed(store, timeout=5):
+    deadline = time.monotonic() + timeout
+    while store.stats()["queued"] and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert store.stats()["queued"] == 0
+
+
+def test_uses_the_shared_store_module(simple_api):
+    assert simple_api.AttestationStore.__module__ == "attestation_store"
+    assert simple_api.ATTESTATION_STORE is not None
+
+
+def test_verify_and_submit_resolve_stored_quotes(simple_api, request_json):
+    status, response = request_json("POST", "/api/tee/quote", {"data": "stored"})
+    assert status == 200
+    quote = response["quote_data"]
+    status, response = request_json("POST", "/api/attestation/submit", {"attestation_id": quote["quote_id"]})
+    assert status == 200
+    assert response["submission"]["stored"] is True
+    assert response["submission"]["quote_hash"] == simple_api.quote_hash(quote["quote"])
+
+
+def test_batch_records_are_stored_together(simple_api, simple_server):
+    conn = http.client.HTTPConnection("127.0.0.1", simple_server.server_address[1], timeout=10)
+    try:
+        conn.request("POST", "/api/attestation/generate/batch", body=json.dumps({"items": [{"data": "a"}, 1]}))
+        lines = [json.loads(line) for line in conn.getresponse().read().splitlines()]
+    finally:
+        conn.close()
+    attestation_id = lines[0]["data"]["attestation_id"]
+    store = simple_api.ATTESTATION_STORE
+    _wait_committed(store)
+    assert store.get(attestation_id)["attestation_id"] == attestation_id
+    assert lines[1]["status"] == "error"
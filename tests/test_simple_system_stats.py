@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+from support import wait_for
+
+
+@pytest.fixture
+def sampler(simple_api):
+    return simple_api.SystemSampler(interval=0.01, size=5)
+
+
+def test_ring_buffer_keeps_the_newest_samples(sampler):
+    sampler.start()
+    wait_for(lambda: sampler.latest()["seq"] >= 8, timeout=5)
+    history = sampler.history(60)
+    assert len(history) == 5
+    seqs = [sample["seq"] for sample in history]
+    assert seqs == sorted(seqs)
+    assert seqs[-1] >= 8
+
+
+def test_history_window_filters_by_age(simple_api, monkeypatch):
+    sampler = simple_api.SystemSampler(interval=3600)
+    now = sampler.latest()["time"]
+    monkeypatch.setattr(sampler, "_samples", [dict(sampler.latest(), time=now - age) for age in (30, 10, 0)])
+    assert [round(now - s["time"]) for s in sampler.history(15)] == [10, 0]
+    assert len(sampler.history(3600)) == 3
+
+
+def test_thread_starts_once_per_process(sampler):
+    started = threading.active_count()
+    for _ in range(5):
+        sampler.start()
+        sampler.latest()
+    assert threading.active_count() == started + 1
+
+
+def test_cpu_percent_is_the_busy_share_between_samples(simple_api, monkeypatch):
+    sampler = simple_api.SystemSampler(interval=3600)
+    lines = iter([b"cpu 100 0 100 700 100 0 0 0 0 0\n", b"cpu 150 0 150 750 150 0 0 0 0 0\n"])
+
+    class _Stat:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def readline(self):
+            return next(lines)
+
+    real_open = open
+
+    def fake_open(path, *args):
+        # Only this thread: sampler threads from other tests may be reading procfs meanwhile
+        if path == "/proc/stat" and threading.current_thread() is threading.main_thread():
+            return _Stat()
+        return real_open(path, *args)
+
+    monkeypatch.setattr("builtins.open", fake_open)
+    sampler._prev_cpu = None
+    assert sampler._read_cpu() == {}
+    # 100 of the 200 new jiffies were idle or iowait
+    assert sampler._read_cpu() == {"cpu_percent": 50.0}
+
+
+def test_unreadable_procfs_leaves_fields_none(simple_api, monkeypatch):
+    def missing():
+        raise OSError("no procfs")
+
+    sampler = simple_api.SystemSampler(interval=3600)
+    for reader in ("_read_meminfo", "_read_loadavg", "_read_uptime", "_read_cpu"):
+        monkeypatch.setattr(sampler, reader, missing)
+    sample = sampler._sample()
+    assert all(sample[field] is None for field in simple_api.SAMPLE_FIELDS)
+    assert sample["seq"] == 2
+
+
+@pytest.mark.parametrize("window", ["nan", "inf", "-inf", "soon"])
+def test_system_stats_rejects_bad_window(request_json, window):
+    status, _ = request_json("GET", f"/api/system/stats?window={window}")
+    assert status == 400
+
+
+def test_system_stats_clamps_the_window(simple_api, request_json):
+    longest = simple_api.SYSTEM_SAMPLER.interval * simple_api.SYSTEM_SAMPLER.size
+    for asked, served in (("-5", 0), ("1e9", longest), ("60", 60)):
+        status, response = request_json("GET", f"/api/system/stats?window={asked}")
+        assert (status, response["window"]) == (200, served)
+    assert response["current"]["seq"] >= 1
+    assert set(simple_api.SAMPLE_FIELDS) <= set(response["current"])
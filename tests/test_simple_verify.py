@@ -0,0 +1,87 @@
+import pytest
+
+
+@pytest.mark.parametrize("body", [{}, {"attestation_id": "tee-unknown"}, {"quote_hash": "00" * 32}])
+def test_verify_unknown_attestation_is_404(request_json, body):
+    status, response = request_json("POST", "/api/attestation/verify", body)
+    assert status == 404
+    assert response["verified"] is False
+
+
+def test_verify_stored_attestation_without_quote(request_json):
+    status, generated = request_json("POST", "/api/attestation/generate", {"data": "hello"})
+    assert status == 200
+    attestation_id = generated["data"]["attestation_id"]
+    status, response = request_json("POST", "/api/attestation/verify", {"attestation_id": attestation_id})
+    assert status == 200
+    assert response["stored"] is True
+    assert response["verified"] is False
+    assert "no quote" in response["error"]
+
+
+def test_verify_malformed_quote(request_json):
+    status, response = request_json("POST", "/api/attestation/verify", {"quote": "00" * 16})
+    assert status == 200
+    assert response["verified"] is False
+    assert response["verification"]["checks"]["structure"] is False
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        ["not", "an", "object"],
+        {"quote": 42},
+        {"quote": ["00"]},
+        {"quote": "00", "expected_measurements": ["mrtd"]},
+        {"quote": "00", "expected_measurements": {"mrtd": 7}},
+        {"quote": "00", "expected_report_data": 12},
+        {"attestation_id": {"id": 1}},
+    ],
+)
+def test_verify_rejects_wrongly_typed_fields(request_json, body):
+    status, response = request_json("POST", "/api/attestation/verify", body)
+    assert status == 400
+    assert response["verified"] is False
+
+
+def test_simple_api_runs_the_shared_verifier(simple_api):
+    import quote_verifier
+
+    assert simple_api.QuoteVerifier is quote_verifier.QuoteVerifier
+
+
+@pytest.fixture
+def seeded_verifier(simple_api, tdx_platform, tmp_path, monkeypatch):
+    from quote_verifier import CollateralCache
+
+    collateral = CollateralCache(str(tmp_path / "collateral"), fetch=False)
+    tdx_platform.seed(collateral)
+    verifier = simple_api.QuoteVerifier(collateral, trusted_root_pem=tdx_platform.root_pem)
+    monkeypatch.setattr(simple_api, "QUOTE_VERIFIER", verifier)
+    return verifier
+
+
+def test_verified_only_with_collateral_checks(simple_api, request_json, tdx_platform, seeded_verifier,
+                                              tmp_path, monkeypatch):
+    from quote_verifier import CollateralCache
+
+    measurements = tdx_platform.measurements(b"simple")
+    quote = tdx_platform.quote(b"simple", measurements).hex()
+    expected = {name: value.hex() for name, value in measurements.items()}
+    status, response = request_json("POST", "/api/attestation/verify", {
+        "quote": quote, "expected_measurements": expected, "expected_report_data": b"simple".hex()})
+    assert status == 200
+    assert response["verified"] is True, response["verification"]["errors"]
+    checks = response["verification"]["checks"]
+    assert checks["tcb_info"] and checks["qe_identity"] and checks["pck_not_revoked"]
+    assert response["verification"]["tcb_status"] == "UpToDate"
+
+    # Same root and signatures, but no TCB info, QE identity or CRL to check them against
+    empty = CollateralCache(str(tmp_path / "empty"), fetch=False)
+    monkeypatch.setattr(simple_api, "QUOTE_VERIFIER",
+                        simple_api.QuoteVerifier(empty, trusted_root_pem=tdx_platform.root_pem))
+    status, response = request_json("POST", "/api/attestation/verify", {"quote": quote})
+    assert status == 200
+    assert response["verified"] is False
+    assert response["verification"]["checks"]["quote_signature"] is True
+    assert response["verification"]["checks"]["tcb_info"] is not True